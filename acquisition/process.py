@@ -0,0 +1,445 @@
+"""
+Acquisition in a separate process.
+
+The child process owns BLEImuManager, the decoders and the BinaryRecorder, so
+a slow redraw in the GUI process cannot delay a GATT read or a write to disk.
+Samples reach the GUI through a SharedSampleRing; commands, status messages
+and counters travel over a multiprocessing Pipe as small tuples:
+
+    GUI -> acquisition  ("scan", service_uuid)
+                        ("connect", profile, profile_name, all_devices)
+                        ("disconnect",)
+                        ("power", power_mode_uuid, mode, address)   address None: every device
+                        ("stop",)
+    acquisition -> GUI  ("status", text)
+                        ("scan", [(name, address), ...])
+                        ("device", index, address)   before the device's first ring record
+                        ("gap", index, seq, seconds) before the first record after a reconnect
+                        ("stats", device_stats, channel_stats, recorder_info, metrics)
+                        ("stopped",)
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from core.channel import (
+    ChannelFanout, SampleChannel, POLICY_BLOCK, POLICY_DROP_NEWEST, drain_into, watch_channel
+)
+from core.metrics import METRICS
+from core.samples import SAMPLE_DTYPE, SampleBatch, as_batch, item_device, item_gap
+from core.shared_ring import SharedSampleRing
+
+DEFAULT_RING_CAPACITY = 1 << 16
+
+# how often the acquisition process reports its counters (s)
+DEFAULT_STATS_INTERVAL = 0.5
+
+RECORD_QUEUE_SIZE = 4096
+
+
+class AcquisitionProcess:
+    """
+    GUI-side handle of the acquisition process. Mirrors the parts of
+    BLEImuManager the GUI uses; calls only send a command and return.
+
+    transport_factory: picklable callable returning the transport inside the
+        child (e.g. functools.partial(bluetooth.simulated.simulated_transport, ...)),
+        real Bluetooth when None
+    on_status: callable(text) for log messages
+    on_scan: callable([(name, address), ...]) with scan results
+
+    Call poll() regularly (read() and pump() do) to receive messages.
+    """
+
+    def __init__(
+        self,
+        ring_capacity=DEFAULT_RING_CAPACITY,
+        recording_directory="recordings",
+        transport_factory=None,
+        on_status=None,
+        on_scan=None,
+        stats_interval=DEFAULT_STATS_INTERVAL,
+    ):
+        self.ring_capacity = ring_capacity
+        self.recording_directory = recording_directory
+        self.transport_factory = transport_factory
+        self.on_status = on_status
+        self.on_scan = on_scan
+        self.stats_interval = stats_interval
+
+        self.scan_results = []
+        self.channel_stats = []
+        self.recorder_info = {}
+        self.metrics = []  # latest MetricsRegistry.snapshot() of the acquisition process
+        self.last_lag = 0.0
+
+        self._device_stats = {}
+        self._devices = {}  # ring device index -> address
+        self._gaps = {}  # (ring device index, seq) -> outage (s) before that record
+        self._ring = None
+        self._conn = None
+        self._process = None
+
+    @property
+    def is_running(self):
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def is_connected(self):
+        return any(stats["connected"] for stats in self._device_stats.values())
+
+    def device_stats(self):
+        """
+        Last BLEImuManager.device_stats() reported by the acquisition process.
+        """
+        return self._device_stats
+
+    def ring_stats(self):
+        """
+        Counters of the shared ring, in the shape of SampleChannel.stats().
+        """
+        ring = self._ring
+        return {
+            "name": "ring",
+            "policy": POLICY_DROP_NEWEST,
+            "depth": len(ring) if ring else 0,
+            "maxsize": self.ring_capacity,
+            "dropped": ring.dropped if ring else 0,
+            "lag": self.last_lag,
+        }
+
+    # ------------------------------------------------------
+    # Process control
+    # ------------------------------------------------------
+    def start(self):
+        if self.is_running:
+            return
+
+        # spawn: the child must not inherit the Qt application
+        context = multiprocessing.get_context("spawn")
+        self._ring = SharedSampleRing(self.ring_capacity)
+        self._conn, child_conn = context.Pipe()
+        options = {
+            "transport_factory": self.transport_factory,
+            "recording_directory": self.recording_directory,
+            "stats_interval": self.stats_interval,
+            "metrics": METRICS.enabled,
+        }
+        self._process = context.Process(
+            target=_acquisition_main,
+            args=(child_conn, self._ring.name, options),
+            name="imu-acquisition",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._devices = {}
+
+    def stop(self, timeout=5.0):
+        """
+        Disconnect every device, finish the recording and end the process.
+        """
+        if self._process is None:
+            return
+
+        self._send("stop")
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self.poll()
+
+        self._process = None
+        self._conn.close()
+        self._conn = None
+        self._ring.close()
+        self._ring = None
+
+    def _send(self, *command):
+        try:
+            self._conn.send(command)
+        except (OSError, AttributeError):
+            self._status("Acquisition process is not running.")
+
+    def _status(self, text):
+        if self.on_status:
+            self.on_status(text)
+
+    # ------------------------------------------------------
+    # Commands
+    # ------------------------------------------------------
+    def scan(self, service_uuid):
+        self._send("scan", service_uuid)
+
+    def connect(self, profile, profile_name="", all_devices=False):
+        """
+        Connect to the next device of a profile (or every one in range) and
+        start recording in the acquisition process.
+        profile: core.device_profiles.DeviceProfile, or a dict of its old keys
+        """
+        self._send("connect", profile, profile_name, all_devices)
+
+    def disconnect(self):
+        self._send("disconnect")
+
+    def set_power_mode(self, power_mode_uuid, mode, address=None):
+        self._send("power", power_mode_uuid, mode, address)
+
+    # ------------------------------------------------------
+    # Messages and samples
+    # ------------------------------------------------------
+    def poll(self):
+        """
+        Handle every message waiting on the pipe.
+        """
+        conn = self._conn
+        try:
+            while conn is not None and conn.poll():
+                self._handle(conn.recv())
+        except (EOFError, OSError):
+            pass
+
+    def _handle(self, message):
+        kind = message[0]
+        if kind == "status":
+            self._status(message[1])
+        elif kind == "device":
+            self._devices[message[1]] = message[2]
+        elif kind == "gap":
+            _, index, seq, seconds = message
+            self._gaps[(index, seq)] = seconds
+        elif kind == "stats":
+            _, self._device_stats, self.channel_stats, self.recorder_info, self.metrics = message
+        elif kind == "scan":
+            self.scan_results = message[1]
+            if self.on_scan:
+                self.on_scan(self.scan_results)
+        elif kind == "stopped":
+            self._device_stats = {}
+
+    def read(self):
+        """
+        Take every sample in the ring, as SampleBatch items (one per run of
+        consecutive samples of a device, split where a reconnect left a gap).
+        """
+        self.poll()
+        if self._ring is None:
+            return []
+        records = self._ring.read()
+        if not len(records):
+            return []
+
+        self.last_lag = time.perf_counter() - float(records["host_t"][-1])
+
+        devices = records["device"]
+        seqs = records["seq"]
+        split = np.zeros(len(records), dtype=bool)
+        split[1:] = (devices[1:] != devices[:-1]) | (seqs[1:] != seqs[:-1] + 1)
+        for index, seq in self._gaps:
+            split[(devices == index) & (seqs == seq)] = True
+        split[0] = False
+        breaks = np.flatnonzero(split)
+
+        samples = np.empty(len(records), dtype=SAMPLE_DTYPE)
+        for name in SAMPLE_DTYPE.names:
+            samples[name] = records[name]
+
+        items = []
+        for start, end in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(records)]))):
+            index = int(devices[start])
+            if index not in self._devices:
+                # the device message is always sent before its first record
+                self.poll()
+            items.append(SampleBatch(
+                self._devices.get(index, f"device-{index}"),
+                samples[start:end],
+                int(seqs[start]),
+                float(records["host_t"][start]),
+                self._gaps.pop((index, int(seqs[start])), None),
+            ))
+        return items
+
+    async def pump(self, data_queue, interval=0.005):
+        """
+        Move samples from the ring to data_queue (e.g. the live plot channel). Runs until cancelled.
+        """
+        while True:
+            for item in self.read():
+                data_queue.put_nowait(item)
+            await asyncio.sleep(interval)
+
+
+# ------------------------------------------------------
+# Acquisition process side
+# ------------------------------------------------------
+class _RingWriter:
+    """
+    Data queue end that writes every item to the shared ring, announcing new
+    devices on the pipe first.
+    """
+
+    def __init__(self, ring, send):
+        self.ring = ring
+        self.send = send
+        self._indices = {}
+
+    def put_nowait(self, item):
+        device = item_device(item)
+        index = self._indices.get(device)
+        if index is None:
+            index = self._indices[device] = len(self._indices)
+            self.send("device", index, device)
+
+        seq = getattr(item, "seq", None)
+        host_t = getattr(item, "host_t", None)
+        gap = item_gap(item)
+        if gap is not None:
+            self.send("gap", index, seq if seq is not None else 0, gap)
+        self.ring.write(
+            as_batch(item),
+            index,
+            seq if seq is not None else 0,
+            host_t if host_t is not None else time.perf_counter(),
+        )
+
+    async def put(self, item):
+        self.put_nowait(item)
+
+
+class _AcquisitionWorker:
+    def __init__(self, conn, ring_name, options):
+        # imported here so the GUI process does not load them just to spawn the child
+        from bluetooth.ble_imu_manager import BLEImuManager
+        from recording.recorder import BinaryRecorder
+
+        self.conn = conn
+        self.stats_interval = options["stats_interval"]
+        METRICS.enabled = options["metrics"]
+        self._send_lock = threading.Lock()
+
+        factory = options["transport_factory"]
+        self.ble = BLEImuManager(transport=factory() if factory else None)
+        self.ble.status.connect(lambda text: self.send("status", text))
+
+        self.ring = SharedSampleRing(name=ring_name)
+        self.recorder = BinaryRecorder(options["recording_directory"], status=self.ble.status.emit)
+        self.record_channel = SampleChannel(RECORD_QUEUE_SIZE, POLICY_BLOCK, name="recorder")
+        watch_channel(self.record_channel)
+        self.data_queue = ChannelFanout([self.record_channel, _RingWriter(self.ring, self.send)])
+
+    def send(self, *message):
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except OSError:
+                pass
+
+    def _read_commands(self, loop, commands):
+        """
+        Blocking pipe reads, on their own thread.
+        """
+        while True:
+            try:
+                command = self.conn.recv()
+            except (EOFError, OSError):
+                command = ("stop",)
+            loop.call_soon_threadsafe(commands.put_nowait, command)
+            if command[0] == "stop":
+                return
+
+    def _send_stats(self):
+        self.send(
+            "stats",
+            self.ble.device_stats(),
+            [self.record_channel.stats()],
+            {
+                "recording": self.recorder.is_recording,
+                "samples_written": self.recorder.samples_written,
+                "bytes_written": self.recorder.bytes_written,
+                "paths": list(self.recorder.paths),
+            },
+            METRICS.snapshot(),
+        )
+
+    async def _report_stats(self):
+        while True:
+            self._send_stats()
+            await asyncio.sleep(self.stats_interval)
+
+    async def _stop_recording(self):
+        # everything still in the channel must reach the recorder before it closes
+        while not self.record_channel.empty():
+            await asyncio.sleep(0.01)
+        self.recorder.stop()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        commands = asyncio.Queue()
+        threading.Thread(
+            target=self._read_commands, args=(loop, commands), name="acquisition-commands", daemon=True
+        ).start()
+
+        tasks = [
+            asyncio.create_task(drain_into(self.record_channel, self.recorder.submit)),
+            asyncio.create_task(self._report_stats()),
+        ]
+
+        try:
+            while True:
+                command = await commands.get()
+                if command[0] == "stop":
+                    break
+                try:
+                    await self._execute(*command)
+                except Exception as e:
+                    self.send("status", f"Acquisition error: {e}")
+        finally:
+            await self.ble.disconnect()
+            await self._stop_recording()
+            for task in tasks:
+                task.cancel()
+            self._send_stats()
+            self.send("stopped")
+            self.ring.close()
+
+    async def _execute(self, kind, *args):
+        if kind == "scan":
+            devices = await self.ble.scan_devices(args[0])
+            self.send("scan", [(d.name, d.address) for d in devices or []])
+
+        elif kind == "connect":
+            profile, profile_name, all_devices = args
+
+            # record from the first sample on; files are only created once data arrives
+            started_recording = not self.recorder.is_recording
+            if started_recording:
+                self.recorder.start(device_profile=profile_name)
+            await self.ble.connect_profile(self.data_queue, profile, all_devices)
+            if not started_recording:
+                return
+            if self.ble.is_connected:
+                self.send("status", f"Recording to {self.recorder.directory}/")
+            else:
+                self.recorder.stop()
+
+        elif kind == "disconnect":
+            if not self.ble.is_connected:
+                self.send("status", "No device is currently connected.")
+                return
+            self.send("status", "Disconnecting...")
+            await self.ble.disconnect()
+            await self._stop_recording()
+            self.send("status", "Disconnected.")
+
+        elif kind == "power":
+            await self.ble.set_power_mode(*args)
+
+        else:
+            self.send("status", f"Unknown acquisition command: {kind}")
+
+
+def _acquisition_main(conn, ring_name, options):
+    asyncio.run(_AcquisitionWorker(conn, ring_name, options).run())
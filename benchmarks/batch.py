@@ -0,0 +1,95 @@
+"""
+Scaling of the batch session processor (recording.batch) with the number of
+worker processes: --sessions synthetic recordings of --seconds each, run
+through the full pipeline with 1, 2, 4, ... jobs (up to --max-jobs, default
+the CPU count), plus a resumed run that finds every session up to date.
+
+Usage:
+    python -m benchmarks.batch [--sessions 8] [--seconds 120] [--odr 1000] [--max-jobs N]
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from benchmarks.recording_formats import make_session
+from recording.batch import STEPS, run_batch
+from recording.format import encode_header, make_header
+
+CONFIG = {
+    "steps": list(STEPS),
+    "filter": "madgwick",
+    "method": "trapezoid",
+    "zupt": True,
+    "chunk": 65536,
+    "trajectory": False,
+}
+
+
+def make_sessions(directory, sessions, seconds, odr):
+    records = make_session(seconds, odr)
+    for i in range(sessions):
+        with open(os.path.join(directory, f"session_{i:02d}_000.imu"), "wb") as f:
+            f.write(encode_header(make_header("benchmark", 0.0)))
+            f.write(records.tobytes())
+    return len(records) * sessions
+
+
+def job_counts(max_jobs):
+    jobs = 1
+    while jobs < max_jobs:
+        yield jobs
+        jobs *= 2
+    yield max_jobs
+
+
+def run(args):
+    directory = tempfile.mkdtemp()
+    output = os.path.join(directory, "results")
+    samples = make_sessions(directory, args.sessions, args.seconds, args.odr)
+    max_jobs = args.max_jobs or os.cpu_count() or 1
+
+    runs = []
+    single = None
+    for jobs in job_counts(max_jobs):
+        shutil.rmtree(output, ignore_errors=True)
+        start = time.perf_counter()
+        report = run_batch([directory], output, CONFIG, jobs)
+        elapsed = time.perf_counter() - start
+        single = single or elapsed
+        runs.append({
+            "jobs": report["jobs"],
+            "seconds": round(elapsed, 2),
+            "msamples_per_s": round(samples / elapsed / 1e6, 3),
+            "speedup": round(single / elapsed, 2),
+            "efficiency": round(single / elapsed / report["jobs"], 2),
+            "failed": report["failed"],
+        })
+
+    start = time.perf_counter()
+    resumed = run_batch([directory], output, CONFIG, max_jobs)
+    resumed_s = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux
+    worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    shutil.rmtree(directory)
+    return {
+        "cpus": os.cpu_count(),
+        "sessions": args.sessions,
+        "samples": samples,
+        "runs": runs,
+        "resumed_run": {"seconds": round(resumed_s, 3), "skipped": resumed["skipped"]},
+        "max_worker_rss_mb": round(worker_rss, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--odr", type=float, default=1000.0)
+    parser.add_argument("--max-jobs", type=int, help="most worker processes tried (default: CPU count)")
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,106 @@
+"""
+Time from pressing Connect to the first sample, against simulated peripherals
+whose one-shot discovery takes as long as bleak's default (--scan-latency).
+
+    legacy        one-shot discover() on every connect, then a client created
+                  from the address (which looks the device up again)
+    after_scan    connect right after a Scan: the device comes from the discovery cache
+    cold          connect without a Scan: the background scan stops at the
+                  first matching advertisement
+
+Usage:
+    python -m benchmarks.connect_latency [--scan-latency 5] [--advertising-interval 0.1]
+                                         [--devices 3] [--repeat 3]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from benchmarks.stream_modes import connect_profile
+from bluetooth.ble_imu_manager import BLEImuManager
+from bluetooth.device_session import STREAM_MODE_PACKED
+from bluetooth.simulated import simulated_transport
+from core.device_profiles import PACKED_IMU_DEVICE
+
+PROFILE = PACKED_IMU_DEVICE
+
+
+class _AddressDevice:
+    # only the address of a scanned device, as the old connect() passed on
+    def __init__(self, device):
+        self.address = device.address
+        self.name = device.name
+
+
+class LegacyManager(BLEImuManager):
+    """
+    connect() as it used to work: a full discover() every time, then a connect by address.
+    """
+
+    async def find_device(self, service_uuid, address=None, timeout=5.0):
+        devices = await self.transport.discover(service_uuid, timeout)
+        candidates = [d for d in devices if d.address not in self.sessions]
+        return _AddressDevice(candidates[0]) if candidates else None
+
+
+async def time_to_first_sample(ble, scan_first, scan_seconds):
+    if scan_first:
+        await ble.scan_devices(PROFILE["SERVICE_UUID"], timeout=scan_seconds)
+
+    data_queue = asyncio.Queue()
+    start = time.perf_counter()
+    await connect_profile(ble, PROFILE, data_queue, STREAM_MODE_PACKED)
+    await data_queue.get()
+    elapsed = time.perf_counter() - start
+
+    reported = ble.primary.time_to_first_sample()
+    await ble.disconnect()
+    return elapsed, reported
+
+
+async def run_scenario(name, args):
+    measured = []
+    reported = []
+    for _ in range(args.repeat):
+        transport = simulated_transport(
+            PROFILE, devices=args.devices, advertising_interval=args.advertising_interval
+        )
+        transport.scan_latency = args.scan_latency
+
+        manager = LegacyManager if name == "legacy" else BLEImuManager
+        ble = manager(transport=transport)
+
+        elapsed, ttfs = await time_to_first_sample(ble, name == "after_scan", args.scan_seconds)
+        measured.append(elapsed)
+        reported.append(ttfs)
+
+    return {
+        "scenario": name,
+        "time_to_first_sample_s": round(float(np.median(measured)), 3),
+        "reported_s": round(float(np.median(reported)), 3),
+    }
+
+
+async def run(args):
+    results = [await run_scenario(name, args) for name in ("legacy", "after_scan", "cold")]
+    return {
+        "scan_latency_s": args.scan_latency,
+        "advertising_interval_s": args.advertising_interval,
+        "devices": args.devices,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scan-latency", type=float, default=5.0,
+                        help="seconds a one-shot discovery or address lookup takes")
+    parser.add_argument("--advertising-interval", type=float, default=0.1)
+    parser.add_argument("--scan-seconds", type=float, default=1.0,
+                        help="length of the Scan before the after_scan connect")
+    parser.add_argument("--devices", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,93 @@
+"""
+Per-frame cost of drawing a long live-plot window, every raw sample versus the
+level-of-detail view (plotting.decimation): the view query, and a full Agg
+draw of three lines into a plot --width pixels wide.
+
+The default is a 10-minute window of 1 kHz samples with a few single-sample spikes.
+
+Usage:
+    python -m benchmarks.decimation [--samples 600000] [--width 800] [--frames 10]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from core.ring_buffer import RingBuffer
+from plotting.decimation import LevelOfDetail
+
+COLUMNS = ("t", "x", "y", "z")
+
+# samples per extend(), like a notification batch
+BATCH = 100
+
+
+def fill(store, samples):
+    rng = np.random.default_rng(0)
+    t = np.arange(samples, dtype=np.float64)
+    values = {name: np.sin(t / 500.0 + i) + rng.normal(0.0, 0.05, samples) for i, name in enumerate("xyz")}
+    values["x"][samples // 3] = 8.0  # spikes the decimated view has to keep
+    values["z"][2 * samples // 3] = -8.0
+
+    start = time.perf_counter()
+    for first in range(0, samples, BATCH):
+        store.extend(t=t[first:first + BATCH], **{name: v[first:first + BATCH] for name, v in values.items()})
+    return time.perf_counter() - start
+
+
+def measure(view, args):
+    figure = Figure(figsize=(args.width / 100.0, 4.0), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    lines = [ax.plot([], [])[0] for _ in "xyz"]
+    pixels = ax.bbox.width
+
+    query_times, draw_times = [], []
+    for _ in range(args.frames):
+        start = time.perf_counter()
+        visible = view(pixels)
+        query_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for line, name in zip(lines, "xyz"):
+            line.set_data(visible["t"], visible[name])
+        ax.set_xlim(visible["t"][0], visible["t"][-1])
+        ax.set_ylim(-10, 10)
+        canvas.draw()
+        draw_times.append(time.perf_counter() - start)
+
+    return {
+        "points_per_line": len(visible["t"]),
+        "query_ms": round(1000 * float(np.median(query_times)), 3),
+        "draw_ms": round(1000 * float(np.median(draw_times)), 2),
+        "max_abs_value": round(float(np.nanmax(np.abs([visible[name] for name in "xyz"]))), 2),
+    }
+
+
+def run(args):
+    raw = RingBuffer(COLUMNS, args.samples)
+    lod = LevelOfDetail(COLUMNS, args.samples)
+    raw_fill = fill(raw, args.samples)
+    lod_fill = fill(lod, args.samples)
+
+    return {
+        "samples": args.samples,
+        "width_px": args.width,
+        "ingest_us_per_batch": {
+            "raw": round(1e6 * raw_fill * BATCH / args.samples, 2),
+            "lod": round(1e6 * lod_fill * BATCH / args.samples, 2),
+        },
+        "raw": measure(lambda pixels: raw.view(), args),
+        "lod": measure(lod.view, args),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=600_000)
+    parser.add_argument("--width", type=int, default=800, help="figure width (px)")
+    parser.add_argument("--frames", type=int, default=10)
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,263 @@
+"""
+Allocation cost of the BLE ingest path: payloads fed straight into a
+DeviceSession's notification handlers (no peripheral, no event loop
+traffic), written into pooled blocks and queued as SampleSpans, against the
+previous path that decoded every field with struct into a Python float and
+queued a 7-tuple per sample.
+
+For each path and stream mode, per --samples samples (10k by default):
+    retained_blocks / retained_bytes   memory blocks still allocated while a
+        consumer holds every queue item (tracemalloc snapshot difference)
+    gc_collections                     generation-0 collections during ingest
+    peak_bytes                         tracemalloc peak while a consumer drains
+        and copies every item, like the plot and the recorder
+    us_per_sample                      ingest time, without tracemalloc
+
+Usage:
+    python -m benchmarks.ingest [--samples 10000] [--samples-per-payload 8]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import struct
+import time
+import tracemalloc
+
+import numpy as np
+
+from bluetooth.device_session import STREAM_MODE_NOTIFY, STREAM_MODE_PACKED, DeviceSession
+from bluetooth.scheduler import GattScheduler
+from bluetooth.simulated import SimulatedCharacteristic, SimulatedServices
+from core.device_profiles import FIELD_UUID_KEYS, IMU_DEVICE, PACKED_IMU_DEVICE
+from core.samples import SAMPLE_DTYPE, SAMPLE_FIELDS, PackedLayout, as_batch
+
+PATH_POOLED = "pooled"
+PATH_TUPLES = "tuples"
+
+
+class CapturingClient:
+    """
+    Looks connected and keeps the notification callbacks, so payloads can be
+    handed to them directly.
+    """
+
+    is_connected = True
+
+    def __init__(self, uuids):
+        self.services = SimulatedServices([SimulatedCharacteristic(uuid, ("read", "notify")) for uuid in uuids])
+        self.callbacks = {}
+
+    async def start_notify(self, char, callback):
+        self.callbacks[char.uuid] = callback
+
+    async def stop_notify(self, char):
+        self.callbacks.pop(char.uuid, None)
+
+    async def disconnect(self):
+        pass
+
+
+class Sink:
+    """
+    Data queue end: keeps every item, or copies each out and drops it.
+    """
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.items = []
+        self.samples = 0
+
+    def put_nowait(self, item):
+        if self.keep:
+            self.items.append(item)
+        else:
+            self.samples += len(as_batch(item).copy())
+
+
+def make_samples(count):
+    rng = np.random.default_rng(4)
+    samples = np.zeros(count, dtype=SAMPLE_DTYPE)
+    samples["t"] = np.arange(count)
+    for name in SAMPLE_FIELDS[:-1]:
+        samples[name] = rng.normal(size=count)
+    return samples
+
+
+def field_payloads(samples):
+    """
+    One bytearray per field per sample, in delivery order, as bleak hands them over.
+    """
+    # 4 bytes each: float32 fields and a 32-bit device time, like the firmware sends
+    fields = [samples[name].astype("<f4").tobytes() for name in SAMPLE_FIELDS[:-1]]
+    fields.append(samples["t"].astype("<u4").tobytes())
+    return [
+        (index, bytearray(data[i * 4:(i + 1) * 4]))
+        for i in range(len(samples))
+        for index, data in enumerate(fields)
+    ]
+
+
+def packed_payloads(samples, per_payload):
+    layout = PackedLayout(PACKED_IMU_DEVICE["PACKED_LAYOUT"])
+    records = np.zeros(len(samples), dtype=layout.record_dtype)
+    for name in SAMPLE_FIELDS:
+        records[name] = samples[name]
+    return [bytearray(records[i:i + per_payload].tobytes()) for i in range(0, len(records), per_payload)]
+
+
+# ------------------------------------------------------
+# The previous decode-to-tuple path, for comparison
+# ------------------------------------------------------
+def tuple_field_handlers(session):
+    num_fields = len(SAMPLE_FIELDS)
+    decoders = [lambda data: struct.unpack("f", data)[0]] * (num_fields - 1) + [
+        lambda data: int.from_bytes(data, byteorder="little", signed=False)
+    ]
+    values = [None] * num_fields
+    arrivals = [0.0] * num_fields
+    received = 0
+
+    def make_handler(index):
+        decode = decoders[index]
+
+        def handler(_sender, data):
+            nonlocal received
+            now = time.perf_counter()
+
+            if values[index] is None:
+                received += 1
+            else:
+                session.stream_stats["incomplete"] += 1
+
+            values[index] = decode(data)
+            arrivals[index] = now
+
+            if received < num_fields:
+                return
+
+            session._record_sample(max(arrivals) - min(arrivals))
+            session._put(tuple(values))
+
+            for i in range(num_fields):
+                values[i] = None
+            received = 0
+
+        return handler
+
+    return [make_handler(index) for index in range(num_fields)]
+
+
+def tuple_packed_handler(session):
+    layout = PackedLayout(PACKED_IMU_DEVICE["PACKED_LAYOUT"])
+
+    def handler(_sender, data):
+        batch = layout.decode(data)
+        if not len(batch):
+            return
+        session.stream_stats["samples"] += len(batch)
+        session._put(batch, len(batch))
+
+    return handler
+
+
+# ------------------------------------------------------
+# Feeding
+# ------------------------------------------------------
+async def make_feed(path, mode, sink, samples, per_payload):
+    """
+    Returns (feed, session): feed() delivers every payload once.
+    """
+    profile = IMU_DEVICE if mode == STREAM_MODE_NOTIFY else PACKED_IMU_DEVICE
+    uuids = [profile[key] for key in FIELD_UUID_KEYS] if mode == STREAM_MODE_NOTIFY else [profile["PACKED_UUID"]]
+    client = CapturingClient(uuids)
+    session = DeviceSession("BENCH", "bench", client, sink, GattScheduler(), lambda _text: None)
+
+    if path == PATH_POOLED:
+        session.start(mode, uuids if mode == STREAM_MODE_NOTIFY else None, uuids[0], PACKED_IMU_DEVICE["PACKED_LAYOUT"])
+        while len(client.callbacks) < len(uuids):
+            await asyncio.sleep(0)
+        handlers = [client.callbacks[uuid] for uuid in uuids]
+    elif mode == STREAM_MODE_NOTIFY:
+        handlers = tuple_field_handlers(session)
+    else:
+        handlers = [tuple_packed_handler(session)]
+
+    if mode == STREAM_MODE_NOTIFY:
+        payloads = field_payloads(samples)
+
+        def feed():
+            for index, data in payloads:
+                handlers[index](None, data)
+    else:
+        payloads = packed_payloads(samples, per_payload)
+        handler = handlers[0]
+
+        def feed():
+            for data in payloads:
+                handler(None, data)
+
+    return feed, session
+
+
+async def measure(path, mode, args):
+    samples = make_samples(args.samples)
+
+    # warm up: fill the pool's first blocks and the decoder caches
+    sink = Sink(keep=False)
+    feed, session = await make_feed(path, mode, sink, samples, args.samples_per_payload)
+    feed()
+
+    start = time.perf_counter()
+    feed()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    feed()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pool = session.writer.pool
+    await session.stop()
+
+    keep = Sink(keep=True)
+    feed, session = await make_feed(path, mode, keep, samples, args.samples_per_payload)
+    gc.collect()
+    collections = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    feed()
+    retained = tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+    tracemalloc.stop()
+    collections = gc.get_stats()[0]["collections"] - collections
+    await session.stop()
+
+    result = {
+        "path": path,
+        "mode": mode,
+        "samples": args.samples,
+        "retained_blocks": sum(stat.count_diff for stat in retained if stat.count_diff > 0),
+        "retained_bytes": sum(stat.size_diff for stat in retained if stat.size_diff > 0),
+        "gc_collections": collections,
+        "peak_bytes": peak - before,
+        "us_per_sample": round(1e6 * elapsed / args.samples, 3),
+    }
+    if path == PATH_POOLED:
+        result["pool_blocks"] = {"allocated": pool.allocated, "reused": pool.reused}
+    return result
+
+
+async def main_async(args):
+    results = []
+    for mode in (STREAM_MODE_NOTIFY, STREAM_MODE_PACKED):
+        for path in (PATH_TUPLES, PATH_POOLED):
+            results.append(await measure(path, mode, args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10_000)
+    parser.add_argument("--samples-per-payload", type=int, default=8)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,142 @@
+"""
+Capture fidelity with a janky GUI: acquisition in the GUI's event loop versus
+in a separate process (acquisition.process).
+
+A simulated peripheral with a small FIFO streams at a fixed ODR while the GUI
+side blocks its event loop for --jank seconds every --jank-period seconds, as
+a slow canvas.draw() does. Samples missing from the recording are counted from
+gaps in the device time stamps.
+
+Usage:
+    python -m benchmarks.isolation [--seconds 5] [--odr 1000] [--fifo 64]
+                                   [--jank 0.2] [--jank-period 1.0]
+"""
+import argparse
+import asyncio
+import functools
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from acquisition.process import AcquisitionProcess
+from benchmarks.stream_modes import connect_profile
+from bluetooth.ble_imu_manager import BLEImuManager
+from bluetooth.device_session import STREAM_MODE_PACKED
+from bluetooth.simulated import simulated_transport
+from core.channel import ChannelFanout, SampleChannel, POLICY_BLOCK, POLICY_DROP_OLDEST
+from core.device_profiles import PACKED_IMU_DEVICE
+from recording.reader import Session
+from recording.recorder import BinaryRecorder, record_from
+
+PROFILE = PACKED_IMU_DEVICE
+
+
+async def jank(seconds, period, duration):
+    """
+    Block the event loop like a slow redraw would.
+    """
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        await asyncio.sleep(period)
+        time.sleep(seconds)
+
+
+def missing_samples(paths, odr):
+    """
+    Samples absent between the first and last recorded one, from device time gaps (ms).
+    """
+    recorded = 0
+    missing = 0
+    for path in paths:
+        times = np.concatenate(list(Session.open([path]).iter_chunks()))["t"].astype(np.int64)
+        recorded += len(times)
+        if len(times) > 1:
+            steps = np.round(np.diff(times) * odr / 1000.0).astype(np.int64)
+            missing += int(np.clip(steps - 1, 0, None).sum())
+    return recorded, missing
+
+
+async def run_in_process(args, directory):
+    ble = BLEImuManager(transport=simulated_transport(
+        PROFILE, odr=args.odr, fifo_size=args.fifo
+    ))
+    live = SampleChannel(256, POLICY_DROP_OLDEST, name="live")
+    record_channel = SampleChannel(4096, POLICY_BLOCK, name="recorder")
+    recorder = BinaryRecorder(directory)
+    recorder.start(device_profile="Packed IMU")
+    record_task = asyncio.create_task(record_from(record_channel, recorder))
+
+    await connect_profile(ble, PROFILE, ChannelFanout([live, record_channel]), STREAM_MODE_PACKED)
+    await jank(args.jank, args.jank_period, args.seconds)
+    await ble.disconnect()
+
+    while not record_channel.empty():
+        await asyncio.sleep(0.01)
+    record_task.cancel()
+    recorder.stop()
+    return recorder.paths
+
+
+async def run_isolated(args, directory):
+    acquisition = AcquisitionProcess(
+        recording_directory=directory,
+        transport_factory=functools.partial(
+            simulated_transport, PROFILE, odr=args.odr, fifo_size=args.fifo
+        ),
+    )
+    acquisition.start()
+    live = SampleChannel(256, POLICY_DROP_OLDEST, name="live")
+    pump = asyncio.create_task(acquisition.pump(live))
+
+    acquisition.connect(PROFILE, "Packed IMU")
+    await jank(args.jank, args.jank_period, args.seconds)
+    acquisition.disconnect()
+    await asyncio.sleep(0.5)
+
+    pump.cancel()
+    acquisition.stop()
+    return acquisition.recorder_info.get("paths", []), live.stats()
+
+
+async def run(args):
+    results = []
+    for mode in ("in_process", "isolated"):
+        with tempfile.TemporaryDirectory() as directory:
+            live_stats = None
+            if mode == "isolated":
+                paths, live_stats = await run_isolated(args, directory)
+            else:
+                paths = await run_in_process(args, directory)
+            recorded, missing = missing_samples(paths, args.odr)
+
+        result = {
+            "mode": mode,
+            "recorded": recorded,
+            "missing": missing,
+            "missing_pct": round(100.0 * missing / max(1, recorded + missing), 2),
+        }
+        if live_stats:
+            result["gui_received"] = live_stats["received"]
+        results.append(result)
+
+    return {
+        "odr_hz": args.odr,
+        "fifo_samples": args.fifo,
+        "jank_s": args.jank,
+        "jank_period_s": args.jank_period,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--odr", type=float, default=1000.0)
+    parser.add_argument("--fifo", type=int, default=64,
+                        help="samples the simulated device buffers")
+    parser.add_argument("--jank", type=float, default=0.2,
+                        help="seconds the GUI loop is blocked each time")
+    parser.add_argument("--jank-period", type=float, default=1.0)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,96 @@
+"""
+Integrate a long synthetic capture into velocity and position with the
+vectorized engine (batch and streaming) and with the per-sample helpers of
+core/kinematics_calc, and report the speedup.
+
+The per-sample loop is timed on --loop-samples samples and extrapolated.
+
+Usage:
+    python -m benchmarks.kinematics [--samples 10000000] [--loop-samples 200000] [--chunk 65536]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from core import kinematics_calc
+from core.kinematics import METHODS, KinematicsIntegrator, integrate
+
+
+def synthetic_capture(count, rate=1000.0, seed=0):
+    """
+    Accelerations (m/s^2) and times (s) with jittered spacing around 1/rate.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.cumsum(rng.uniform(0.8, 1.2, count) / rate)
+    accel = np.empty((count, 3))
+    accel[:, 0] = np.sin(t)
+    accel[:, 1] = np.cos(0.5 * t)
+    accel[:, 2] = rng.normal(0.0, 0.05, count)
+    return accel, t
+
+
+def list_step(accel, vel, pos, dt):
+    """
+    The helpers' per-sample list arithmetic, inlined (no function calls).
+    """
+    disp = [vel[i] * dt + 0.5 * accel[i] * dt ** 2 for i in range(3)]
+    return [vel[i] + accel[i] * dt for i in range(3)], [pos[i] + disp[i] for i in range(3)]
+
+
+def time_loop(accel, t, step):
+    vel = [0.0, 0.0, 0.0]
+    pos = [0.0, 0.0, 0.0]
+    rows = accel.tolist()
+    times = t.tolist()
+    start = time.perf_counter()
+    for i in range(1, len(rows)):
+        vel, pos = step(rows[i], vel, pos, times[i] - times[i - 1])
+    return time.perf_counter() - start
+
+
+def wrapper_step(accel, vel, pos, dt):
+    new_pos = kinematics_calc.get_current_position(accel, vel, pos, dt)
+    return kinematics_calc.get_current_vel(accel, vel, dt), new_pos
+
+
+def run(args):
+    accel, t = synthetic_capture(args.samples)
+    results = {"samples": args.samples}
+
+    # per-sample loops, extrapolated to the full capture
+    scale = args.samples / args.loop_samples
+    loop_accel, loop_t = accel[:args.loop_samples], t[:args.loop_samples]
+    results["python_lists_s"] = round(time_loop(loop_accel, loop_t, list_step) * scale, 3)
+    results["kinematics_calc_wrappers_s"] = round(time_loop(loop_accel, loop_t, wrapper_step) * scale, 3)
+
+    for method in METHODS:
+        start = time.perf_counter()
+        velocity, position = integrate(accel, t, method=method)
+        batch = time.perf_counter() - start
+        del velocity, position
+
+        integrator = KinematicsIntegrator(method=method)
+        start = time.perf_counter()
+        for i in range(0, args.samples, args.chunk):
+            integrator.update(accel[i:i + args.chunk], t[i:i + args.chunk])
+        streaming = time.perf_counter() - start
+
+        results[method] = {
+            "batch_s": round(batch, 3),
+            "streaming_s": round(streaming, 3),
+            "samples_per_sec": round(args.samples / batch),
+            "speedup_vs_python_lists": round(results["python_lists_s"] / batch, 1),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10_000_000)
+    parser.add_argument("--loop-samples", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=65536)
+    args = parser.parse_args()
+    args.loop_samples = min(args.loop_samples, args.samples)
+    print(json.dumps(run(args), indent=2))
@@ -0,0 +1,47 @@
+"""
+Cost of the instrumentation hooks (core.metrics) per update, with collection
+on and off, and what it adds up to per sample at a given stream rate.
+
+Usage:
+    python -m benchmarks.metrics_overhead [--updates 1000000] [--odr 1000]
+"""
+import argparse
+import json
+import time
+
+from core.metrics import MetricsRegistry
+
+
+def per_update(update, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        update()
+    return (time.perf_counter() - start) / count
+
+
+def run(args):
+    results = {}
+    for enabled in (True, False):
+        registry = MetricsRegistry(enabled=enabled)
+        counter = registry.counter("samples_total")
+        histogram = registry.histogram("latency_seconds")
+
+        results["enabled" if enabled else "disabled"] = {
+            "counter_inc_ns": round(per_update(counter.inc, args.updates) * 1e9, 1),
+            "histogram_observe_ns": round(per_update(lambda: histogram.observe(0.004), args.updates) * 1e9, 1),
+        }
+
+    baseline = per_update(lambda: None, args.updates)
+    for result in results.values():
+        # a sample at most costs one counter update plus one histogram observation
+        cost = (result["counter_inc_ns"] + result["histogram_observe_ns"]) * 1e-9 - 2 * baseline
+        result["cpu_pct_at_odr"] = round(100.0 * cost * args.odr, 4)
+
+    return {"odr_hz": args.odr, "call_overhead_ns": round(baseline * 1e9, 1), **results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=1_000_000)
+    parser.add_argument("--odr", type=float, default=1000.0)
+    print(json.dumps(run(parser.parse_args()), indent=2))
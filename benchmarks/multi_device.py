@@ -0,0 +1,91 @@
+"""
+Stream from several simulated IMUs at once through one BLEImuManager and
+report per-device throughput.
+
+Usage:
+    python -m benchmarks.multi_device [--devices 6] [--mode notify] [--odr 200] [--seconds 3]
+"""
+import argparse
+import asyncio
+import json
+
+from bluetooth.ble_imu_manager import BLEImuManager
+from bluetooth.device_session import STREAM_MODE_PACKED
+from bluetooth.scheduler import GattScheduler
+from bluetooth.simulated import SimulatedPeripheral, SimulatedTransport
+from core.device_profiles import IMU_DEVICE, PACKED_IMU_DEVICE
+from core.samples import item_device
+
+
+async def run(args):
+    profile = PACKED_IMU_DEVICE if args.mode == STREAM_MODE_PACKED else IMU_DEVICE
+    peripherals = [
+        SimulatedPeripheral(
+            profile,
+            name=f"Simulated IMU {i}",
+            address=f"SIM:00:00:00:00:{i:02X}",
+            odr=args.odr,
+            read_latency=args.read_latency,
+            seed=i,
+        )
+        for i in range(args.devices)
+    ]
+    ble = BLEImuManager(
+        transport=SimulatedTransport(peripherals),
+        scheduler=GattScheduler(max_in_flight=args.max_in_flight),
+    )
+    data_queue = asyncio.Queue()
+
+    await ble.connect_all(
+        data_queue,
+        profile["SERVICE_UUID"],
+        profile.get("TIME_UUID"),
+        profile.get("ACCEL_X_UUID"),
+        profile.get("ACCEL_Y_UUID"),
+        profile.get("ACCEL_Z_UUID"),
+        profile.get("GYRO_X_UUID"),
+        profile.get("GYRO_Y_UUID"),
+        profile.get("GYRO_Z_UUID"),
+        stream_mode=args.mode,
+        packed_uuid=profile.get("PACKED_UUID"),
+        packed_layout=profile.get("PACKED_LAYOUT"),
+    )
+    await asyncio.sleep(args.seconds)
+    stats = ble.device_stats()
+    await ble.disconnect()
+
+    # samples on the queue, by tag
+    queued = {}
+    while not data_queue.empty():
+        item = data_queue.get_nowait()
+        queued[item_device(item)] = queued.get(item_device(item), 0) + len(item)
+
+    rates = [s["samples_per_sec"] for s in stats.values()]
+    return {
+        "devices": args.devices,
+        "mode": args.mode,
+        "odr_hz": args.odr,
+        "gatt_operations": ble.scheduler.operations,
+        "min_samples_per_sec": round(min(rates), 1),
+        "max_samples_per_sec": round(max(rates), 1),
+        "per_device": {
+            addr: {
+                "samples": s["samples"],
+                "samples_per_sec": round(s["samples_per_sec"], 1),
+                "queued": queued.get(addr, 0),
+            }
+            for addr, s in stats.items()
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=6)
+    parser.add_argument("--mode", default="notify", choices=("poll", "notify", "packed"))
+    parser.add_argument("--odr", type=float, default=200.0)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--read-latency", type=float, default=0.0075)
+    parser.add_argument("--max-in-flight", type=int, default=1,
+                        help="GATT operations allowed at once across devices")
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
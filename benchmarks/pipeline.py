@@ -0,0 +1,232 @@
+"""
+End-to-end acquisition benchmark:
+simulated peripheral -> BLEImuManager -> asyncio.Queue -> plot_2d_data -> BinaryRecorder.
+
+Runs headless (offscreen Qt) and prints one JSON document per run with
+throughput, sample age at render and at disk (p50/p99), queue high-water mark,
+dropped samples and CPU time per stage.
+
+Usage:
+    python -m benchmarks.pipeline [--mode notify] [--odr 1000 2000] [--seconds 5]
+                                  [--samples-per-payload 8] [--notify-batch 1]
+                                  [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+from qasync import QEventLoop
+
+from bluetooth.ble_imu_manager import BLEImuManager
+from bluetooth.device_session import STREAM_MODE_PACKED
+from bluetooth.simulated import SimulatedPeripheral, SimulatedTransport
+from core.device_profiles import AVAILABLE_DEVICES, IMU_DEVICE, PACKED_IMU_DEVICE
+from core.samples import as_batch
+from gui.main_window import MainWindow
+from plotting.visualization import plot_2d_data
+from recording.recorder import BinaryRecorder
+from benchmarks.stream_modes import connect_profile
+
+# device clock in microseconds so sample ages are not quantized to 1 ms
+TIME_SCALE = 1_000_000
+
+
+def percentiles(chunks):
+    if not chunks:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    ages = np.concatenate(chunks) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ages, 50)), 3),
+        "p99_ms": round(float(np.percentile(ages, 99)), 3),
+        "max_ms": round(float(ages.max()), 3),
+    }
+
+
+class InstrumentedQueue(asyncio.Queue):
+    """
+    asyncio.Queue recording its depth, the time spent putting and the age of
+    every sample when the plotter takes it.
+    """
+
+    def __init__(self, peripheral):
+        super().__init__()
+        self.peripheral = peripheral
+        self.high_water = 0
+        self.put_time = 0.0
+        self.render_ages = []
+
+    def put_nowait(self, item):
+        start = time.perf_counter()
+        super().put_nowait(item)
+        self.high_water = max(self.high_water, self.qsize())
+        self.put_time += time.perf_counter() - start
+
+    def get_nowait(self):
+        item = super().get_nowait()
+        batch = as_batch(item)
+        self.render_ages.append(time.perf_counter() - self.peripheral.host_time_of(batch["t"]))
+        return item
+
+
+class InstrumentedRecorder(BinaryRecorder):
+    """
+    BinaryRecorder recording sample age on disk and the writer thread's CPU time.
+    """
+
+    def __init__(self, peripheral, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.peripheral = peripheral
+        self.disk_ages = []
+        self.writer_cpu = 0.0
+
+    def _writer_loop(self):
+        start = time.thread_time()
+        try:
+            super()._writer_loop()
+        finally:
+            self.writer_cpu = time.thread_time() - start
+
+    def _write(self, stream, data, now):
+        super()._write(stream, data, now)
+        self.disk_ages.append(time.perf_counter() - self.peripheral.host_time_of(data["t"]))
+
+
+async def run_once(args, odr):
+    profile = IMU_DEVICE
+    if args.mode == STREAM_MODE_PACKED:
+        profile = dict(PACKED_IMU_DEVICE)
+        profile["PACKED_LAYOUT"] = dict(
+            profile["PACKED_LAYOUT"], samples_per_payload=args.samples_per_payload
+        )
+
+    peripheral = SimulatedPeripheral(
+        profile,
+        odr=odr,
+        read_latency=args.read_latency,
+        notify_batch=args.notify_batch,
+        time_scale=TIME_SCALE,
+    )
+    ble = BLEImuManager(transport=SimulatedTransport([peripheral]))
+    data_queue = InstrumentedQueue(peripheral)
+    recorder = InstrumentedRecorder(peripheral, tempfile.mkdtemp(prefix="imu-bench-"))
+
+    gui = MainWindow(AVAILABLE_DEVICES)
+    gui.show()
+
+    # time spent in full canvas draws, outside the plot timer callback
+    draw_time = 0.0
+    canvas_draw = gui.canvas.draw
+
+    def timed_draw():
+        nonlocal draw_time
+        start = time.perf_counter()
+        canvas_draw()
+        draw_time += time.perf_counter() - start
+
+    gui.canvas.draw = timed_draw
+
+    counter = await plot_2d_data(gui.ax, gui.canvas, data_queue, recorder=recorder)
+    recorder.start(device_profile="benchmark")
+
+    main_cpu_start = time.thread_time()
+    process_cpu_start = time.process_time()
+
+    await connect_profile(ble, profile, data_queue, args.mode)
+    samples_at_start = peripheral.samples_sent
+    started = time.perf_counter()
+
+    await asyncio.sleep(args.seconds)
+
+    elapsed = time.perf_counter() - started
+    await ble.disconnect()
+    await asyncio.sleep(0.1)  # let the plotter drain the queue
+    recorder.stop()
+
+    main_cpu = time.thread_time() - main_cpu_start
+    process_cpu = time.process_time() - process_cpu_start
+    render_cpu = counter.total_tick_time + draw_time
+    gui.close()
+    gui.deleteLater()
+
+    produced = peripheral.samples_sent
+    return {
+        "mode": ble.stream_mode,
+        "odr_hz": odr,
+        "seconds": round(elapsed, 3),
+        "samples_produced": produced,
+        "samples_received": ble.stream_stats["samples"],
+        "samples_rendered": counter.samples,
+        "samples_written": recorder.samples_written,
+        "dropped": produced - recorder.samples_written,
+        "throughput_sps": {
+            "acquired": round((produced - samples_at_start) / elapsed, 1),
+            "rendered": round(counter.samples / elapsed, 1),
+            "written": round(recorder.samples_written / elapsed, 1),
+        },
+        "age_at_render": percentiles(data_queue.render_ages),
+        "age_at_disk": percentiles(recorder.disk_ages),
+        "queue_high_water": data_queue.high_water,
+        "fps": round(counter.fps(), 1),
+        "cpu_s": {
+            "process": round(process_cpu, 3),
+            "event_loop_thread": round(main_cpu, 3),
+            "render": round(render_cpu, 3),
+            "queue_put": round(data_queue.put_time, 3),
+            "acquisition_other": round(max(0.0, main_cpu - render_cpu - data_queue.put_time), 3),
+            "writer_thread": round(recorder.writer_cpu, 3),
+        },
+        "bytes_written": recorder.bytes_written,
+        "threads": threading.active_count(),
+    }
+
+
+async def run_all(args):
+    results = []
+    for odr in args.odr:
+        results.append(await run_once(args, odr))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="notify", choices=("poll", "notify", "packed"))
+    parser.add_argument("--odr", type=float, nargs="+", default=[1000.0],
+                        help="device output data rates (Hz) to run")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--read-latency", type=float, default=0.0075)
+    parser.add_argument("--samples-per-payload", type=int, default=8)
+    parser.add_argument("--notify-batch", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    loop = QEventLoop(app)
+    asyncio.set_event_loop(loop)
+
+    with loop:
+        results = loop.run_until_complete(run_all(args))
+
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
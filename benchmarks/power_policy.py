@@ -0,0 +1,167 @@
+"""
+Automatic power-mode switching (bluetooth.power_policy) end to end: a
+simulated peripheral scripted through phases of rest and motion streams to
+BLEImuManager, a PowerModeController watches the stream and writes the power
+mode, and the peripheral changes its output rate with it.
+
+Reports the mode changes the peripheral saw, how long after a phase started
+the mode followed it (wake / sleep latency), switches no phase change called
+for, the duty cycle (share of time in HIGH power mode) against the share of
+time in motion, the samples (airtime) saved against staying in HIGH power
+mode, and the CPU cost of the activity metric per queue item.
+
+Usage:
+    python -m benchmarks.power_policy [--phases 6 6 6 3 6] [--odr 200] [--low-odr 10]
+                                      [--mode notify] [--min-dwell 2]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from benchmarks.stream_modes import connect_profile
+from bluetooth.ble_imu_manager import BLEImuManager
+from bluetooth.device_session import STREAM_MODE_NOTIFY, STREAM_MODE_PACKED, STREAM_MODE_POLL
+from bluetooth.power_policy import MODE_HIGH, MODE_LOW, MODE_NAMES, ActivityMeter, PowerModeController, PowerPolicy
+from bluetooth.simulated import SimulatedPeripheral, SimulatedTransport
+from core.device_profiles import IMU_DEVICE, PACKED_IMU_DEVICE
+from core.samples import SAMPLE_DTYPE
+
+
+class PhasedMotion:
+    """
+    Rest (gravity on z, sensor noise) and motion (swinging, rotating) phases
+    alternating, starting at rest; callable(seconds) -> six axes (g, deg/s).
+    """
+
+    def __init__(self, durations, seed=0):
+        self.bounds = np.cumsum(durations)
+        self.rng = np.random.default_rng(seed)
+
+    def moving(self, seconds):
+        return np.searchsorted(self.bounds, seconds, side="right") % 2 == 1
+
+    def __call__(self, seconds):
+        moving = self.moving(seconds)
+        noise = self.rng.normal(0.0, 1.0, size=(6, len(seconds)))
+        axes = noise * np.array([[0.003], [0.003], [0.003], [0.3], [0.3], [0.3]])
+        axes[2] += 1.0
+
+        swing = np.sin(2 * np.pi * 1.5 * seconds)
+        axes[0] += np.where(moving, 0.4 * swing, 0.0)
+        axes[2] += np.where(moving, 0.2 * np.cos(2 * np.pi * 3.0 * seconds), 0.0)
+        axes[3] += np.where(moving, 90.0 * swing, 0.0)
+        axes[5] += np.where(moving, 30.0 * np.cos(2 * np.pi * 0.7 * seconds), 0.0)
+        return axes
+
+
+def follow_latencies(starts, changes, mode):
+    """
+    Seconds from each phase start to the first change into mode after it
+    (None when the mode never followed).
+    """
+    latencies = []
+    for start in starts:
+        after = [t - start for t, m in changes if m == mode and t >= start]
+        latencies.append(round(min(after), 3) if after else None)
+    return latencies
+
+
+def time_in_high(changes, start, end, initial=MODE_HIGH):
+    high = 0.0
+    mode, since = initial, start
+    for t, m in changes:
+        if mode == MODE_HIGH:
+            high += t - since
+        mode, since = m, t
+    if mode == MODE_HIGH:
+        high += end - since
+    return high
+
+
+def meter_cost(batch_size, odr, repeat=2000):
+    meter = ActivityMeter()
+    batch = np.zeros(batch_size * repeat, dtype=SAMPLE_DTYPE)
+    batch["t"] = np.arange(len(batch)) * (1000.0 / odr)
+    batch["az"] = 1.0
+    start = time.process_time()
+    for first in range(0, len(batch), batch_size):
+        meter.update(batch[first:first + batch_size])
+        meter.activity()
+    return 1e6 * (time.process_time() - start) / repeat
+
+
+async def run(args):
+    profile = PACKED_IMU_DEVICE if args.mode == STREAM_MODE_PACKED else IMU_DEVICE
+    motion = PhasedMotion(args.phases)
+    peripheral = SimulatedPeripheral(profile, odr=args.odr, low_power_odr=args.low_odr, motion=motion)
+    ble = BLEImuManager(transport=SimulatedTransport([peripheral]))
+
+    log = []
+    controller = PowerModeController(
+        lambda address, mode: ble.set_power_mode(profile["POWER_MODE_UUID"], mode, address),
+        policy_factory=lambda: PowerPolicy(min_dwell=args.min_dwell),
+        status=log.append,
+    )
+    items = []
+
+    class Queue:
+        def put_nowait(self, item):
+            items.append(len(item))
+            controller.submit(item)
+
+        async def put(self, item):
+            self.put_nowait(item)
+
+    await connect_profile(ble, profile, Queue(), args.mode)
+    origin = peripheral._clock_origin
+    total = float(np.sum(args.phases))
+    await asyncio.sleep(origin + total - time.perf_counter())
+    end = time.perf_counter()
+    samples = ble.stream_stats["samples"]
+    await ble.disconnect()
+
+    # phase boundaries in host time (the device clock started with the first sample)
+    bounds = origin + np.concatenate(([0.0], np.cumsum(args.phases)))[:-1]
+    active_starts, rest_starts = bounds[1::2], bounds[2::2]
+    changes = [(t, m) for t, m in peripheral.power_mode_changes if t <= end]
+    expected = len(active_starts) + len(rest_starts) + 1  # the first rest too
+
+    policy = controller.policies[peripheral.device.address]
+    moving_seconds = float(np.sum(args.phases[1::2]))
+    return {
+        "mode": args.mode,
+        "phases_s": args.phases,
+        "odr_hz": {"high": args.odr, "low": args.low_odr},
+        "min_dwell_s": args.min_dwell,
+        "transitions": [
+            {"t": round(t - origin, 3), "mode": MODE_NAMES[m]} for t, m in changes
+        ],
+        "wake_latency_s": follow_latencies(active_starts, changes, MODE_HIGH),
+        "sleep_latency_s": follow_latencies(rest_starts, changes, MODE_LOW),
+        "spurious_switches": max(0, len(changes) - expected),
+        "logged_transitions": len(log),
+        "duty_cycle": {
+            "controller": round(policy.duty_cycle(end), 3),
+            "peripheral": round(time_in_high(changes, origin, end) / (end - origin), 3),
+            "in_motion": round(moving_seconds / total, 3),
+        },
+        "samples": samples,
+        "samples_if_always_high": int(args.odr * total),
+        "airtime_saved": round(1.0 - samples / (args.odr * total), 3),
+        "activity_us_per_item": round(meter_cost(max(1, int(np.median(items))), args.odr), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phases", type=float, nargs="+", default=[6.0, 6.0, 6.0, 3.0, 6.0],
+                        help="seconds of each phase, alternating rest and motion, starting at rest")
+    parser.add_argument("--odr", type=float, default=200.0, help="HIGH power mode sample rate")
+    parser.add_argument("--low-odr", type=float, default=10.0, help="LOW power mode sample rate")
+    parser.add_argument("--mode", choices=(STREAM_MODE_POLL, STREAM_MODE_NOTIFY, STREAM_MODE_PACKED),
+                        default=STREAM_MODE_NOTIFY)
+    parser.add_argument("--min-dwell", type=float, default=2.0)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
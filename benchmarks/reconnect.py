@@ -0,0 +1,70 @@
+"""
+Stream continuity across RF dropouts: a simulated peripheral drops its link
+every --drop-every seconds and refuses connections for --outage seconds after
+each drop. Compares a session with and without the reconnect supervisor.
+
+Usage:
+    python -m benchmarks.reconnect [--seconds 6] [--drop-every 1.5] [--outage 0.5] [--odr 200]
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.stream_modes import connect_profile
+from bluetooth.ble_imu_manager import BLEImuManager
+from bluetooth.device_session import STREAM_MODE_PACKED
+from bluetooth.simulated import simulated_transport
+from core.device_profiles import PACKED_IMU_DEVICE
+from core.samples import item_gap
+
+PROFILE = PACKED_IMU_DEVICE
+
+
+async def run_session(auto_reconnect, args):
+    ble = BLEImuManager(
+        transport=simulated_transport(
+            PROFILE, odr=args.odr, disconnect_after=args.drop_every, outage=args.outage
+        ),
+        auto_reconnect=auto_reconnect,
+    )
+    data_queue = asyncio.Queue()
+    await connect_profile(ble, PROFILE, data_queue, STREAM_MODE_PACKED)
+    await asyncio.sleep(args.seconds)
+    stats = ble.device_stats()
+    await ble.disconnect()
+
+    samples = 0
+    gaps = []
+    while not data_queue.empty():
+        item = data_queue.get_nowait()
+        samples += len(item)
+        if item_gap(item) is not None:
+            gaps.append(round(item_gap(item), 3))
+
+    device = next(iter(stats.values()))
+    return {
+        "auto_reconnect": auto_reconnect,
+        "samples": samples,
+        "captured_pct": round(100.0 * samples / (args.seconds * args.odr), 1),
+        "reconnects": device["reconnects"],
+        "gap_markers_s": gaps,
+        "state_at_end": device["state"],
+    }
+
+
+async def run(args):
+    return {
+        "seconds": args.seconds,
+        "drop_every_s": args.drop_every,
+        "outage_s": args.outage,
+        "results": [await run_session(auto, args) for auto in (False, True)],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--drop-every", type=float, default=1.5)
+    parser.add_argument("--outage", type=float, default=0.5)
+    parser.add_argument("--odr", type=float, default=200.0)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
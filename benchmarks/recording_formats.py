@@ -0,0 +1,174 @@
+"""
+Size and speed of the recording formats for a long IMU session: the legacy
+CSV log, fixed-width binary (.imu) and chunked compressed (.imuz, with and
+without int16 quantization, zlib and lzma).
+
+The synthetic session is --seconds of 1 kHz motion whose values are whole
+multiples of a 16-bit sensor's LSB (+-4 g, +-500 deg/s), like real sensor
+output, so quantizing to that LSB is lossless.
+
+Usage:
+    python -m benchmarks.recording_formats [--seconds 600] [--odr 1000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from core.samples import SAMPLE_DTYPE
+from recording.compressed import CODEC_LZMA, CODEC_ZLIB, CompressedRecording, CompressedWriter
+from recording.format import encode_header, make_header
+from recording.reader import Recording, iter_csv_chunks
+
+ACCEL_LSB = 4.0 / 32768   # g
+GYRO_LSB = 500.0 / 32768  # deg/s
+
+QUANTIZATION = {"ax": ACCEL_LSB, "ay": ACCEL_LSB, "az": ACCEL_LSB, "gx": GYRO_LSB, "gy": GYRO_LSB, "gz": GYRO_LSB}
+
+# samples handed to a writer at a time, like the recorder's flushes
+WRITE_BATCH = 4096
+
+# span read back at random positions (ms)
+RANDOM_READ_MS = 1000
+
+
+def make_session(seconds, odr):
+    count = int(seconds * odr)
+    rng = np.random.default_rng(1)
+    t = np.arange(count) * (1000.0 / odr)
+    records = np.zeros(count, dtype=SAMPLE_DTYPE)
+    # millisecond counter with the jitter of a real device clock
+    records["t"] = np.maximum.accumulate(np.rint(t + rng.integers(0, 2, count)).astype(np.uint64))
+
+    phase = t / 1000.0
+    motion = {
+        "ax": 0.3 * np.sin(2 * np.pi * 0.7 * phase),
+        "ay": 0.2 * np.sin(2 * np.pi * 1.3 * phase + 1.0),
+        "az": 1.0 + 0.05 * np.sin(2 * np.pi * 0.2 * phase),
+        "gx": 40.0 * np.sin(2 * np.pi * 0.5 * phase),
+        "gy": 25.0 * np.cos(2 * np.pi * 0.9 * phase),
+        "gz": 10.0 * np.sin(2 * np.pi * 0.1 * phase + 2.0),
+    }
+    for name, values in motion.items():
+        lsb = QUANTIZATION[name]
+        noise = rng.normal(0.0, 4.0, count)  # a few LSB of sensor noise
+        records[name] = np.rint(values / lsb + noise) * lsb
+    return records
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def random_reads(read, records, count=20):
+    """
+    Median time to read RANDOM_READ_MS of samples at random positions.
+    """
+    rng = np.random.default_rng(2)
+    t = records["t"]
+    durations = []
+    for start in rng.uniform(t[0], t[-1] - RANDOM_READ_MS, count):
+        _, elapsed = timed(lambda: read(int(start), int(start) + RANDOM_READ_MS))
+        durations.append(elapsed)
+    return float(np.median(durations))
+
+
+def max_error(decoded, records):
+    return max(float(np.max(np.abs(decoded[name].astype(np.float64) - records[name]))) for name in QUANTIZATION)
+
+
+def result(path, records, encode_s, decoded, decode_s, read_s, raw_size):
+    size = os.path.getsize(path)
+    return {
+        "bytes": size,
+        "bytes_per_sample": round(size / len(records), 2),
+        "ratio_vs_raw": round(raw_size / size, 2),
+        "encode_msamples_per_s": round(len(records) / encode_s / 1e6, 2),
+        "decode_msamples_per_s": round(len(records) / decode_s / 1e6, 2),
+        "random_read_1s_ms": round(read_s * 1000, 3) if read_s is not None else None,
+        "max_abs_error": max_error(decoded, records),
+        "time_stamps_exact": bool(np.array_equal(decoded["t"], records["t"])),
+    }
+
+
+def bench_raw(records, directory):
+    path = os.path.join(directory, "session.imu")
+
+    def encode():
+        with open(path, "wb") as f:
+            f.write(encode_header(make_header("benchmark", 0.0)))
+            for start in range(0, len(records), WRITE_BATCH):
+                f.write(records[start:start + WRITE_BATCH].tobytes())
+
+    _, encode_s = timed(encode)
+    decoded, decode_s = timed(lambda: np.array(Recording.open(path).samples))
+    recording = Recording.open(path)
+    read_s = random_reads(lambda t0, t1: np.array(recording.time_slice(t0, t1)), records)
+    return path, encode_s, decoded, decode_s, read_s
+
+
+def bench_csv(records, directory):
+    path = os.path.join(directory, "accel_log.csv")
+
+    def encode():
+        with open(path, "w") as f:
+            f.write("time,accel_x,accel_y,accel_z,gyro_x,gyro_y,gyro_z\n")
+            for start in range(0, len(records), WRITE_BATCH):
+                chunk = records[start:start + WRITE_BATCH]
+                table = np.column_stack([chunk["t"]] + [chunk[name] for name in QUANTIZATION])
+                np.savetxt(f, table, delimiter=",", fmt=["%d"] + ["%.7g"] * 6)
+
+    _, encode_s = timed(encode)
+    decoded, decode_s = timed(lambda: np.concatenate(list(iter_csv_chunks(path))))
+    return path, encode_s, decoded, decode_s, None
+
+
+def bench_compressed(records, directory, codec, quantization):
+    path = os.path.join(directory, f"session_{codec}{'_q' if quantization else ''}.imuz")
+
+    def encode():
+        writer = CompressedWriter(path, make_header("benchmark", 0.0), codec, quantization=quantization)
+        for start in range(0, len(records), WRITE_BATCH):
+            writer.write(records[start:start + WRITE_BATCH])
+        writer.close()
+
+    _, encode_s = timed(encode)
+    decoded, decode_s = timed(lambda: CompressedRecording(path).samples)
+    recording = CompressedRecording(path)
+    read_s = random_reads(recording.time_slice, records)
+    return path, encode_s, decoded, decode_s, read_s
+
+
+def run(args):
+    records = make_session(args.seconds, args.odr)
+    directory = tempfile.mkdtemp()
+
+    benches = {
+        "csv": lambda: bench_csv(records, directory),
+        "raw_imu": lambda: bench_raw(records, directory),
+        "imuz_zlib": lambda: bench_compressed(records, directory, CODEC_ZLIB, None),
+        "imuz_zlib_int16": lambda: bench_compressed(records, directory, CODEC_ZLIB, QUANTIZATION),
+        "imuz_lzma_int16": lambda: bench_compressed(records, directory, CODEC_LZMA, QUANTIZATION),
+    }
+
+    results = {}
+    raw_size = None
+    for name in ("raw_imu", "csv", "imuz_zlib", "imuz_zlib_int16", "imuz_lzma_int16"):
+        path, encode_s, decoded, decode_s, read_s = benches[name]()
+        raw_size = raw_size or os.path.getsize(path)
+        results[name] = result(path, records, encode_s, decoded, decode_s, read_s, raw_size)
+        os.remove(path)
+
+    return {"samples": len(records), "seconds": args.seconds, "odr_hz": args.odr, "formats": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=600.0)
+    parser.add_argument("--odr", type=float, default=1000.0)
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,90 @@
+"""
+Measure live plot frame rate while samples arrive at a fixed input rate.
+Runs headless with the offscreen Qt platform.
+
+Usage:
+    python -m benchmarks.render_fps [--seconds 5] [--rate 1000] [--capacity 5000] [--no-lod]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from qasync import QEventLoop
+
+from core.device_profiles import AVAILABLE_DEVICES
+from gui.main_window import MainWindow
+from plotting.visualization import MAX_NUM_DATA_PLOT, plot_2d_data
+
+
+async def produce(data_queue, rate, seconds):
+    """
+    Put single-sample tuples on the queue at `rate` Hz, like the notify stream does.
+    """
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return sent
+        due = int(elapsed * rate)
+        while sent < due:
+            value = float(sent % 200) / 100.0
+            data_queue.put_nowait((value, -value, 1.0, 0.0, 0.0, 0.0, sent * 1000 // int(rate)))
+            sent += 1
+        await asyncio.sleep(0.001)
+
+
+async def run(args):
+    gui = MainWindow(AVAILABLE_DEVICES)
+    gui.show()
+
+    data_queue = asyncio.Queue()
+    counter = await plot_2d_data(gui.ax, gui.canvas, data_queue, capacity=args.capacity, lod=not args.no_lod)
+
+    sent = await produce(data_queue, args.rate, args.seconds)
+    await asyncio.sleep(0.2)
+    gui.close()
+
+    return {
+        "input_rate_hz": args.rate,
+        "capacity": args.capacity,
+        "lod": not args.no_lod,
+        "seconds": args.seconds,
+        "samples_sent": sent,
+        "samples_rendered": counter.samples,
+        "queue_backlog": data_queue.qsize(),
+        "frames": counter.frames,
+        "fps": round(counter.fps(), 1),
+        "max_tick_ms": round(counter.max_tick_time * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=1000.0, help="input sample rate (Hz)")
+    parser.add_argument("--capacity", type=int, default=MAX_NUM_DATA_PLOT, help="samples kept for the plot")
+    parser.add_argument("--no-lod", action="store_true", help="draw every sample, without decimation")
+    args = parser.parse_args()
+
+    # the plotter writes accel_log.csv into the working directory
+    os.chdir(tempfile.mkdtemp())
+
+    app = QApplication(sys.argv)
+    loop = QEventLoop(app)
+    asyncio.set_event_loop(loop)
+
+    with loop:
+        result = loop.run_until_complete(run(args))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+CPU cost of the streaming spectral analysis (core.spectral) per second of
+3-axis data, and the memory it allocates once running (tracemalloc).
+
+Three costs are reported: the whole SpectralStage (time stamp reconstruction
+included), its SlidingSpectrum alone, and the same frames recomputed from
+scratch (window from a fresh copy of the newest samples, new window, new
+output arrays) for comparison with the SlidingSpectrum.
+
+Usage:
+    python -m benchmarks.spectral [--seconds 60] [--odr 1000 4000] [--window 256 1024] [--batch 8]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.samples import SAMPLE_DTYPE
+from core.spectral import AXES, DEFAULT_OVERLAP, SlidingSpectrum, SpectralStage
+
+# tones put on the axes (Hz, as a fraction of the sample rate)
+TONES = (0.0373, 0.12, 0.251)
+
+
+def make_stream(seconds, odr):
+    count = int(seconds * odr)
+    rng = np.random.default_rng(3)
+    batch = np.zeros(count, dtype=SAMPLE_DTYPE)
+    batch["t"] = np.arange(count)
+    t = np.arange(count) / odr
+    for axis, tone in zip(AXES, TONES):
+        batch[axis] = np.sin(2 * np.pi * tone * odr * t) + rng.normal(0.0, 0.1, count)
+    return batch
+
+
+def run_stage(stream, odr, window, batch_size):
+    stage = SpectralStage(window_size=window, time_scale=1.0 / odr, nominal_rate=odr)
+    start = time.process_time()
+    for first in range(0, len(stream), batch_size):
+        stage.analyse("bench", stream[first:first + batch_size])
+    return time.process_time() - start, stage
+
+
+def batches(stream, odr, batch_size):
+    """
+    (axis columns, seconds) per batch, as SpectralStage hands them over.
+    """
+    seconds = stream["t"] / odr
+    return [
+        ([stream[axis][first:first + batch_size] for axis in AXES], seconds[first:first + batch_size])
+        for first in range(0, len(stream), batch_size)
+    ]
+
+
+def run_spectrum(fed, odr, window):
+    spectrum = SlidingSpectrum(odr, window)
+    start = time.process_time()
+    for values, seconds in fed:
+        spectrum.update(values, seconds)
+    return time.process_time() - start, spectrum.frames
+
+
+def run_from_scratch(fed, odr, window):
+    """
+    Same frames, each computed from newly allocated arrays.
+    """
+    hop = max(1, round(window * (1.0 - DEFAULT_OVERLAP)))
+    history = []
+    frames = 0
+    since_frame = 0
+    start = time.process_time()
+    for values, seconds in fed:
+        history.append(np.stack(values).astype(np.float64))
+        since_frame += len(seconds)
+        while since_frame >= hop:
+            since_frame -= hop
+            recent = np.concatenate(history, axis=1)[:, -window:]
+            history = [recent]
+            if recent.shape[1] < window:
+                continue
+            frame = (recent - recent.mean(axis=1, keepdims=True)) * np.hanning(window)
+            power = np.abs(np.fft.rfft(frame, axis=1)) ** 2 / (odr * np.sum(np.hanning(window) ** 2))
+            np.argmax(power[:, 1:], axis=1)
+            frames += 1
+    return time.process_time() - start, frames
+
+
+def steady_state_allocation(stage, stream, batch_size):
+    """
+    Largest amount of memory held at once while analysing another second of
+    data, beyond what was held before.
+    """
+    spectrum = stage.spectra["bench"]
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    frames_before = spectrum.frames
+    for first in range(0, len(stream), batch_size):
+        stage.analyse("bench", stream[first:first + batch_size])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - before, spectrum.frames - frames_before
+
+
+def run(args):
+    results = []
+    for odr in args.odr:
+        stream = make_stream(args.seconds, odr)
+        for window in args.window:
+            stage_s, stage = run_stage(stream, odr, window, args.batch)
+            fed = batches(stream, odr, args.batch)
+            spectrum_s, _ = run_spectrum(fed, odr, window)
+            scratch_s, _ = run_from_scratch(fed, odr, window)
+            spectrum = stage.spectra["bench"]
+            peak_bytes, frames = steady_state_allocation(stage, stream[:int(odr)], args.batch)
+            results.append({
+                "odr_hz": odr,
+                "window": window,
+                "hop": spectrum.hop,
+                "frames_per_s": round(odr / spectrum.hop, 1),
+                "stage_cpu_ms_per_data_s": round(1000 * stage_s / args.seconds, 2),
+                "spectrum_cpu_ms_per_data_s": round(1000 * spectrum_s / args.seconds, 2),
+                "from_scratch_cpu_ms_per_data_s": round(1000 * scratch_s / args.seconds, 2),
+                "steady_state_peak_bytes": peak_bytes,
+                "steady_state_frames": frames,
+                "dominant_hz": [round(f, 1) for f in spectrum.dominant],
+                "expected_hz": [round(tone * odr, 1) for tone in TONES],
+            })
+    return {"seconds": args.seconds, "batch": args.batch, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--odr", type=float, nargs="+", default=[1000.0, 4000.0])
+    parser.add_argument("--window", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--batch", type=int, default=8, help="samples per queue item")
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,99 @@
+"""
+Cold-start time of the GUI application: time until the main window is shown
+and until it is usable (plot canvas drawn), split into interpreter start-up
+and main.py's own phases, plus the import time per top-level package. Runs main.py --profile-startup headless in a
+fresh interpreter, --runs times, and reports the median run.
+
+With --budget the exit status is 1 when the median time to a usable window exceeds it,
+so the check can run in CI.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--budget 1.5] [--isolated] [--top 10]
+"""
+import argparse
+import collections
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from core.startup import READY_PHASE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_import_times(stderr):
+    """
+    Self time (s) per top-level package from -X importtime output.
+    """
+    packages = collections.Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us) / 1e6
+    return packages
+
+
+def run_once(isolated, log_dir):
+    command = [
+        sys.executable, "-X", "importtime", os.path.join(ROOT, "main.py"),
+        "--profile-startup", "--log-file", os.path.join(log_dir, "central.log"),
+    ]
+    if isolated:
+        command.append("--isolated")
+
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    spawned = time.time()
+    result = subprocess.run(command, cwd=log_dir, env=env, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"main.py exited with {result.returncode}:\n{result.stderr[-2000:]}")
+
+    profile = json.loads(next(line for line in result.stdout.splitlines() if line.startswith("{")))
+    phases = {entry["phase"]: entry["total_seconds"] for entry in profile["phases"]}
+    interpreter = profile["origin_time"] - spawned
+    return {
+        "time_to_window_s": interpreter + phases["window shown"],
+        "time_to_usable_s": interpreter + phases[READY_PHASE],
+        "interpreter_s": interpreter,
+        "phases": {entry["phase"]: entry["seconds"] for entry in profile["phases"]},
+        "imports": parse_import_times(result.stderr),
+    }
+
+
+def run(args):
+    log_dir = tempfile.mkdtemp()
+    runs = sorted((run_once(args.isolated, log_dir) for _ in range(args.runs)), key=lambda r: r["time_to_usable_s"])
+    median = runs[len(runs) // 2]
+
+    return {
+        "isolated": args.isolated,
+        "runs": args.runs,
+        "time_to_window_s": round(median["time_to_window_s"], 3),
+        "time_to_usable_s": round(median["time_to_usable_s"], 3),
+        "time_to_usable_all_s": [round(r["time_to_usable_s"], 3) for r in runs],
+        "spread_s": round(statistics.pstdev(r["time_to_usable_s"] for r in runs), 3),
+        "interpreter_s": round(median["interpreter_s"], 3),
+        "phases_s": {phase: round(seconds, 3) for phase, seconds in median["phases"].items()},
+        "slowest_imports_s": {
+            package: round(seconds, 3) for package, seconds in median["imports"].most_common(args.top)
+        },
+        "budget_s": args.budget,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, help="seconds allowed until the window is usable")
+    parser.add_argument("--isolated", action="store_true", help="start with the acquisition process")
+    parser.add_argument("--top", type=int, default=10, help="packages listed by import time")
+    result = run(parser.parse_args())
+    print(json.dumps(result, indent=2))
+
+    if result["budget_s"] is not None and result["time_to_usable_s"] > result["budget_s"]:
+        print(f"Over budget: {result['time_to_usable_s']} s > {result['budget_s']} s", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,87 @@
+"""
+Compare the polling, notification and packed stream modes of BLEImuManager
+against a simulated peripheral (no Bluetooth adapter needed).
+
+Usage:
+    python -m benchmarks.stream_modes [--seconds 3] [--read-latency 0.0075] [--odr 200]
+                                      [--samples-per-payload 8] [--notify-batch 1]
+"""
+import argparse
+import asyncio
+import json
+
+from bluetooth.ble_imu_manager import BLEImuManager
+from bluetooth.device_session import STREAM_MODE_NOTIFY, STREAM_MODE_PACKED, STREAM_MODE_POLL
+from bluetooth.simulated import SimulatedPeripheral, SimulatedTransport
+from core.device_profiles import IMU_DEVICE, PACKED_IMU_DEVICE
+
+
+async def connect_profile(ble, profile, data_queue, stream_mode):
+    await ble.connect(
+        data_queue,
+        profile["SERVICE_UUID"],
+        profile.get("TIME_UUID"),
+        profile.get("ACCEL_X_UUID"),
+        profile.get("ACCEL_Y_UUID"),
+        profile.get("ACCEL_Z_UUID"),
+        profile.get("GYRO_X_UUID"),
+        profile.get("GYRO_Y_UUID"),
+        profile.get("GYRO_Z_UUID"),
+        stream_mode=stream_mode,
+        packed_uuid=profile.get("PACKED_UUID"),
+        packed_layout=profile.get("PACKED_LAYOUT"),
+    )
+
+
+async def run_mode(mode, args):
+    profile = IMU_DEVICE
+    if mode == STREAM_MODE_PACKED:
+        profile = dict(PACKED_IMU_DEVICE)
+        profile["PACKED_LAYOUT"] = dict(
+            profile["PACKED_LAYOUT"], samples_per_payload=args.samples_per_payload
+        )
+
+    peripheral = SimulatedPeripheral(
+        profile,
+        odr=args.odr,
+        read_latency=args.read_latency,
+        notify_batch=args.notify_batch,
+    )
+    ble = BLEImuManager(transport=SimulatedTransport([peripheral]))
+    data_queue = asyncio.Queue()
+
+    await connect_profile(ble, profile, data_queue, mode)
+    await asyncio.sleep(args.seconds)
+    rate = ble.samples_per_sec()
+    await ble.disconnect()
+
+    return {
+        "mode": ble.stream_mode,
+        "samples": ble.stream_stats["samples"],
+        "samples_per_sec": round(rate, 1),
+        "queue_items": data_queue.qsize(),
+        "gatt_reads": peripheral.reads,
+        "mean_skew_ms": round(ble.mean_skew() * 1000, 3),
+        "max_skew_ms": round(ble.stream_stats["max_skew"] * 1000, 3),
+    }
+
+
+async def main_async(args):
+    results = []
+    for mode in (STREAM_MODE_POLL, STREAM_MODE_NOTIFY, STREAM_MODE_PACKED):
+        results.append(await run_mode(mode, args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--read-latency", type=float, default=0.0075,
+                        help="seconds per GATT read round trip")
+    parser.add_argument("--odr", type=float, default=200.0,
+                        help="device output data rate (Hz)")
+    parser.add_argument("--samples-per-payload", type=int, default=8,
+                        help="samples per notification in packed mode")
+    parser.add_argument("--notify-batch", type=int, default=1,
+                        help="samples delivered per notification burst")
+    asyncio.run(main_async(parser.parse_args()))
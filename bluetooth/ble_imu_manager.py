@@ -19,38 +19,205 @@
 # -------------------------------------------
 
 
-import asyncio, struct
-from PySide6.QtCore import QObject, Signal
-from bleak import BleakScanner, BleakClient
+import asyncio
+import time
 
-class BLEImuManager(QObject):
-    status = Signal(str)
+from bluetooth.discovery import DiscoveryCache
+from bluetooth.device_session import DeviceSession, STREAM_MODE_POLL
+from bluetooth.reconnect import Backoff
+from bluetooth.scheduler import GattScheduler
+from bluetooth.transport import BleakTransport
+from core.device_profiles import as_profile
+from core.observer import Observable
 
-    def __init__(self):
-        super().__init__()
-        self.client = None
-        self.is_connected = False
-        self.read_task = None
+# seconds a Scan collects advertisements, and the longest a connect waits for its device
+SCAN_TIMEOUT = 5.0
 
+# seconds the scanner keeps running after a Scan that found devices, so a
+# connect soon after finds them cached; an idle window stops scanning then
+DISCOVERY_LINGER = 60.0
+
+
+class BLEImuManager:
+    def __init__(self, transport=None, scheduler=None, auto_reconnect=True, backoff_factory=Backoff):
+        """
+        transport: provides discovery and clients, BleakTransport (real Bluetooth)
+        by default; see bluetooth.simulated.SimulatedTransport for a fake peripheral.
+        scheduler: GattScheduler shared by every connected device.
+        auto_reconnect: re-establish dropped links and resume their streams
+        backoff_factory: callable returning the Backoff of each new session
+
+        status: Observable emitting log messages; connect(callback) to receive
+        them (gui.qt_adapter.QtStatusRelay turns it into a Qt signal).
+        """
+        self.status = Observable()
+        self.transport = transport or BleakTransport()
+        self.scheduler = scheduler or GattScheduler()
+        self.auto_reconnect = auto_reconnect
+        self.backoff_factory = backoff_factory
+
+        # address -> DeviceSession, one per connected device
+        self.sessions = {}
+
+        # most recently connected session, used by the single-device attributes below
+        self.primary = None
+
+        # devices seen by the background scanner, so connect() need not scan again
+        self.discovery = DiscoveryCache()
+        self._scanner = None
+        self._scan_service = None
+        self._linger_task = None  # stops a scanner left running by scan_devices()
+        self._waiters = []  # (address or None, future) resolved by the next matching advertisement
+
+    # ------------------------------------------------------
+    # Single-device view (the most recently connected device)
+    # ------------------------------------------------------
+    @property
+    def client(self):
+        return self.primary.client if self.primary else None
+
+    @property
+    def is_connected(self):
+        return any(session.is_connected for session in self.sessions.values())
+
+    @property
+    def read_task(self):
+        return self.primary.read_task if self.primary else None
+
+    @property
+    def stream_mode(self):
+        return self.primary.stream_mode if self.primary else None
+
+    @property
+    def stream_stats(self):
+        return self.primary.stream_stats if self.primary else DeviceSession._new_stream_stats()
+
+    def samples_per_sec(self):
+        return self.primary.samples_per_sec() if self.primary else 0.0
+
+    def mean_skew(self):
+        return self.primary.mean_skew() if self.primary else 0.0
+
+    def device_stats(self):
+        """
+        Per-device throughput counters: {address: {...}}.
+        """
+        return {
+            address: {
+                "name": session.name,
+                "mode": session.stream_mode,
+                "connected": session.is_connected,
+                "samples": session.stream_stats["samples"],
+                "samples_per_sec": session.samples_per_sec(),
+                "time_to_first_sample": session.time_to_first_sample(),
+                "state": session.state,
+                "reconnects": session.reconnects,
+                "gap_seconds": session.gap_seconds,
+            }
+            for address, session in self.sessions.items()
+        }
 
     # ------------------------------------------------------
     # Scan for BLE devices
     # ------------------------------------------------------
-    async def scan_devices(self, service_uuid):
+    async def start_discovery(self, service_uuid):
+        """
+        Keep scanning in the background, adding every device advertising
+        service_uuid to self.discovery.
+        """
+        self._cancel_linger()
+        if self._scanner is not None and self._scan_service == service_uuid:
+            return
+        await self.stop_discovery()
+        self._scan_service = service_uuid
+        self._scanner = await self.transport.start_scan(
+            service_uuid, lambda device, rssi: self._on_advertisement(device, rssi, service_uuid)
+        )
+
+    async def stop_discovery(self):
+        self._cancel_linger()
+        scanner, self._scanner = self._scanner, None
+        if scanner is not None:
+            await scanner.stop()
+
+    def _cancel_linger(self):
+        task, self._linger_task = self._linger_task, None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    async def _stop_discovery_after(self, delay):
+        await asyncio.sleep(delay)
+        await self.stop_discovery()
+
+    def _on_advertisement(self, device, rssi, service_uuid):
+        self.discovery.update(device, rssi, service_uuid)
+        if device.address in self.sessions:
+            return
+        for address, future in self._waiters:
+            if (address is None or address == device.address) and not future.done():
+                future.set_result(device)
+
+    def _cached_device(self, service_uuid, address=None):
+        if address is not None:
+            entry = self.discovery.get(address)
+            return entry.device if entry and address not in self.sessions else None
+        for entry in self.discovery.devices(service_uuid):
+            if entry.address not in self.sessions:
+                return entry.device
+        return None
+
+    async def find_device(self, service_uuid, address=None, timeout=SCAN_TIMEOUT):
+        """
+        A device advertising service_uuid (the one at address, if given) that is
+        not connected yet: straight from the discovery cache, or from the first
+        matching advertisement of a scan. Returns None after timeout seconds.
+        """
+        device = self._cached_device(service_uuid, address)
+        if device is not None:
+            return device
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (address, future)
+        self._waiters.append(waiter)
+        # a scanner lingering after scan_devices() is taken over, like one started here
+        previous = None if self._linger_task is not None else self._scanner
+        scanner = None
+        try:
+            await self.start_discovery(service_uuid)
+            if self._scanner is not previous:
+                scanner = self._scanner
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._waiters.remove(waiter)
+            # stop early: a scan started just for this device is not needed any more
+            if scanner is not None and self._scanner is scanner:
+                await self.stop_discovery()
+
+    async def scan_devices(self, service_uuid, timeout=SCAN_TIMEOUT):
+        """
+        Collect advertisements for timeout seconds and return the devices seen,
+        strongest signal first. When devices were found the scanner keeps
+        running for DISCOVERY_LINGER seconds, so the cache stays fresh for
+        connect(); connecting stops it sooner.
+        """
         self.status.emit("Scanning for IMU devices...")
 
-        devices = await BleakScanner.discover(
-            service_uuids=[service_uuid]
-        )
+        await self.start_discovery(service_uuid)
+        await asyncio.sleep(timeout)
+        devices = [entry.device for entry in self.discovery.devices(service_uuid)]
 
         if not devices:
+            await self.stop_discovery()
             self.status.emit("No devices found. Make sure Bluetooth is enabled and try again.")
             return
         else:
             self.status.emit(f"Found {len(devices)} device(s).")
 
+        self._linger_task = asyncio.create_task(self._stop_discovery_after(DISCOVERY_LINGER))
         return devices
-    
+
     # ------------------------------------------------------
     # Connect to IMU device via address
     # ------------------------------------------------------
@@ -65,75 +232,58 @@ class BLEImuManager(QObject):
         gyro_x_uuid,
         gyro_y_uuid,
         gyro_z_uuid,
+        stream_mode=STREAM_MODE_POLL,
+        packed_uuid=None,
+        packed_layout=None,
+        address=None,
+        fields=None,
     ):
         """
         Connects to the device advertising the given service UUID.
+        stream_mode: "notify" to stream via GATT notifications, "poll" to read
+        each characteristic in turn. Notify falls back to poll if the device
+        does not support it.
+        "packed" streams batches from the single packed_uuid characteristic,
+        decoded with the profile's packed_layout spec (see core.samples.PackedLayout).
+        address: device to connect to; by default the strongest one seen that
+        is not connected yet.
+        fields: FieldSpecs (core.device_profiles) in SAMPLE_FIELDS order, for
+        per-field encodings other than float32 / unsigned device time.
+        Devices found by an earlier Scan are connected to straight away; otherwise
+        scanning stops as soon as a matching device advertises.
         """
-        # Scan for devices that advertise this service
-        devices = await self.scan_devices(service_uuid)
+        requested_at = time.perf_counter()
+        self._forget_ended()
 
-        # exit early if there is no device in range
-        if not devices:
+        if address is not None and address in self.sessions:
+            self.status.emit(f"{address} is already connected.")
             return
-        
-        # select the first device
-        dev = devices[0]
-        self.status.emit(f"Connecting to {dev.name} ({dev.address})...")
-        
-        self.client = BleakClient(dev.address, timeout=20)
-
-        try:
-            await self.client.connect()
-        except Exception as e:
-            self.status.emit(f"Failed to connect: {e}")
-
-        if not self.client.is_connected:
-            self.status.emit("Connection failed.")
-
-        self.status.emit("Connected!")
-        self.is_connected = True
-
-        # Start async IMU polling loop
-        self.read_task = asyncio.create_task(
-            self._read_imu_loop(
-                data_queue,
-                time_uuid,
-                accel_x_uuid,
-                accel_y_uuid,
-                accel_z_uuid,
-                gyro_x_uuid,
-                gyro_y_uuid,
-                gyro_z_uuid,
-            )
-        )
 
-    # ------------------------------------------------------
-    # Disconnect cleanly
-    # ------------------------------------------------------
-    async def disconnect(self):
-        self.is_connected = False
+        device = await self.find_device(service_uuid, address)
 
-        if self.read_task:
-            self.read_task.cancel()
-            try:
-                await self.read_task
-            except asyncio.CancelledError:
-                pass
+        # exit early if there is no device in range
+        if device is None:
+            self.status.emit("No devices found. Make sure Bluetooth is enabled and try again.")
+            return
 
-        if self.client:
-            try:
-                await self.client.disconnect()
-            except Exception:
-                pass
+        uuids = (
+            accel_x_uuid,
+            accel_y_uuid,
+            accel_z_uuid,
+            gyro_x_uuid,
+            gyro_y_uuid,
+            gyro_z_uuid,
+            time_uuid,
+        )
 
-        self.client = None
+        await self._connect_device(
+            device, data_queue, uuids, stream_mode, packed_uuid, packed_layout, requested_at, fields
+        )
 
-    # ------------------------------------------------------
-    # Internal IMU polling loop
-    # ------------------------------------------------------
-    async def _read_imu_loop(
-        self, 
+    async def connect_all(
+        self,
         data_queue,
+        service_uuid,
         time_uuid,
         accel_x_uuid,
         accel_y_uuid,
@@ -141,64 +291,172 @@ class BLEImuManager(QObject):
         gyro_x_uuid,
         gyro_y_uuid,
         gyro_z_uuid,
+        stream_mode=STREAM_MODE_POLL,
+        packed_uuid=None,
+        packed_layout=None,
+        max_devices=None,
+        fields=None,
     ):
         """
-        Continuously read characteristics from IMU and enqueue parsed values.
+        Connects to every device advertising the service (up to max_devices),
+        each with its own connection and stream task. Same arguments as connect().
+        Uses the devices of an earlier Scan when there are any.
         """
-        self.status.emit("Starting IMU data streaming...")
+        requested_at = time.perf_counter()
+        self._forget_ended()
 
-        try:
-            while self.is_connected:
-                # Read raw byte values
-                ax = await self.client.read_gatt_char(accel_x_uuid)
-                ay = await self.client.read_gatt_char(accel_y_uuid)
-                az = await self.client.read_gatt_char(accel_z_uuid)
-                gx = await self.client.read_gatt_char(gyro_x_uuid)
-                gy = await self.client.read_gatt_char(gyro_y_uuid)
-                gz = await self.client.read_gatt_char(gyro_z_uuid)
-                time_bytes = await self.client.read_gatt_char(time_uuid)
-
-                # Convert to int/float
-                ax = struct.unpack("f", ax)[0]
-                ay = struct.unpack("f", ay)[0]
-                az = struct.unpack("f", az)[0]
-                gx = struct.unpack("f", gx)[0]
-                gy = struct.unpack("f", gy)[0]
-                gz = struct.unpack("f", gz)[0]
-                t = int.from_bytes(time_bytes, byteorder='little', signed=False)
-
-                # debug: print the data
-                # print(ax, ay, az, time_bytes)
-
-                # add to the data queue
-                await data_queue.put((ax, ay, az, gx, gy, gz, t))
-
-                await asyncio.sleep(0.0005)
-
-        except asyncio.CancelledError:
-            self.status.emit("IMU read loop cancelled (disconnect).")
+        devices = [entry.device for entry in self.discovery.devices(service_uuid)]
+        if not devices:
+            devices = await self.scan_devices(service_uuid)
+        if not devices:
+            return
+
+        uuids = (
+            accel_x_uuid,
+            accel_y_uuid,
+            accel_z_uuid,
+            gyro_x_uuid,
+            gyro_y_uuid,
+            gyro_z_uuid,
+            time_uuid,
+        )
+
+        devices = [d for d in devices if d.address not in self.sessions]
+        if max_devices is not None:
+            devices = devices[:max_devices]
+
+        # connect one at a time, adapters handle concurrent connection setup poorly
+        for dev in devices:
+            await self._connect_device(
+                dev, data_queue, uuids, stream_mode, packed_uuid, packed_layout, requested_at, fields
+            )
+
+    async def connect_profile(self, data_queue, profile, all_devices=False, stream_mode=None, **options):
+        """
+        connect() (or connect_all()) with everything taken from a device profile
+        (core.device_profiles.DeviceProfile, or a dict of the old keys).
+        stream_mode: overrides the profile's
+        options: address for connect(), max_devices for connect_all()
+        """
+        profile = as_profile(profile)
+        ax, ay, az, gx, gy, gz, t = profile.field_uuids
+        connect = self.connect_all if all_devices else self.connect
+        await connect(
+            data_queue,
+            profile.service_uuid,
+            t, ax, ay, az, gx, gy, gz,
+            stream_mode=stream_mode or profile.stream_mode,
+            packed_uuid=profile.packed_uuid,
+            packed_layout=profile.packed_layout,
+            fields=profile.sample_fields,
+            **options,
+        )
+
+    async def _connect_device(
+        self, dev, data_queue, uuids, stream_mode, packed_uuid, packed_layout, requested_at=None, fields=None
+    ):
+        name = dev.name or dev.address
+        self.status.emit(f"Connecting to {dev.name} ({dev.address})...")
+
+        # adapters connect poorly while scanning; the cache outlives the scanner
+        await self.stop_discovery()
+
+        session = DeviceSession(
+            dev.address,
+            name,
+            None,
+            data_queue,
+            self.scheduler,
+            lambda text: self.status.emit(f"[{name}] {text}"),
+            connect_requested_at=requested_at,
+            reconnect=self._reconnect_device if self.auto_reconnect else None,
+            backoff=self.backoff_factory(),
+        )
 
+        try:
+            # the scanned device object, so the transport does not look the address up again
+            session.client = await self._open_client(dev, session)
         except Exception as e:
-            self.status.emit(f"IMU read error: {e}")
+            self.status.emit(f"Failed to connect to {name}: {e}")
+            return None
+
+        self.status.emit(f"Connected to {name}!")
+        self.sessions[dev.address] = session
+        self.primary = session
+
+        session.start(stream_mode, uuids, packed_uuid, packed_layout, fields)
+        return session
+
+    def _forget_ended(self):
+        # sessions whose stream ended for good (reconnect gave up) free their device
+        for address in [a for a, s in self.sessions.items() if not s.is_connected]:
+            del self.sessions[address]
+
+    async def _open_client(self, device, session):
+        """
+        Connected client for device, reporting link loss to the session.
+        """
+        client = self.transport.create_client(
+            device, timeout=20, disconnected_callback=session.on_disconnected
+        )
+        await client.connect()
+        if not client.is_connected:
+            raise ConnectionError("device did not stay connected")
+        return client
+
+    async def _reconnect_device(self, session):
+        # the freshest advertisement if the scanner saw the device again, else its address
+        entry = self.discovery.get(session.address)
+        return await self._open_client(entry.device if entry else session.address, session)
 
+    # ------------------------------------------------------
+    # Disconnect cleanly
+    # ------------------------------------------------------
+    async def disconnect(self, address=None):
+        """
+        Disconnect one device, or every device when address is None.
+        """
+        addresses = list(self.sessions) if address is None else [address]
+        if address is None:
+            await self.stop_discovery()
+
+        for addr in addresses:
+            session = self.sessions.pop(addr, None)
+            if session:
+                await session.stop()
+
+        # keep the last stats around when the primary device went away
+        if self.primary and self.primary.address not in self.sessions:
+            self.primary = next(reversed(self.sessions.values()), self.primary)
 
     # ------------------------------------------------------
     # Write to IMU to turn on certain modes (i.e LOW and HIGH power modes)
     # ------------------------------------------------------
-    async def set_power_mode(self, power_mode_uuid: str, mode: int):
+    async def set_power_mode(self, power_mode_uuid: str, mode: int, address=None):
         """
         Write a uint8 (0 or 1) to the IMU power mode characteristic.
         mode: 0 = LOW, 1 = HIGH
+        address: device to write to, every connected device when None
+        Returns True when every device was written, False otherwise (not
+        connected, or a write failed).
         """
-        if not self.client or not self.client.is_connected:
+        sessions = [
+            s for s in self.sessions.values()
+            if (address is None or s.address == address) and s.client and s.client.is_connected
+        ]
+        if not sessions:
             self.status.emit("Not connected — cannot change power mode.")
-            return
-
-        try:
-            # uint8 payload
-            data = bytes([mode])
-            await self.client.write_gatt_char(power_mode_uuid, data)
-            self.status.emit(f"Power mode written: {mode}")
+            return False
 
-        except Exception as e:
-            self.status.emit(f"Failed to write power mode: {e}")
\ No newline at end of file
+        written = True
+        for session in sessions:
+            try:
+                # uint8 payload
+                data = bytes([mode])
+                await self.scheduler.write(session.client, session.characteristic(power_mode_uuid), data)
+                self.status.emit(f"[{session.name}] Power mode written: {mode}")
+
+            except Exception as e:
+                self.status.emit(f"[{session.name}] Failed to write power mode: {e}")
+                written = False
+        return written
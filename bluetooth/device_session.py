@@ -0,0 +1,524 @@
+import asyncio, time
+
+from bluetooth.reconnect import Backoff
+from core.metrics import METRICS
+from core.samples import SAMPLE_FIELDS, BlockWriter, PackedLayout, SampleBatch
+
+STREAM_MODE_POLL = "poll"
+STREAM_MODE_NOTIFY = "notify"
+STREAM_MODE_PACKED = "packed"
+
+STATE_CONNECTED = "connected"
+STATE_RECONNECTING = "reconnecting"
+STATE_DISCONNECTED = "disconnected"
+
+
+class DeviceSession:
+    """
+    One connected IMU: its client, stream task and throughput counters.
+    Every sample is put on the data queue as a SampleBatch tagged with the
+    address, a sequence number and the host receive time. Payloads are written
+    straight into pooled blocks (core.samples.BlockWriter), so the batch
+    carries a SampleSpan of its block rather than a tuple or a new array.
+    Characteristics are looked up once per connection (characteristic()) and
+    the objects handed to every GATT call of the stream.
+
+    status: callable receiving log messages
+    scheduler: GattScheduler shared by every session on the adapter
+    connect_requested_at: perf_counter() time the user asked to connect, for
+        time_to_first_sample()
+    reconnect: optional async callable(session) returning a new connected client.
+        With it, a lost link is re-established with backoff and the stream
+        resumes into the same queue; the first batch after the outage carries
+        its length in SampleBatch.gap. A stream that fails while the link is up
+        (missing characteristic, undecodable payload) ends instead, with the
+        exception in `error`.
+    backoff: Backoff between reconnect attempts
+    """
+
+    def __init__(
+        self,
+        address,
+        name,
+        client,
+        data_queue,
+        scheduler,
+        status,
+        connect_requested_at=None,
+        reconnect=None,
+        backoff=None,
+    ):
+        self.address = address
+        self.name = name
+        self.client = client
+        self.data_queue = data_queue
+        self.scheduler = scheduler
+        self.status = status
+        self.reconnect = reconnect
+        self.backoff = backoff or Backoff()
+
+        # is_connected stays True while reconnecting: the session still wants the device
+        self.is_connected = False
+        self.state = STATE_DISCONNECTED
+        self.read_task = None
+        self.stream_mode = None
+        self.stream_stats = self._new_stream_stats()
+        self._make_loop = None
+        self.error = None  # exception that ended the stream, if any
+
+        # sequence number of the next sample, consumers detect drops from gaps
+        self.seq = 0
+        self.writer = BlockWriter()
+        self._field_writers = [self.writer.write_field] * len(SAMPLE_FIELDS)
+
+        # uuid -> characteristic object of the current client
+        self._characteristics = {}
+        self._characteristics_client = None
+
+        self.connect_requested_at = connect_requested_at
+        self.first_sample_at = None
+        self.last_sample_at = None
+
+        # link loss bookkeeping
+        self.reconnects = 0
+        self.gap_seconds = 0.0
+        self.lost_at = None
+        self._gap_pending = False
+
+        self._samples_metric = METRICS.counter("imu_samples_total", "Samples received", device=address)
+        self._reconnects_metric = METRICS.counter("imu_reconnects_total", "Links re-established", device=address)
+        self._gap_metric = METRICS.histogram(
+            "imu_link_gap_seconds", "Outage seen downstream after a reconnect",
+            buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0), device=address,
+        )
+
+    @staticmethod
+    def _new_stream_stats():
+        """
+        Counters describing the current stream.
+        skew is the spread (s) between the first and last axis update of a sample.
+        incomplete counts notify-mode samples dropped for a lost field
+        notification, missing_fields the notifications they lacked.
+        """
+        return {
+            "samples": 0,
+            "started_at": None,
+            "last_skew": 0.0,
+            "max_skew": 0.0,
+            "total_skew": 0.0,
+            "incomplete": 0,
+            "missing_fields": 0,
+        }
+
+    def samples_per_sec(self):
+        stats = self.stream_stats
+        if not stats["started_at"] or not stats["samples"]:
+            return 0.0
+        elapsed = time.perf_counter() - stats["started_at"]
+        return stats["samples"] / elapsed if elapsed > 0 else 0.0
+
+    def mean_skew(self):
+        stats = self.stream_stats
+        return stats["total_skew"] / stats["samples"] if stats["samples"] else 0.0
+
+    def _record_sample(self, skew):
+        stats = self.stream_stats
+        stats["samples"] += 1
+        stats["last_skew"] = skew
+        stats["total_skew"] += skew
+        if skew > stats["max_skew"]:
+            stats["max_skew"] = skew
+
+    def time_to_first_sample(self):
+        """
+        Seconds from the connect request to the first sample, None until then.
+        """
+        if self.first_sample_at is None or self.connect_requested_at is None:
+            return None
+        return self.first_sample_at - self.connect_requested_at
+
+    def _mark_started(self):
+        # a resumed stream keeps counting from the original start
+        if self.stream_stats["started_at"] is None:
+            self.stream_stats["started_at"] = time.perf_counter()
+
+    def _stamp(self, samples, count):
+        now = time.perf_counter()
+        gap = None
+        if self.first_sample_at is None:
+            self.first_sample_at = now
+        elif self._gap_pending:
+            # the hole seen downstream: last sample before the outage to the first after
+            gap = now - self.last_sample_at
+            self.gap_seconds += gap
+            self._gap_pending = False
+            self._gap_metric.observe(gap)
+        self.last_sample_at = now
+        self._samples_metric.inc(count)
+
+        item = SampleBatch(self.address, samples, self.seq, now, gap)
+        self.seq += count
+        return item
+
+    def _put(self, samples, count=1):
+        self.data_queue.put_nowait(self._stamp(samples, count))
+
+    # ------------------------------------------------------
+    # Start / stop streaming
+    # ------------------------------------------------------
+    def start(self, stream_mode, uuids, packed_uuid=None, packed_layout=None, fields=None):
+        """
+        uuids: per-field characteristic UUIDs in SAMPLE_FIELDS order.
+        stream_mode: "notify", "poll" or "packed" (see BLEImuManager.connect).
+        fields: optional FieldSpecs (core.device_profiles) in SAMPLE_FIELDS order,
+        for fields not sent as float32 / unsigned device time; raw by default.
+        """
+        if fields is not None:
+            self._field_writers = [self._field_writer(field) for field in fields]
+
+        self.is_connected = True
+        self.state = STATE_CONNECTED
+
+        if stream_mode == STREAM_MODE_NOTIFY and not self._supports_notify(uuids):
+            self.status("Device does not support notifications, falling back to polling.")
+            stream_mode = STREAM_MODE_POLL
+
+        self.stream_mode = stream_mode
+        self.stream_stats = self._new_stream_stats()
+        self.error = None
+
+        # resolved once: a resumed stream reuses the mode and decoder of the first connection
+        if stream_mode == STREAM_MODE_PACKED:
+            layout = PackedLayout(packed_layout)
+            use_notify = self._supports_notify((packed_uuid,))
+            self._make_loop = lambda: self._packed_imu_loop(packed_uuid, layout, use_notify)
+        elif stream_mode == STREAM_MODE_NOTIFY:
+            self._make_loop = lambda: self._notify_imu_loop(uuids)
+        else:
+            self._make_loop = lambda: self._read_imu_loop(uuids)
+
+        # Start async IMU streaming/polling loop
+        self.read_task = asyncio.create_task(self._supervise())
+
+    async def _supervise(self):
+        """
+        Run the stream; when it ends without stop() because the link was lost,
+        reconnect and resume it. Any other end is final.
+        """
+        await self._staggered(self._make_loop())
+        while self.is_connected and self.reconnect is not None and self._link_lost():
+            if not await self._reconnect():
+                break
+            await self._staggered(self._make_loop())
+
+        if self.is_connected:
+            self.is_connected = False
+            self.state = STATE_DISCONNECTED
+            self.status(f"Stream ended: {self.error}" if self.error else "Stream ended.")
+            try:
+                await self.client.disconnect()
+            except Exception:
+                pass
+
+    def _link_lost(self):
+        """
+        Whether the stream ended because the link went down, rather than on an
+        error the same connection would only repeat.
+        """
+        return self.lost_at is not None or not self.client.is_connected
+
+    async def _reconnect(self):
+        """
+        Re-establish the link with exponential backoff. Returns False when out of attempts.
+        """
+        if self.lost_at is None:
+            self.lost_at = time.perf_counter()
+        self.state = STATE_RECONNECTING
+
+        try:
+            await self.client.disconnect()
+        except Exception:
+            pass
+
+        self.backoff.reset()
+        while self.is_connected:
+            delay = self.backoff.next_delay()
+            if delay is None:
+                self.status(f"Giving up after {self.backoff.attempts} reconnect attempts.")
+                return False
+            await asyncio.sleep(delay)
+
+            try:
+                self.client = await self.reconnect(self)
+            except Exception as e:
+                self.status(f"Reconnect attempt {self.backoff.attempts} failed: {e}")
+                continue
+
+            self.status(f"Reconnected after {time.perf_counter() - self.lost_at:.1f} s.")
+            self.reconnects += 1
+            self._reconnects_metric.inc()
+            self.lost_at = None
+            self.error = None
+            self._gap_pending = True
+            self.state = STATE_CONNECTED
+            return True
+        return False
+
+    def on_disconnected(self, client):
+        """
+        disconnected_callback of the session's clients.
+        """
+        if client is not self.client or not self.is_connected or self.lost_at is not None:
+            return
+        self.lost_at = time.perf_counter()
+        self.status("Link lost.")
+
+    async def _staggered(self, loop):
+        offset = self.scheduler.reserve_offset()
+        try:
+            if offset:
+                await asyncio.sleep(offset)
+            await loop
+        finally:
+            self.scheduler.release_offset()
+
+    async def stop(self):
+        self.is_connected = False
+        self.state = STATE_DISCONNECTED
+
+        if self.read_task:
+            self.read_task.cancel()
+            try:
+                await self.read_task
+            except asyncio.CancelledError:
+                pass
+            self.read_task = None
+
+        if self.client:
+            try:
+                await self.client.disconnect()
+            except Exception:
+                pass
+
+    def _field_writer(self, field):
+        """
+        Callable (index, data) storing a field's payload in the sample being assembled.
+        """
+        if field.raw:
+            return self.writer.write_field
+        write_decoded = self.writer.write_decoded
+        return lambda index, data: write_decoded(index, data, field.format, field.factor)
+
+    def characteristic(self, uuid):
+        """
+        The current client's characteristic object for uuid, looked up once per
+        connection: handed to GATT calls instead of the UUID string, it spares
+        bleak a search of the service collection on every read.
+        """
+        client = self.client
+        if client is not self._characteristics_client:
+            self._characteristics = {}
+            self._characteristics_client = client
+        char = self._characteristics.get(uuid)
+        if char is None:
+            char = client.services.get_characteristic(uuid)
+            if char is None:
+                raise LookupError(f"Characteristic {uuid} not found on the device")
+            self._characteristics[uuid] = char
+        return char
+
+    def _supports_notify(self, uuids):
+        """
+        Check every characteristic advertises the notify property.
+        """
+        try:
+            for uuid in uuids:
+                if "notify" not in self.characteristic(uuid).properties:
+                    return False
+        except Exception:
+            return False
+        return True
+
+    # ------------------------------------------------------
+    # Internal IMU polling loop
+    # ------------------------------------------------------
+    async def _read_imu_loop(self, uuids):
+        """
+        Continuously read characteristics from IMU and enqueue parsed values.
+        """
+        self.status("Starting IMU data streaming...")
+
+        read = self.scheduler.read
+        writers = self._field_writers
+        client = self.client
+
+        self._mark_started()
+
+        try:
+            fields = [(index, writers[index], self.characteristic(uuid)) for index, uuid in enumerate(uuids)]
+
+            while self.is_connected:
+                first_read = time.perf_counter()
+
+                # raw bytes go straight into the sample's slot
+                for index, write_field, char in fields:
+                    write_field(index, await read(client, char))
+                self._record_sample(time.perf_counter() - first_read)
+
+                # add to the data queue
+                await self.data_queue.put(self._stamp(self.writer.commit(), 1))
+
+                await asyncio.sleep(0.0005)
+
+        except asyncio.CancelledError:
+            self.status("IMU read loop cancelled (disconnect).")
+
+        except Exception as e:
+            self.error = e
+            self.status(f"IMU read error: {e}")
+
+    # ------------------------------------------------------
+    # Internal IMU notification stream
+    # ------------------------------------------------------
+    async def _notify_imu_loop(self, uuids):
+        """
+        Subscribe to every IMU characteristic and assemble the per-characteristic
+        notifications into complete samples.
+        uuids: characteristic UUIDs in SAMPLE_FIELDS order.
+
+        The device updates the time characteristic after the six axes, so its
+        notification closes a sample. A sample missing a field then (a lost
+        notification), or seeing a field twice before it (its time was lost),
+        is dropped and counted rather than completed with the next sample's
+        values, which would leave that axis out of step for the rest of the stream.
+        """
+        self.status("Starting IMU notification streaming...")
+
+        num_fields = len(SAMPLE_FIELDS)
+        time_index = SAMPLE_FIELDS.index("t")
+        writers = self._field_writers
+        stats = self.stream_stats
+
+        # which fields of the sample being built have arrived, and when
+        present = [False] * num_fields
+        arrivals = [0.0] * num_fields
+        received = 0
+
+        def clear():
+            nonlocal received
+            for i in range(num_fields):
+                present[i] = False
+            received = 0
+
+        def drop_partial():
+            stats["incomplete"] += 1
+            stats["missing_fields"] += num_fields - received
+            clear()
+
+        def make_handler(index):
+            write_field = writers[index]
+
+            def handler(_sender, data):
+                nonlocal received
+                now = time.perf_counter()
+
+                if present[index]:
+                    # the sample being built never got its time: start over from this field
+                    drop_partial()
+                present[index] = True
+                received += 1
+
+                write_field(index, data)
+                arrivals[index] = now
+
+                if index != time_index:
+                    return
+                if received < num_fields:
+                    drop_partial()
+                    return
+
+                self._record_sample(max(arrivals) - min(arrivals))
+                self._put(self.writer.commit())
+                clear()
+
+            return handler
+
+        subscribed = []
+        self._mark_started()
+
+        try:
+            for index, uuid in enumerate(uuids):
+                char = self.characteristic(uuid)
+                await self.scheduler.start_notify(self.client, char, make_handler(index))
+                subscribed.append(char)
+
+            # notifications are delivered by callbacks, just stay alive while connected
+            while self.is_connected and self.client.is_connected:
+                await asyncio.sleep(0.1)
+
+            if self.is_connected:
+                self.status("IMU notification stream ended: device disconnected.")
+
+        except asyncio.CancelledError:
+            self.status("IMU notification stream cancelled (disconnect).")
+
+        except Exception as e:
+            self.error = e
+            self.status(f"IMU notify error: {e}")
+
+        finally:
+            for char in subscribed:
+                try:
+                    await self.client.stop_notify(char)
+                except Exception:
+                    pass
+
+    # ------------------------------------------------------
+    # Internal packed (multi-sample) characteristic stream
+    # ------------------------------------------------------
+    async def _packed_imu_loop(self, packed_uuid, layout, use_notify=True):
+        """
+        Decode every payload of the packed characteristic into one batch and
+        enqueue the batch as a whole.
+        Uses notifications when available, otherwise reads the characteristic in a loop.
+        """
+        self.status(
+            f"Starting packed IMU streaming ({layout.samples_per_payload} samples/payload)..."
+        )
+
+        def handle_payload(_sender, data):
+            samples = self.writer.write_payload(data, layout)
+            if samples is None:
+                return
+            self.stream_stats["samples"] += len(samples)
+            self._put(samples, len(samples))
+
+        self._mark_started()
+        subscribed = False
+
+        try:
+            char = self.characteristic(packed_uuid)
+            if use_notify:
+                await self.scheduler.start_notify(self.client, char, handle_payload)
+                subscribed = True
+
+                while self.is_connected and self.client.is_connected:
+                    await asyncio.sleep(0.1)
+            else:
+                while self.is_connected:
+                    handle_payload(char, await self.scheduler.read(self.client, char))
+                    await asyncio.sleep(0.0005)
+
+        except asyncio.CancelledError:
+            self.status("Packed IMU stream cancelled (disconnect).")
+
+        except Exception as e:
+            self.error = e
+            self.status(f"Packed IMU stream error: {e}")
+
+        finally:
+            if subscribed:
+                try:
+                    await self.client.stop_notify(char)
+                except Exception:
+                    pass
@@ -0,0 +1,89 @@
+import time
+
+# seconds an advertisement keeps a device in the cache
+DEFAULT_TTL = 30.0
+
+
+class DiscoveredDevice:
+    """
+    Cache entry: the transport's device object plus what the last advertisement said.
+    """
+
+    __slots__ = ("device", "address", "name", "rssi", "service_uuid", "first_seen", "last_seen")
+
+    def __init__(self, device, rssi, service_uuid, now):
+        self.device = device
+        self.address = device.address
+        self.name = device.name
+        self.rssi = rssi
+        self.service_uuid = service_uuid
+        self.first_seen = now
+        self.last_seen = now
+
+    def __repr__(self):
+        return f"DiscoveredDevice({self.name!r}, {self.address!r}, rssi={self.rssi})"
+
+
+class DiscoveryCache:
+    """
+    Devices seen by the scanner, keyed by address. Entries not refreshed by an
+    advertisement within ttl seconds are evicted.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._entries = {}
+
+    def __len__(self):
+        self.evict()
+        return len(self._entries)
+
+    def update(self, device, rssi=None, service_uuid=None):
+        """
+        Record an advertisement. Returns the entry.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(device.address)
+        if entry is None:
+            entry = self._entries[device.address] = DiscoveredDevice(device, rssi, service_uuid, now)
+        else:
+            entry.device = device
+            entry.name = device.name or entry.name
+            entry.last_seen = now
+            if rssi is not None:
+                entry.rssi = rssi
+            if service_uuid is not None:
+                entry.service_uuid = service_uuid
+        return entry
+
+    def get(self, address):
+        """
+        Fresh entry for address, or None.
+        """
+        entry = self._entries.get(address)
+        if entry is None or self._expired(entry, time.monotonic()):
+            return None
+        return entry
+
+    def devices(self, service_uuid=None):
+        """
+        Fresh entries (advertising service_uuid, if given), strongest signal first.
+        """
+        self.evict()
+        entries = [
+            e for e in self._entries.values()
+            if service_uuid is None or e.service_uuid == service_uuid
+        ]
+        entries.sort(key=lambda e: e.rssi if e.rssi is not None else -1000, reverse=True)
+        return entries
+
+    def evict(self):
+        now = time.monotonic()
+        for address in [a for a, e in self._entries.items() if self._expired(e, now)]:
+            del self._entries[address]
+
+    def clear(self):
+        self._entries.clear()
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry.last_seen > self.ttl
@@ -0,0 +1,383 @@
+"""
+Automatic power-mode switching driven by motion activity.
+
+    controller = PowerModeController(
+        lambda address, mode: ble.set_power_mode(profile.power_mode_uuid, mode, address)
+    )
+    controller.submit(item)  # every queue item, e.g. from drain_into()
+
+Each device's stream feeds an ActivityMeter: the spread (standard deviation)
+of the acceleration magnitude and the mean angular rate magnitude over the
+last `window` seconds of device time. A PowerPolicy turns that into a power
+mode with hysteresis (separate wake and sleep thresholds) and a minimum dwell
+time, so a device neither flaps between modes nor misses the start of motion
+for long. Every transition is logged on `status`, with the share of time spent
+in HIGH power mode so far (the duty cycle).
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from core.metrics import METRICS
+from core.samples import as_batch, item_device, item_gap
+from core.timing import CounterUnwrapper
+
+MODE_LOW = 0
+MODE_HIGH = 1
+
+MODE_NAMES = {MODE_LOW: "LOW", MODE_HIGH: "HIGH"}
+
+# seconds of device time the activity metric covers
+DEFAULT_WINDOW = 1.0
+
+# most samples per device the window keeps (the newest ones, at high sample rates)
+DEFAULT_CAPACITY = 4096
+
+# (accel magnitude std in g, mean gyro magnitude in deg/s): either above WAKE
+# is motion, both below SLEEP is rest; in between the mode stays as it is
+DEFAULT_WAKE = (0.05, 10.0)
+DEFAULT_SLEEP = (0.02, 3.0)
+
+# seconds a mode is kept at least before the next switch
+DEFAULT_MIN_DWELL = 3.0
+
+# seconds (host time) between policy decisions per device
+DEFAULT_INTERVAL = 0.1
+
+
+# ------------------------------------------------------
+# Activity metric
+# ------------------------------------------------------
+class ActivityMeter:
+    """
+    Rolling activity of one stream over the newest `window` seconds of device time.
+
+    window: seconds of samples the metric covers
+    time_scale: seconds per device time stamp tick (stamps are in ms)
+    capacity: most samples kept
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, time_scale=1e-3, capacity=DEFAULT_CAPACITY):
+        self.window = float(window)
+        self.time_scale = time_scale
+        self.capacity = int(capacity)
+
+        # rows: time (s), accel magnitude, gyro magnitude; the newest samples
+        # written twice so they are always one contiguous slice
+        self._ring = np.zeros((3, 2 * self.capacity))
+        self._unwrapper = CounterUnwrapper()
+        self.reset()
+
+    def reset(self):
+        """
+        Start over (after a gap: the device counter may have restarted).
+        """
+        self._head = 0
+        self._filled = 0
+        self._first = None
+        self._unwrapper.reset()
+
+    def update(self, batch):
+        """
+        Feed a SAMPLE_DTYPE batch of consecutive samples.
+        """
+        count = len(batch)
+        if not count:
+            return
+        take = min(count, self.capacity)
+        batch = batch[count - take:]
+
+        seconds = self._unwrapper.unwrap(batch["t"]) * self.time_scale
+        accel = np.sqrt(
+            np.square(batch["ax"], dtype=np.float64)
+            + np.square(batch["ay"], dtype=np.float64)
+            + np.square(batch["az"], dtype=np.float64)
+        )
+        gyro = np.sqrt(
+            np.square(batch["gx"], dtype=np.float64)
+            + np.square(batch["gy"], dtype=np.float64)
+            + np.square(batch["gz"], dtype=np.float64)
+        )
+        if self._first is None:
+            self._first = float(seconds[0])
+
+        n = self.capacity
+        head = self._head
+        first = min(take, n - head)
+        rest = take - first
+        for row, column in zip(self._ring, (seconds, accel, gyro)):
+            row[head:head + first] = column[:first]
+            row[head + n:head + n + first] = column[:first]
+            if rest:
+                row[:rest] = column[first:]
+                row[n:n + rest] = column[first:]
+        self._head = (head + take) % n
+        self._filled = min(self._filled + take, n)
+
+    def activity(self):
+        """
+        (accel magnitude std, mean gyro magnitude) over the window, in the
+        samples' units; None until a whole window has been seen.
+        """
+        if not self._filled:
+            return None
+        end = self._head + self.capacity
+        times, accel, gyro = self._ring[:, end - self._filled:end]
+        newest = times[-1]
+        if newest - self._first < self.window:
+            return None
+        start = int(np.searchsorted(times, newest - self.window, side="right"))
+        return float(accel[start:].std()), float(gyro[start:].mean())
+
+
+# ------------------------------------------------------
+# Switching policy
+# ------------------------------------------------------
+class PowerTransition:
+    """
+    One mode switch: host time (perf_counter), the new mode and the activity
+    that caused it.
+    """
+
+    __slots__ = ("time", "mode", "activity")
+
+    def __init__(self, time, mode, activity):
+        self.time = time
+        self.mode = mode
+        self.activity = activity
+
+    def __repr__(self):
+        return f"PowerTransition({self.time:.3f}, {MODE_NAMES[self.mode]}, {self.activity})"
+
+
+class PowerPolicy:
+    """
+    Power mode of one device from its activity, with hysteresis and a minimum dwell.
+
+    wake: (accel std, gyro) thresholds; exceeding either switches to HIGH
+    sleep: (accel std, gyro) thresholds; staying below both switches to LOW
+    min_dwell: seconds a mode is kept at least before the next switch
+
+    The first decision sets the mode whatever the dwell; so does the one after resync().
+    """
+
+    def __init__(self, wake=DEFAULT_WAKE, sleep=DEFAULT_SLEEP, min_dwell=DEFAULT_MIN_DWELL):
+        if any(low > high for low, high in zip(sleep, wake)):
+            raise ValueError("sleep thresholds must not exceed the wake thresholds")
+        self.wake = tuple(wake)
+        self.sleep = tuple(sleep)
+        self.min_dwell = min_dwell
+
+        self.mode = None
+        self.transitions = []
+        self.started = None
+        self._since = None
+        self._high_seconds = 0.0
+        self._resync = False
+
+    def target(self, activity):
+        """
+        Mode the activity calls for, None inside the hysteresis band.
+        """
+        accel, gyro = activity
+        if accel > self.wake[0] or gyro > self.wake[1]:
+            return MODE_HIGH
+        if accel < self.sleep[0] and gyro < self.sleep[1]:
+            return MODE_LOW
+        return None
+
+    def decide(self, activity, now):
+        """
+        Returns the mode to write, or None to leave the device as it is.
+        """
+        target = self.target(activity)
+        if self.mode is None:
+            # no history: anything short of rest needs full rate
+            target = MODE_LOW if target == MODE_LOW else MODE_HIGH
+            self.started = now
+        elif target is None or target == self.mode:
+            if not self._resync:
+                return None
+            target = self.mode
+        elif now - self._since < self.min_dwell and not self._resync:
+            return None
+
+        self._resync = False
+        if target != self.mode:
+            self._switch(target, activity, now)
+        return target
+
+    def resync(self):
+        """
+        Write the mode on the next decision even if it is unchanged (e.g. after
+        a reconnect, the device may have restarted in its default mode).
+        """
+        self._resync = True
+
+    def _switch(self, mode, activity, now):
+        if self.mode == MODE_HIGH:
+            self._high_seconds += now - self._since
+        self.mode = mode
+        self._since = now
+        self.transitions.append(PowerTransition(now, mode, activity))
+
+    def duty_cycle(self, now=None):
+        """
+        Share of the time since the first decision spent in HIGH power mode.
+        """
+        if self.started is None:
+            return 0.0
+        now = time.perf_counter() if now is None else now
+        high = self._high_seconds + (now - self._since if self.mode == MODE_HIGH else 0.0)
+        elapsed = now - self.started
+        return high / elapsed if elapsed > 0 else 1.0
+
+    def stats(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return {
+            "mode": MODE_NAMES.get(self.mode),
+            "transitions": len(self.transitions),
+            "duty_cycle": self.duty_cycle(now),
+            "seconds": now - self.started if self.started is not None else 0.0,
+        }
+
+
+# ------------------------------------------------------
+# Controller
+# ------------------------------------------------------
+class PowerModeController:
+    """
+    Runs an ActivityMeter and a PowerPolicy per device and writes the power
+    mode when the policy changes it. Lives on the event loop thread.
+
+    set_mode: callable (address, mode) writing the mode; may return a coroutine,
+        which is scheduled on the running loop. A result of False (or an
+        exception) means the write failed: the policy resyncs, so its mode is
+        written again on the next decision.
+    policy_factory: callable returning each new device's PowerPolicy
+    window / time_scale: see ActivityMeter
+    interval: seconds (host time) between decisions per device
+
+    status: Observable-like log; a callable(text), e.g. BLEImuManager.status.emit
+    """
+
+    def __init__(
+        self,
+        set_mode,
+        policy_factory=PowerPolicy,
+        window=DEFAULT_WINDOW,
+        time_scale=1e-3,
+        interval=DEFAULT_INTERVAL,
+        status=None,
+    ):
+        self.set_mode = set_mode
+        self.policy_factory = policy_factory
+        self.window = window
+        self.time_scale = time_scale
+        self.interval = interval
+        self.status = status or (lambda _text: None)
+        self.enabled = True
+
+        self.meters = {}    # device -> ActivityMeter
+        self.policies = {}  # device -> PowerPolicy
+        self._next_decision = {}
+        self._writes = set()
+
+    def submit(self, item):
+        """
+        Hand over a queue item (sample tuple, batch or SampleBatch). Never blocks.
+        """
+        if not self.enabled:
+            return
+        device = item_device(item)
+        meter = self.meters.get(device)
+        if meter is None:
+            meter = self.meters[device] = ActivityMeter(self.window, self.time_scale)
+            policy = self.policies[device] = self.policy_factory()
+            METRICS.gauge(
+                "imu_power_duty_cycle", "Share of time in HIGH power mode", fn=policy.duty_cycle, device=device
+            )
+
+        if item_gap(item) is not None:
+            meter.reset()
+            self.policies[device].resync()
+        meter.update(as_batch(item))
+
+        now = time.perf_counter()
+        if now < self._next_decision.get(device, 0.0):
+            return
+        self._next_decision[device] = now + self.interval
+
+        activity = meter.activity()
+        if activity is None:
+            return
+        policy = self.policies[device]
+        before = policy.mode
+        mode = policy.decide(activity, now)
+        if mode is None:
+            return
+        if mode != before:
+            self._log_transition(device, policy, activity, now)
+        self._write(device, mode, policy)
+
+    def _log_transition(self, device, policy, activity, now):
+        accel, gyro = activity
+        METRICS.counter("imu_power_transitions_total", "Automatic power mode switches", device=device).inc()
+        self.status(
+            f"[{device}] Auto power: {MODE_NAMES[policy.mode]} "
+            f"(accel std {accel:.3f}, gyro {gyro:.1f}); "
+            f"HIGH {100.0 * policy.duty_cycle(now):.0f}% of {now - policy.started:.1f} s"
+        )
+
+    def _write(self, device, mode, policy):
+        try:
+            result = self.set_mode(device, mode)
+        except Exception as e:
+            self._write_failed(device, policy, e)
+            return
+        if not asyncio.iscoroutine(result):
+            if result is False:
+                self._write_failed(device, policy)
+            return
+
+        def done(task):
+            self._writes.discard(task)
+            if task.cancelled():
+                return
+            error = task.exception()
+            if error is not None or task.result() is False:
+                self._write_failed(device, policy, error)
+
+        # keep a reference until done, the loop only holds weak ones
+        task = asyncio.get_running_loop().create_task(result)
+        self._writes.add(task)
+        task.add_done_callback(done)
+
+    def _write_failed(self, device, policy, error=None):
+        # the device did not take the mode the policy now assumes: write it again
+        if self.policies.get(device) is policy:
+            policy.resync()
+        if error is not None:
+            self.status(f"[{device}] Auto power: write failed: {error}")
+
+    def reset(self, device=None):
+        """
+        Forget one device (or all): its next decision writes the mode again.
+        """
+        for table in (self.meters, self.policies, self._next_decision):
+            if device is None:
+                table.clear()
+            else:
+                table.pop(device, None)
+
+    def stats(self, now=None):
+        """
+        {device: PowerPolicy.stats()}: current mode, transitions and duty cycle.
+        """
+        now = time.perf_counter() if now is None else now
+        return {device: policy.stats(now) for device, policy in self.policies.items() if policy.mode is not None}
+
+    def transitions(self, device):
+        policy = self.policies.get(device)
+        return list(policy.transitions) if policy else []
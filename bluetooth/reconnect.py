@@ -0,0 +1,56 @@
+import random
+
+# first retry after a link loss, and the longest wait between retries (s)
+DEFAULT_INITIAL_DELAY = 0.25
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_FACTOR = 2.0
+
+# attempts per outage before a session gives up (about 7 minutes with the delays above)
+DEFAULT_MAX_ATTEMPTS = 20
+
+# +/- fraction of each delay randomised, so devices lost together do not retry in lockstep
+DEFAULT_JITTER = 0.1
+
+
+class Backoff:
+    """
+    Exponential backoff between reconnect attempts.
+
+    initial_delay: wait before the first attempt
+    factor: growth of the wait after every failed attempt
+    max_delay: cap on the wait
+    max_attempts: attempts before giving up, None retries forever
+    """
+
+    def __init__(
+        self,
+        initial_delay=DEFAULT_INITIAL_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        factor=DEFAULT_FACTOR,
+        jitter=DEFAULT_JITTER,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.attempts = 0
+
+    def reset(self):
+        """
+        Call once connected again.
+        """
+        self.attempts = 0
+
+    def next_delay(self):
+        """
+        Seconds to wait before the next attempt, None when out of attempts.
+        """
+        if self.max_attempts is not None and self.attempts >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, self.initial_delay * self.factor ** self.attempts)
+        self.attempts += 1
+        if self.jitter:
+            delay *= 1.0 + random.uniform(-self.jitter, self.jitter)
+        return delay
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from core.metrics import METRICS
+
+
+class GattScheduler:
+    """
+    Shares one Bluetooth adapter between several device sessions.
+
+    GATT reads and notification subscriptions go through a limited number of
+    slots (FIFO, so devices are served in turn), and each device's stream starts
+    at a staggered offset so polling devices do not fire their reads in lockstep.
+
+    max_in_flight: GATT operations allowed at the same time across all devices
+    stagger: seconds between the stream starts of consecutive devices
+    """
+
+    def __init__(self, max_in_flight=1, stagger=0.005):
+        self.max_in_flight = max_in_flight
+        self.stagger = stagger
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._next_offset = 0
+        self.operations = 0
+
+        self._read_latency = METRICS.histogram(
+            "imu_gatt_read_seconds", "GATT read round trip, including the wait for a slot"
+        )
+
+    def reserve_offset(self):
+        """
+        Start delay (s) for the next device stream.
+        """
+        offset = self._next_offset * self.stagger
+        self._next_offset += 1
+        return offset
+
+    def release_offset(self):
+        self._next_offset = max(0, self._next_offset - 1)
+
+    async def read(self, client, uuid):
+        if not METRICS.enabled:
+            async with self._slots:
+                self.operations += 1
+                return await client.read_gatt_char(uuid)
+
+        start = time.perf_counter()
+        async with self._slots:
+            self.operations += 1
+            data = await client.read_gatt_char(uuid)
+        self._read_latency.observe(time.perf_counter() - start)
+        return data
+
+    async def write(self, client, uuid, data):
+        async with self._slots:
+            self.operations += 1
+            return await client.write_gatt_char(uuid, data)
+
+    async def start_notify(self, client, uuid, callback):
+        async with self._slots:
+            self.operations += 1
+            await client.start_notify(uuid, callback)
@@ -0,0 +1,542 @@
+"""
+In-process fake IMU peripheral for running BLEImuManager without a Bluetooth adapter.
+
+    peripheral = SimulatedPeripheral(IMU_DEVICE, odr=500)
+    ble = BLEImuManager(transport=SimulatedTransport([peripheral]))
+
+The peripheral exposes the characteristics of a device profile, serves synthetic
+motion (or a replayed recording) at a configurable ODR, and models per-read
+latency, notification batching, disconnects and power-mode changes.
+"""
+import asyncio
+import struct
+import time
+
+import numpy as np
+
+from core.device_profiles import as_profile
+from core.samples import SAMPLE_DTYPE, SAMPLE_FIELDS, PackedLayout
+
+MODE_LOW = 0
+MODE_HIGH = 1
+
+_FLOAT = struct.Struct("<f")
+_TIME = struct.Struct("<I")
+
+
+class SimulatedDevice:
+    """
+    Advertisement data, like bleak's BLEDevice.
+    """
+
+    def __init__(self, name, address):
+        self.name = name
+        self.address = address
+
+    def __repr__(self):
+        return f"SimulatedDevice({self.name!r}, {self.address!r})"
+
+
+class SimulatedCharacteristic:
+    def __init__(self, uuid, properties):
+        self.uuid = uuid
+        self.properties = list(properties)
+
+
+class SimulatedServices:
+    """
+    Minimal BleakGATTServiceCollection look-alike.
+    """
+
+    def __init__(self, characteristics):
+        self.characteristics = {c.uuid: c for c in characteristics}
+
+    def get_characteristic(self, specifier):
+        """
+        specifier: UUID or characteristic object, like bleak's
+        """
+        return self.characteristics.get(_uuid_of(specifier))
+
+
+def _uuid_of(specifier):
+    return getattr(specifier, "uuid", specifier)
+
+
+def _encode(values, dtype, factor):
+    # sample values (g, deg/s) in a profile's encoding: integer counts are rounded
+    if factor != 1.0:
+        values = values / factor
+    return np.round(values) if dtype.kind in "iu" else values
+
+
+class SimulatedPeripheral:
+    """
+    Fake IMU.
+
+    profile: device profile (core.device_profiles), or a dict of its old keys
+    odr: output data rate (Hz) in HIGH power mode
+    low_power_odr: output data rate (Hz) in LOW power mode
+    read_latency: seconds each GATT read/write takes (a connection interval round trip)
+    notify_batch: samples delivered together per notification burst
+    source: optional recording (recording.reader.Recording/Session or a SAMPLE_DTYPE
+        array) to replay in a loop instead of synthetic motion
+    motion: optional callable(seconds) returning the six axes (g, deg/s) at
+        those device times (s since the first sample), e.g. scripted phases of
+        rest and motion that stay put in time whatever the power mode
+    disconnect_after: seconds after connecting at which the link drops
+    outage: seconds after a link drop during which connection attempts fail
+    supports_notify: whether the characteristics advertise the notify property
+    time_scale: device clock ticks per second (ms by default)
+    clock_start: device time stamp (ticks) of the first sample, e.g. close to
+        2**32 to exercise counter wraparound
+    clock_drift_ppm: how much faster (+) the device clock runs than the host's
+    advertising_interval: seconds between advertisements seen by a background scan
+    fifo_size: samples the device buffers while the host is not collecting them;
+        older ones are overwritten and counted in samples_lost (None: unlimited)
+    """
+
+    def __init__(
+        self,
+        profile,
+        name="Simulated IMU",
+        address="SIM:00:00:00:00:01",
+        odr=100.0,
+        low_power_odr=10.0,
+        read_latency=0.0075,
+        notify_batch=1,
+        source=None,
+        motion=None,
+        disconnect_after=None,
+        outage=0.0,
+        supports_notify=True,
+        time_scale=1000,
+        clock_start=0,
+        clock_drift_ppm=0.0,
+        advertising_interval=0.1,
+        fifo_size=None,
+        seed=0,
+    ):
+        self.profile = as_profile(profile)
+        self.device = SimulatedDevice(name, address)
+        self.high_power_odr = float(odr)
+        self.low_power_odr = float(low_power_odr)
+        self.read_latency = read_latency
+        self.notify_batch = max(1, int(notify_batch))
+        self.disconnect_after = disconnect_after
+        self.outage = outage
+        self.available_at = 0.0
+        self.connections = 0
+        self.supports_notify = supports_notify
+        self.time_scale = time_scale
+        self.fifo_size = fifo_size
+        self.clock_drift_ppm = clock_drift_ppm
+        self.advertising_interval = advertising_interval
+
+        self.power_mode = MODE_HIGH
+        self.power_mode_changes = []
+        self.reads = 0
+        self.samples_sent = 0
+        self.samples_lost = 0
+
+        self._source = self._load_source(source)
+        self.motion = motion
+        self._rng = np.random.default_rng(seed)
+
+        self.field_uuids = self.profile.field_uuids
+        self.packed_uuid = self.profile.packed_uuid
+        self.packed_layout = PackedLayout(self.profile.packed_layout) if self.packed_uuid else None
+
+        # sample clock: index of the next sample, and when (host time) it is due
+        self._next_index = 0
+        self._latest = None  # last sample a polling read produced
+        self._clock_origin = None
+        self._clock_index = 0
+        self._clock_base_ticks = float(clock_start)
+        self._clock_start = float(clock_start)
+
+    @staticmethod
+    def _load_source(source):
+        if source is None:
+            return None
+        if isinstance(source, np.ndarray):
+            return source
+        chunks = list(source.iter_chunks())
+        return np.concatenate(chunks) if chunks else None
+
+    @property
+    def odr(self):
+        return self.high_power_odr if self.power_mode == MODE_HIGH else self.low_power_odr
+
+    def services(self):
+        props = ["read", "notify"] if self.supports_notify else ["read"]
+        uuids = [u for u in self.field_uuids if u]
+        if self.packed_uuid:
+            uuids.append(self.packed_uuid)
+
+        characteristics = [SimulatedCharacteristic(u, props) for u in uuids]
+        if self.profile.get("POWER_MODE_UUID"):
+            characteristics.append(
+                SimulatedCharacteristic(self.profile["POWER_MODE_UUID"], ["read", "write"])
+            )
+        return SimulatedServices(characteristics)
+
+    # ------------------------------------------------------
+    # Sample generation
+    # ------------------------------------------------------
+    def start_clock(self):
+        """
+        Called on connect. The device clock keeps running while disconnected,
+        so samples produced in the meantime are skipped on reconnect.
+        """
+        if self._clock_origin is None:
+            self._clock_origin = time.perf_counter()
+            self._clock_index = self._next_index
+        else:
+            self._next_index += self._unsent()
+
+    def _unsent(self):
+        elapsed = time.perf_counter() - self._clock_origin
+        return max(0, self._clock_index + int(elapsed * self.odr) - self._next_index)
+
+    def due_samples(self):
+        """
+        Number of samples the device has produced but not yet sent.
+        """
+        due = self._unsent()
+        if self.fifo_size and due > self.fifo_size:
+            # the FIFO overflowed: the oldest samples were overwritten
+            self.samples_lost += due - self.fifo_size
+            self._next_index += due - self.fifo_size
+            due = self.fifo_size
+        return due
+
+    def take_samples(self, count):
+        """
+        Produce the next count samples as a SAMPLE_DTYPE batch.
+        """
+        index = np.arange(self._next_index, self._next_index + count)
+        self._next_index += count
+        self.samples_sent += count
+
+        batch = np.empty(count, dtype=SAMPLE_DTYPE)
+        ticks = self._device_time(index)
+        batch["t"] = ticks.astype(np.uint64) & 0xFFFFFFFF
+
+        if self.motion is not None:
+            seconds = (ticks - self._clock_start) / self.time_scale
+            for name, values in zip(SAMPLE_FIELDS[:-1], self.motion(seconds)):
+                batch[name] = values
+            return batch
+
+        if self._source is not None and len(self._source):
+            replay = self._source[index % len(self._source)]
+            for name in SAMPLE_FIELDS[:-1]:
+                batch[name] = replay[name]
+            return batch
+
+        # synthetic motion: slow sway plus vibration and noise, gravity on z
+        seconds = index / self.high_power_odr
+        noise = self._rng.normal(0.0, 0.01, size=(6, count))
+        batch["ax"] = 0.2 * np.sin(2 * np.pi * 0.5 * seconds) + noise[0]
+        batch["ay"] = 0.1 * np.sin(2 * np.pi * 12.0 * seconds) + noise[1]
+        batch["az"] = 1.0 + 0.05 * np.cos(2 * np.pi * 0.5 * seconds) + noise[2]
+        batch["gx"] = 20.0 * np.cos(2 * np.pi * 0.5 * seconds) + noise[3]
+        batch["gy"] = 5.0 * np.sin(2 * np.pi * 1.0 * seconds) + noise[4]
+        batch["gz"] = noise[5]
+        return batch
+
+    def latest_sample(self):
+        """
+        The most recent sample, as a polling read sees it (older unsent samples
+        are skipped; polled faster than the ODR, the same sample is read again).
+        """
+        unsent = self._unsent()
+        if unsent == 0 and self._latest is not None:
+            return self._latest
+        self._next_index += max(0, unsent - 1)
+        self._latest = self.take_samples(1)[0]
+        return self._latest
+
+    def host_time_of(self, t):
+        """
+        perf_counter() time at which the sample with device time t was produced
+        (valid since the last power-mode change; ignores 32-bit wraparound).
+        """
+        ticks_per_second = self.time_scale * (1.0 + self.clock_drift_ppm * 1e-6)
+        return self._clock_origin + (np.asarray(t, dtype=np.float64) - self._clock_base_ticks) / ticks_per_second
+
+    def _device_time(self, index):
+        # device ticks since power on; the clock restarts when the ODR changes
+        ticks_per_second = self.time_scale * (1.0 + self.clock_drift_ppm * 1e-6)
+        return self._clock_base_ticks + (index - self._clock_index) * ticks_per_second / self.odr
+
+    def set_power_mode(self, mode):
+        """
+        Switch ODR. The sample clock restarts so device time stays continuous.
+        """
+        if mode == self.power_mode:
+            return
+        if self._clock_origin is not None:
+            self._clock_base_ticks = float(self._device_time(np.array([self._next_index]))[0])
+            self._clock_index = self._next_index
+            self._clock_origin = time.perf_counter()
+        self.power_mode = mode
+        self.power_mode_changes.append((time.perf_counter(), mode))
+
+    def encode_packed(self, batch):
+        layout = self.packed_layout
+        records = np.zeros(len(batch), dtype=layout.record_dtype)
+        for name in SAMPLE_FIELDS:
+            records[name] = _encode(batch[name], records.dtype[name], layout.scale.get(name, 1.0))
+        return bytearray(records.tobytes())
+
+
+class SimulatedClient:
+    """
+    BleakClient look-alike connected to a SimulatedPeripheral.
+    """
+
+    def __init__(self, peripheral, timeout=20, disconnected_callback=None, lookup_latency=0.0):
+        self.peripheral = peripheral
+        self.address = peripheral.device.address
+        self.timeout = timeout
+        self.lookup_latency = lookup_latency
+        self.disconnected_callback = disconnected_callback
+        self.services = None
+        self._last_sample = None
+        self._connected = False
+        self._callbacks = {}
+        self._notify_task = None
+        self._drop_task = None
+
+    @property
+    def is_connected(self):
+        return self._connected
+
+    async def connect(self):
+        # created from an address: find the device first, as BleakClient does
+        await asyncio.sleep(self.lookup_latency + self.peripheral.read_latency * 4)
+        if time.perf_counter() < self.peripheral.available_at:
+            raise ConnectionError(f"Device with address {self.address} was not found")
+        self.services = self.peripheral.services()
+        self._connected = True
+        self.peripheral.connections += 1
+        self.peripheral.start_clock()
+
+        if self.peripheral.disconnect_after is not None:
+            self._drop_task = asyncio.create_task(self._drop_later(self.peripheral.disconnect_after))
+        return True
+
+    async def disconnect(self):
+        self._shutdown()
+        return True
+
+    def drop(self):
+        """
+        Simulate a link loss (RF dropout): the disconnected callback fires.
+        """
+        if not self._connected:
+            return
+        self._shutdown()
+        self.peripheral.available_at = time.perf_counter() + self.peripheral.outage
+        if self.disconnected_callback:
+            self.disconnected_callback(self)
+
+    async def _drop_later(self, delay):
+        await asyncio.sleep(delay)
+        self._drop_task = None
+        self.drop()
+
+    def _shutdown(self):
+        self._connected = False
+        self._callbacks.clear()
+        for task in (self._notify_task, self._drop_task):
+            if task and task is not asyncio.current_task():
+                task.cancel()
+        self._notify_task = None
+        self._drop_task = None
+
+    def _check_connected(self):
+        if not self._connected:
+            raise ConnectionError("Simulated device not connected")
+
+    # ------------------------------------------------------
+    # GATT operations
+    # ------------------------------------------------------
+    async def read_gatt_char(self, uuid):
+        uuid = _uuid_of(uuid)
+        self._check_connected()
+        await asyncio.sleep(self.peripheral.read_latency)
+        self._check_connected()
+
+        peripheral = self.peripheral
+        peripheral.reads += 1
+
+        if uuid == peripheral.packed_uuid:
+            count = min(max(peripheral.due_samples(), 1), peripheral.packed_layout.samples_per_payload)
+            return peripheral.encode_packed(peripheral.take_samples(count))
+
+        if uuid == peripheral.profile.get("POWER_MODE_UUID"):
+            return bytearray([peripheral.power_mode])
+
+        # polling: a new sample starts with the first axis, the other fields repeat it
+        if uuid == peripheral.field_uuids[0] or self._last_sample is None:
+            self._last_sample = peripheral.latest_sample()
+        return self._encode_field(uuid, self._last_sample)
+
+    async def write_gatt_char(self, uuid, data, response=True):
+        uuid = _uuid_of(uuid)
+        self._check_connected()
+        await asyncio.sleep(self.peripheral.read_latency)
+        if uuid == self.peripheral.profile.get("POWER_MODE_UUID"):
+            self.peripheral.set_power_mode(data[0])
+
+    async def start_notify(self, uuid, callback):
+        uuid = _uuid_of(uuid)
+        self._check_connected()
+        characteristic = self.services.get_characteristic(uuid)
+        if characteristic is None or "notify" not in characteristic.properties:
+            raise ValueError(f"Characteristic {uuid} does not support notify")
+
+        self._callbacks[uuid] = callback
+        if self._notify_task is None:
+            self._notify_task = asyncio.create_task(self._notify_loop())
+
+    async def stop_notify(self, uuid):
+        self._callbacks.pop(_uuid_of(uuid), None)
+        if not self._callbacks and self._notify_task:
+            self._notify_task.cancel()
+            self._notify_task = None
+
+    def _encode_field(self, uuid, sample):
+        index = self.peripheral.field_uuids.index(uuid)
+        field = self.peripheral.profile.sample_fields[index]
+        if not field.raw:
+            # the profile's encoding, e.g. int16 counts of field.factor each
+            dtype = np.dtype(field.format)
+            return bytearray(np.array([_encode(sample[field.name], dtype, field.factor)], dtype=dtype).tobytes())
+        if field.name == "t":
+            return bytearray(_TIME.pack(int(sample["t"])))
+        return bytearray(_FLOAT.pack(float(sample[field.name])))
+
+    async def _notify_loop(self):
+        """
+        Deliver samples in bursts of notify_batch, as produced by the device clock.
+        """
+        peripheral = self.peripheral
+        try:
+            while self._connected:
+                await asyncio.sleep(peripheral.notify_batch / peripheral.odr)
+
+                due = peripheral.due_samples()
+                if due < peripheral.notify_batch:
+                    continue
+
+                batch = peripheral.take_samples(due)
+                if peripheral.packed_uuid in self._callbacks:
+                    per_payload = peripheral.packed_layout.samples_per_payload
+                    callback = self._callbacks[peripheral.packed_uuid]
+                    for start in range(0, len(batch), per_payload):
+                        callback(peripheral.packed_uuid, peripheral.encode_packed(batch[start:start + per_payload]))
+                    continue
+
+                for sample in batch:
+                    for uuid in peripheral.field_uuids:
+                        callback = self._callbacks.get(uuid)
+                        if callback:
+                            callback(uuid, self._encode_field(uuid, sample))
+        except asyncio.CancelledError:
+            pass
+
+
+class SimulatedScanner:
+    """
+    Background scan: every peripheral advertises once per advertising_interval,
+    starting at a random phase.
+    """
+
+    def __init__(self, peripherals, callback, seed=0):
+        self.peripherals = peripherals
+        self.callback = callback
+        self._rng = np.random.default_rng(seed)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._advertise())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _advertise(self):
+        now = time.perf_counter()
+        due = [now + self._rng.uniform(0, p.advertising_interval) for p in self.peripherals]
+        while self.peripherals:
+            index = int(np.argmin(due))
+            await asyncio.sleep(max(0.0, due[index] - time.perf_counter()))
+            peripheral = self.peripherals[index]
+            rssi = -45 - 5 * index + int(self._rng.integers(-3, 4))
+            self.callback(peripheral.device, rssi)
+            due[index] += peripheral.advertising_interval
+
+
+class SimulatedTransport:
+    """
+    Transport serving SimulatedPeripheral objects, same interface as BleakTransport.
+    scan_latency: seconds a discovery takes
+    """
+
+    def __init__(self, peripherals, scan_latency=0.05):
+        self.peripherals = {p.device.address: p for p in peripherals}
+        self.scan_latency = scan_latency
+        self.clients = []
+        self.address_lookups = 0
+
+    async def discover(self, service_uuid, timeout=5.0):
+        await asyncio.sleep(min(self.scan_latency, timeout))
+        return [
+            p.device for p in self.peripherals.values()
+            if p.profile.get("SERVICE_UUID") == service_uuid
+        ]
+
+    async def start_scan(self, service_uuid, callback):
+        scanner = SimulatedScanner(
+            [p for p in self.peripherals.values() if p.profile.get("SERVICE_UUID") == service_uuid],
+            callback,
+        )
+        scanner.start()
+        return scanner
+
+    def create_client(self, device, timeout=20, disconnected_callback=None):
+        lookup_latency = 0.0
+        if not isinstance(device, SimulatedDevice):
+            # an address alone costs a scan, as with bleak
+            self.address_lookups += 1
+            lookup_latency = self.scan_latency
+        address = getattr(device, "address", device)
+        client = SimulatedClient(self.peripherals[address], timeout, disconnected_callback, lookup_latency)
+        self.clients.append(client)
+        return client
+
+
+def simulated_transport(profile, devices=1, **options):
+    """
+    SimulatedTransport with `devices` peripherals of one profile. Module level,
+    so it can be handed to another process (see acquisition.process).
+    options: SimulatedPeripheral keyword arguments
+    """
+    return SimulatedTransport([
+        SimulatedPeripheral(
+            profile,
+            name=f"Simulated IMU {i}",
+            address=f"SIM:00:00:00:00:{i + 1:02X}",
+            seed=i,
+            **options,
+        )
+        for i in range(devices)
+    ])
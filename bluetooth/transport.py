@@ -0,0 +1,36 @@
+from bleak import BleakScanner, BleakClient
+
+
+class BleakTransport:
+    """
+    Real Bluetooth transport backed by bleak.
+
+    A transport provides discovery and client creation for BLEImuManager;
+    bluetooth.simulated.SimulatedTransport offers the same interface without hardware.
+    """
+
+    async def discover(self, service_uuid, timeout=5.0):
+        """
+        Return the devices advertising service_uuid (objects with .name and .address).
+        """
+        return await BleakScanner.discover(timeout=timeout, service_uuids=[service_uuid])
+
+    async def start_scan(self, service_uuid, callback):
+        """
+        Scan continuously, calling callback(device, rssi) for every advertisement
+        of a device advertising service_uuid. Returns the scanner; await its stop().
+        """
+        def detected(device, advertisement):
+            callback(device, advertisement.rssi)
+
+        scanner = BleakScanner(detection_callback=detected, service_uuids=[service_uuid])
+        await scanner.start()
+        return scanner
+
+    def create_client(self, device, timeout=20, disconnected_callback=None):
+        """
+        Return an unconnected client for a device object from a scan, or an
+        address. A device object connects directly; an address makes bleak scan
+        for the device first.
+        """
+        return BleakClient(device, timeout=timeout, disconnected_callback=disconnected_callback)
@@ -0,0 +1,162 @@
+"""
+Headless capture: stream IMU data straight to the binary recorder, without Qt,
+matplotlib or any rendering. For edge boxes and CI.
+
+Runs until --duration seconds have passed, --samples samples were recorded,
+or Ctrl+C, printing throughput every --stats-interval seconds.
+
+Usage:
+    python capture.py [--profile "Packed IMU"] [--all] [--duration 60] [--samples N]
+                      [--output recordings] [--stats-interval 1]
+                      [--simulate DEVICES] [--odr 1000] [--codec zlib]
+
+--codec writes chunked, compressed .imuz files (recording.compressed), with
+the channels the profile's quantization allows stored as int16.
+"""
+import argparse
+import asyncio
+import signal
+import sys
+import time
+
+from bluetooth.ble_imu_manager import BLEImuManager
+from core.device_profiles import AVAILABLE_DEVICES
+from core.samples import SampleBatch, as_batch
+from recording.compressed import CODECS
+from recording.recorder import BinaryRecorder
+
+DEFAULT_STATS_INTERVAL = 1.0
+
+
+class RecorderSink:
+    """
+    Data queue end that hands every item straight to the recorder's writer
+    thread, counting samples. Once max_samples have arrived the rest are
+    discarded and `done` is set.
+    """
+
+    def __init__(self, recorder, max_samples=None):
+        self.recorder = recorder
+        self.max_samples = max_samples
+        self.samples = 0
+        self.done = asyncio.Event()
+
+    def put_nowait(self, item):
+        if self.done.is_set():
+            return
+
+        count = len(item) if isinstance(item, SampleBatch) else 1
+        if self.max_samples is not None and self.samples + count > self.max_samples:
+            # stop exactly at the limit
+            count = self.max_samples - self.samples
+            item = SampleBatch(item.device, as_batch(item)[:count], item.seq, item.host_t, item.gap)
+
+        self.recorder.submit(item)
+        self.samples += count
+        if self.max_samples is not None and self.samples >= self.max_samples:
+            self.done.set()
+
+    async def put(self, item):
+        self.put_nowait(item)
+
+
+async def report_stats(ble, sink, recorder, interval, started):
+    """
+    Print overall and per-device throughput every interval seconds.
+    """
+    last_time, last_samples = started, 0
+    while True:
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        rate = (sink.samples - last_samples) / (now - last_time)
+        last_time, last_samples = now, sink.samples
+
+        devices = "  ".join(
+            f"{stats['name']}: {stats['samples_per_sec']:.0f}/s"
+            + (" (reconnecting)" if stats["state"] == "reconnecting" else "")
+            for stats in ble.device_stats().values()
+        )
+        print(
+            f"[{now - started:7.1f} s] {sink.samples} samples, {rate:.0f} samples/s, "
+            f"{recorder.bytes_written / 1e6:.2f} MB written  {devices}",
+            flush=True,
+        )
+
+
+async def capture(args):
+    """
+    Returns the process exit code.
+    """
+    profile = AVAILABLE_DEVICES[args.profile]
+
+    transport = None
+    if args.simulate:
+        from bluetooth.simulated import simulated_transport
+        transport = simulated_transport(profile, devices=args.simulate, odr=args.odr)
+
+    ble = BLEImuManager(transport=transport)
+    ble.status.connect(lambda text: print(text, flush=True))
+
+    recorder = BinaryRecorder(
+        args.output, codec=args.codec, quantization=profile.quantization, status=ble.status.emit
+    )
+    sink = RecorderSink(recorder, args.samples)
+
+    # record from the first sample on; files are only created once data arrives
+    recorder.start(device_profile=args.profile)
+    await ble.connect_profile(sink, profile, args.all, stream_mode=args.mode)
+    if not ble.is_connected:
+        recorder.stop()
+        print("Nothing to capture.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    reporter = asyncio.create_task(report_stats(ble, sink, recorder, args.stats_interval, started))
+
+    # Ctrl+C / SIGTERM end the capture cleanly
+    interrupted = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, interrupted.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: KeyboardInterrupt ends asyncio.run() instead
+
+    waits = [asyncio.create_task(sink.done.wait()), asyncio.create_task(interrupted.wait())]
+    await asyncio.wait(waits, timeout=args.duration, return_when=asyncio.FIRST_COMPLETED)
+    for task in waits + [reporter]:
+        task.cancel()
+
+    elapsed = time.perf_counter() - started
+    await ble.disconnect()
+    recorder.stop()
+
+    print(
+        f"Captured {sink.samples} samples in {elapsed:.1f} s "
+        f"({sink.samples / elapsed if elapsed > 0 else 0.0:.0f} samples/s), "
+        f"{recorder.bytes_written / 1e6:.2f} MB in {len(recorder.paths)} file(s):"
+    )
+    for path in recorder.paths:
+        print(f"  {path}")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=list(AVAILABLE_DEVICES), default=next(iter(AVAILABLE_DEVICES)))
+    parser.add_argument("--mode", choices=("poll", "notify", "packed"),
+                        help="stream mode, the profile's by default")
+    parser.add_argument("--all", action="store_true", help="capture from every device in range")
+    parser.add_argument("--duration", type=float, help="seconds to capture (default: until Ctrl+C)")
+    parser.add_argument("--samples", type=int, help="stop after this many samples")
+    parser.add_argument("--output", default="recordings", help="recording directory")
+    parser.add_argument("--codec", choices=CODECS, help="record compressed with this codec")
+    parser.add_argument("--stats-interval", type=float, default=DEFAULT_STATS_INTERVAL)
+    parser.add_argument("--simulate", type=int, metavar="DEVICES",
+                        help="capture from this many simulated peripherals instead of Bluetooth")
+    parser.add_argument("--odr", type=float, default=1000.0, help="sample rate of simulated peripherals")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(capture(parse_args())))
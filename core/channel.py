@@ -0,0 +1,212 @@
+import asyncio
+import collections
+import time
+
+from core.metrics import METRICS
+
+POLICY_BLOCK = "block"
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DROP_NEWEST = "drop_newest"
+POLICY_DECIMATE = "decimate"
+
+POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_DECIMATE)
+
+
+def _item_len(item):
+    try:
+        return len(item)
+    except TypeError:
+        return 1
+
+
+class SampleChannel:
+    """
+    Bounded queue between the BLE stream and one consumer, with the
+    asyncio.Queue interface used by the acquisition code (put, put_nowait, get,
+    get_nowait, empty, qsize).
+
+    maxsize: items held before the policy applies
+    policy: what happens when full
+        "block"        put() waits for room, so nothing is lost; put_nowait()
+                       (notification callbacks, which cannot wait) discards the
+                       incoming item and counts it in dropped and refused
+        "drop_oldest"  the oldest item is discarded, the consumer sees fresh data
+        "drop_newest"  the incoming item is discarded
+        "decimate"     every other queued item is discarded, keeping the time span
+                       covered at half the resolution
+    """
+
+    def __init__(self, maxsize=1024, policy=POLICY_DROP_OLDEST, name=""):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown channel policy: {policy}")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.name = name
+
+        self._items = collections.deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+        # counters (samples, not items, except where noted)
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.high_water = 0  # items
+        self.refused = 0  # items put_nowait() discarded because a "block" channel was full
+        self.last_lag = 0.0  # seconds between host receive and get, of the last item
+
+    def qsize(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def full(self):
+        return len(self._items) >= self.maxsize
+
+    # ------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------
+    def put_nowait(self, item):
+        self.received += _item_len(item)
+
+        if self.full():
+            if self.policy in (POLICY_DROP_NEWEST, POLICY_BLOCK):
+                self.dropped += _item_len(item)
+                if self.policy == POLICY_BLOCK:
+                    self.refused += 1
+                return
+            if self.policy == POLICY_DROP_OLDEST:
+                self.dropped += _item_len(self._items.popleft())
+            else:
+                self._decimate()
+
+        self._items.append(item)
+        if len(self._items) > self.high_water:
+            self.high_water = len(self._items)
+        if len(self._items) >= self.maxsize:
+            self._not_full.clear()
+        self._not_empty.set()
+
+    async def put(self, item):
+        if self.policy == POLICY_BLOCK:
+            while self.full():
+                self._not_full.clear()
+                await self._not_full.wait()
+        self.put_nowait(item)
+
+    def _decimate(self):
+        kept = collections.deque()
+        for index, item in enumerate(self._items):
+            if index % 2:
+                self.dropped += _item_len(item)
+            else:
+                kept.append(item)
+        self._items = kept
+
+    # ------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------
+    def get_nowait(self):
+        if not self._items:
+            raise asyncio.QueueEmpty
+
+        item = self._items.popleft()
+        self.delivered += _item_len(item)
+
+        host_t = getattr(item, "host_t", None)
+        if host_t is not None:
+            self.last_lag = time.perf_counter() - host_t
+
+        if not self._items:
+            self._not_empty.clear()
+        if len(self._items) < self.maxsize:
+            self._not_full.set()
+        return item
+
+    async def get(self):
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def oldest_age(self):
+        """
+        Seconds since the oldest queued item was received by the host.
+        """
+        if not self._items:
+            return 0.0
+        host_t = getattr(self._items[0], "host_t", None)
+        return time.perf_counter() - host_t if host_t is not None else 0.0
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "depth": len(self._items),
+            "maxsize": self.maxsize,
+            "high_water": self.high_water,
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "refused": self.refused,
+            "lag": self.last_lag,
+            "oldest_age": self.oldest_age(),
+        }
+
+
+class ChannelFanout:
+    """
+    Producer-side handle delivering every item to several channels, e.g. a
+    drop-oldest channel for the live view and a lossless one for the recorder.
+    """
+
+    def __init__(self, channels):
+        self.channels = list(channels)
+
+    def put_nowait(self, item):
+        for channel in self.channels:
+            channel.put_nowait(item)
+
+    async def put(self, item):
+        for channel in self.channels:
+            await channel.put(item)
+
+    def qsize(self):
+        return max((c.qsize() for c in self.channels), default=0)
+
+    def empty(self):
+        return all(c.empty() for c in self.channels)
+
+
+def watch_channel(channel, registry=METRICS):
+    """
+    Expose a channel's depth, oldest item age and counters as gauges, read
+    only when metrics are collected (nothing is added to put/get).
+    The channel's name labels the series.
+    """
+    series = (
+        ("imu_queue_depth", "Items waiting in the queue", channel.qsize),
+        ("imu_queue_oldest_age_seconds", "Age of the oldest queued item", channel.oldest_age),
+        ("imu_queue_high_water", "Most items ever queued", lambda: channel.high_water),
+        ("imu_queue_received_samples", "Samples put on the queue", lambda: channel.received),
+        ("imu_queue_dropped_samples", "Samples dropped by the queue policy", lambda: channel.dropped),
+    )
+    for name, help, fn in series:
+        registry.gauge(name, help, fn=fn, queue=channel.name)
+
+
+async def drain_into(channel, submit):
+    """
+    Pass every item of a channel to submit(item), e.g. a recorder or a
+    processing stage with a background thread. Runs until cancelled.
+    """
+    while True:
+        submit(await channel.get())
+        # take whatever else is already waiting without yielding in between
+        while not channel.empty():
+            submit(channel.get_nowait())
@@ -1,22 +1,440 @@
-IMU_DEVICE = {
-    "SERVICE_UUID": "0b91a798-23b1-4369-9d45-a3a26d936904",
-    "POWER_MODE_UUID": "3eb744fd-740d-4cd1-81bb-bb450ae80c18",
-    "TIME_UUID": "72d913bb-e8df-44b8-b8ec-4f098978e0be",
-    "ACCEL_X_UUID": "026080c9-dc3a-401b-829c-2ee3b5565200",
-    "ACCEL_Y_UUID": "e0a0b53e-5c53-4acf-bf79-39d2982362e9",
-    "ACCEL_Z_UUID": "94b54966-faa7-48c1-9b53-7e44a9a872be",
-    "GYRO_X_UUID":  "d30c8099-5b3e-4d4f-9c42-40b47a3f71ea",
-    "GYRO_Y_UUID":  "734c0d37-c4fc-4265-953f-0aa24d28b1a5",
-    "GYRO_Z_UUID":  "e51f3e60-3fdd-4591-9910-87362247c68d",
-}
+"""
+Device profile registry.
 
-# Example future device support:
-ALT_IMU_DEVICE = {
-    "SERVICE_UUID": "...",
-    "TIME_UUID": "...",
-}
+Profiles are data files (JSON, one per device, in core/profiles/) validated
+when they are loaded, so a typo in a UUID, a missing field or an unknown
+stream mode is reported at startup instead of failing mid-stream:
+
+    {
+        "name": "Standard IMU",
+        "service_uuid": "0b91a798-23b1-4369-9d45-a3a26d936904",
+        "power_mode_uuid": "3eb744fd-740d-4cd1-81bb-bb450ae80c18",
+        "stream_mode": "notify",
+        "fields": [
+            {"name": "ax", "uuid": "026080c9-...", "format": "<f4", "unit": "g"},
+            {"name": "gx", "uuid": "d30c8099-...", "format": "<i2", "scale": 0.0625, "unit": "deg/s"},
+            {"name": "t", "uuid": "72d913bb-...", "format": "<u4", "unit": "ms"},
+            ...
+        ]
+    }
+
+fields: every sample field (SAMPLE_FIELDS) once, with how the device encodes
+    it: "format" a little-endian numpy type string ("<f4", "<i2", "<u4", ...),
+    "scale" multiplying the decoded value into "unit" (accelerations in g or
+    m/s^2, angular rates in deg/s or rad/s, device time in ms).
+    Samples are always delivered in g and deg/s; other units are converted.
+stream_mode: "notify", "poll" (one characteristic per field, "uuid" each) or
+    "packed" (records of every field in one characteristic; "packed":
+    {"uuid", "samples_per_payload"} and the fields in payload order, names
+    other than the sample fields being padding).
+quantization: optional {channel: step} for channels whose values are whole
+    multiples of step (e.g. the sensor's LSB in g or deg/s). Compressed
+    recordings (recording.compressed) store those channels as 16-bit integers.
+
+A DeviceProfile also reads like the dicts profiles used to be
+(profile["SERVICE_UUID"], profile.get("PACKED_LAYOUT"), ...).
+"""
+import json
+import math
+import os
+import re
+from collections.abc import Mapping
+
+# same order as core.samples.SAMPLE_FIELDS (not imported: it would load numpy at startup)
+SAMPLE_FIELDS = ("ax", "ay", "az", "gx", "gy", "gz", "t")
+
+STREAM_MODES = ("notify", "poll", "packed")
+
+# data files shipped with the application
+PROFILE_DIRECTORY = os.path.join(os.path.dirname(__file__), "profiles")
+PROFILE_SUFFIX = ".json"
+
+# unit -> factor into the unit samples are delivered in (g, deg/s, ms)
+ACCEL_UNITS = {"g": 1.0, "m/s^2": 1.0 / 9.80665}
+GYRO_UNITS = {"deg/s": 1.0, "rad/s": 180.0 / math.pi}
+# the time stamp is a wrapping counter, so it is kept in the pipeline's tick rather than rescaled
+TIME_UNITS = {"ms": 1.0}
 
-AVAILABLE_DEVICES = {
-    "Standard IMU": IMU_DEVICE,
-    "Alternative IMU": ALT_IMU_DEVICE,
+_FIELD_UNITS = {
+    "ax": ACCEL_UNITS, "ay": ACCEL_UNITS, "az": ACCEL_UNITS,
+    "gx": GYRO_UNITS, "gy": GYRO_UNITS, "gz": GYRO_UNITS,
+    "t": TIME_UNITS,
 }
+
+# legacy dict keys of the per-field characteristics, in SAMPLE_FIELDS order
+FIELD_UUID_KEYS = (
+    "ACCEL_X_UUID",
+    "ACCEL_Y_UUID",
+    "ACCEL_Z_UUID",
+    "GYRO_X_UUID",
+    "GYRO_Y_UUID",
+    "GYRO_Z_UUID",
+    "TIME_UUID",
+)
+
+_UUID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+# numpy type strings: byte order, kind, size in bytes; V<n> is padding
+_FORMAT = re.compile(r"^([<>|=]?)([iufV])(\d+)$")
+
+_PROFILE_KEYS = {"name", "description", "service_uuid", "power_mode_uuid", "stream_mode", "fields", "packed",
+                 "quantization"}
+_FIELD_KEYS = {"name", "uuid", "format", "scale", "unit"}
+_PACKED_KEYS = {"uuid", "samples_per_payload"}
+
+
+class ProfileError(ValueError):
+    """
+    A device profile that cannot be used; the message names the source and the problem.
+    """
+
+
+def _uuid(value, what):
+    if not isinstance(value, str) or not _UUID.match(value.lower()):
+        raise ProfileError(f"{what} is not a 128-bit UUID: {value!r}")
+    return value.lower()
+
+
+def _parse_format(value, what):
+    """
+    (kind, size) of a numpy type string.
+    """
+    match = _FORMAT.match(value) if isinstance(value, str) else None
+    if match is None:
+        raise ProfileError(f"{what}: unknown format {value!r}")
+    order, kind, size = match.group(1), match.group(2), int(match.group(3))
+    valid = {"i": (1, 2, 4, 8), "u": (1, 2, 4, 8), "f": (2, 4, 8)}.get(kind)
+    if valid is not None and size not in valid:
+        raise ProfileError(f"{what}: unknown format {value!r}")
+    if order == ">" or (order in ("", "=") and size > 1 and kind != "V"):
+        raise ProfileError(f"{what}: format {value!r} must be little-endian ('<')")
+    return kind, size
+
+
+class FieldSpec:
+    """
+    How a device encodes one sample field.
+
+    name: SAMPLE_FIELDS name ("pad..." and other names are padding in packed records)
+    format: numpy type string of the encoded value
+    uuid: characteristic carrying it (per-field stream modes)
+    scale: factor from the decoded value into unit
+    unit: unit after scaling
+
+    factor is the overall factor into the unit samples are delivered in;
+    raw is True when the payload bytes can be copied into a sample as they are.
+    """
+
+    __slots__ = ("name", "format", "uuid", "scale", "unit", "factor", "raw")
+
+    def __init__(self, name, format, uuid=None, scale=1.0, unit=None):
+        self.name = name
+        self.format = format
+        self.uuid = uuid
+        self.scale = scale
+        self.unit = unit
+        conversions = _FIELD_UNITS.get(name)
+        self.factor = scale * conversions[unit] if conversions else scale
+
+        kind, size = _parse_format(format, f"field {name!r}")
+        if name == "t":
+            self.raw = kind == "u" and self.factor == 1.0
+        else:
+            self.raw = kind == "f" and size == 4 and self.factor == 1.0
+
+    def __repr__(self):
+        return f"FieldSpec({self.name!r}, {self.format!r}, uuid={self.uuid!r}, scale={self.scale}, unit={self.unit!r})"
+
+
+class DeviceProfile(Mapping):
+    """
+    Validated device profile (see the module docstring for the file format).
+
+    fields: FieldSpecs in payload order (packed) or file order
+    sample_fields: FieldSpecs of SAMPLE_FIELDS, in that order
+    source: file the profile was loaded from, None when built in code
+    """
+
+    def __init__(self, name, service_uuid, stream_mode, fields, power_mode_uuid=None, packed_uuid=None,
+                 samples_per_payload=None, quantization=None, description=None, source=None):
+        self.name = name
+        self.service_uuid = service_uuid
+        self.stream_mode = stream_mode
+        self.fields = tuple(fields)
+        self.power_mode_uuid = power_mode_uuid
+        self.packed_uuid = packed_uuid
+        self.samples_per_payload = samples_per_payload
+        self.quantization = dict(quantization) if quantization else None
+        self.description = description
+        self.source = source
+
+        by_name = {field.name: field for field in self.fields}
+        self.sample_fields = tuple(by_name[name] for name in SAMPLE_FIELDS)
+        self.units = {field.name: field.unit for field in self.sample_fields}
+        self._legacy = self._legacy_view()
+
+    # ------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------
+    @classmethod
+    def from_dict(cls, data, source=None):
+        """
+        Validate a profile as read from its data file. Raises ProfileError.
+        """
+        where = source or "profile"
+        try:
+            return cls._from_dict(data, source)
+        except ProfileError as e:
+            raise ProfileError(f"{where}: {e}") from None
+
+    @classmethod
+    def _from_dict(cls, data, source):
+        if not isinstance(data, dict):
+            raise ProfileError("a profile must be a JSON object")
+        unknown = set(data) - _PROFILE_KEYS
+        if unknown:
+            raise ProfileError(f"unknown keys: {', '.join(sorted(unknown))}")
+
+        name = data.get("name")
+        if not isinstance(name, str) or not name.strip():
+            raise ProfileError("missing 'name'")
+        service_uuid = _uuid(data.get("service_uuid"), "service_uuid")
+        power_mode_uuid = data.get("power_mode_uuid")
+        if power_mode_uuid is not None:
+            power_mode_uuid = _uuid(power_mode_uuid, "power_mode_uuid")
+
+        stream_mode = data.get("stream_mode")
+        if stream_mode not in STREAM_MODES:
+            raise ProfileError(f"stream_mode must be one of {', '.join(STREAM_MODES)}, not {stream_mode!r}")
+        packed = stream_mode == "packed"
+
+        fields = [cls._field(entry, packed) for entry in cls._list(data.get("fields"), "fields")]
+        names = [field.name for field in fields]
+        duplicates = sorted({n for n in names if names.count(n) > 1})
+        if duplicates:
+            raise ProfileError(f"fields given twice: {', '.join(duplicates)}")
+        missing = [n for n in SAMPLE_FIELDS if n not in names]
+        if missing:
+            raise ProfileError(f"fields missing: {', '.join(missing)}")
+
+        packed_uuid = samples_per_payload = None
+        if packed:
+            spec = data.get("packed")
+            if not isinstance(spec, dict):
+                raise ProfileError("stream_mode 'packed' needs a 'packed' object")
+            unknown = set(spec) - _PACKED_KEYS
+            if unknown:
+                raise ProfileError(f"unknown 'packed' keys: {', '.join(sorted(unknown))}")
+            packed_uuid = _uuid(spec.get("uuid"), "packed uuid")
+            samples_per_payload = spec.get("samples_per_payload", 1)
+            if not isinstance(samples_per_payload, int) or isinstance(samples_per_payload, bool) \
+                    or samples_per_payload < 1:
+                raise ProfileError(f"samples_per_payload must be a positive integer, not {samples_per_payload!r}")
+        elif "packed" in data:
+            raise ProfileError(f"'packed' given for stream_mode {stream_mode!r}")
+
+        uuids = [u for u in [power_mode_uuid, packed_uuid] + [f.uuid for f in fields] if u]
+        repeated = sorted({u for u in uuids if uuids.count(u) > 1})
+        if repeated:
+            raise ProfileError(f"characteristic used twice: {', '.join(repeated)}")
+
+        quantization = data.get("quantization")
+        if quantization is not None:
+            if not isinstance(quantization, dict):
+                raise ProfileError("quantization must be an object {channel: step}")
+            for channel, step in quantization.items():
+                if channel not in SAMPLE_FIELDS[:-1]:
+                    raise ProfileError(f"quantization of unknown channel {channel!r}")
+                if not cls._positive(step):
+                    raise ProfileError(f"quantization step of {channel} must be a positive number")
+
+        description = data.get("description")
+        return cls(
+            name.strip(), service_uuid, stream_mode, fields, power_mode_uuid, packed_uuid,
+            samples_per_payload, quantization, description, source,
+        )
+
+    @staticmethod
+    def _list(value, what):
+        if not isinstance(value, list) or not value:
+            raise ProfileError(f"'{what}' must be a non-empty list")
+        return value
+
+    @staticmethod
+    def _positive(value):
+        return (isinstance(value, (int, float)) and not isinstance(value, bool)
+                and math.isfinite(value) and value > 0)
+
+    @classmethod
+    def _field(cls, entry, packed):
+        if not isinstance(entry, dict):
+            raise ProfileError(f"field entries must be objects, not {entry!r}")
+        name = entry.get("name")
+        if not isinstance(name, str) or not name:
+            raise ProfileError("field without a 'name'")
+        unknown = set(entry) - _FIELD_KEYS
+        if unknown:
+            raise ProfileError(f"field {name!r}: unknown keys: {', '.join(sorted(unknown))}")
+
+        if name not in SAMPLE_FIELDS:
+            if not packed:
+                raise ProfileError(f"unknown field {name!r} (padding is only allowed in packed records)")
+            _parse_format(entry.get("format"), f"padding {name!r}")
+            return FieldSpec(name, entry["format"])
+
+        kind, _ = _parse_format(entry.get("format"), f"field {name!r}")
+        if kind == "V" or (name == "t" and kind != "u"):
+            raise ProfileError(f"field {name!r}: format {entry['format']!r} cannot hold it")
+
+        scale = entry.get("scale", 1.0)
+        if not cls._positive(scale):
+            raise ProfileError(f"field {name!r}: scale must be a positive number")
+        if name == "t" and scale != 1.0:
+            raise ProfileError("field 't': the device time cannot be scaled")
+
+        units = _FIELD_UNITS[name]
+        unit = entry.get("unit", next(iter(units)))
+        if unit not in units:
+            raise ProfileError(f"field {name!r}: unit must be one of {', '.join(units)}, not {unit!r}")
+
+        uuid = entry.get("uuid")
+        if packed:
+            if uuid is not None:
+                raise ProfileError(f"field {name!r}: packed records have no per-field uuid")
+        else:
+            uuid = _uuid(uuid, f"field {name!r} uuid")
+        return FieldSpec(name, entry["format"], uuid, float(scale), unit)
+
+    @classmethod
+    def from_legacy(cls, data, name="Custom IMU"):
+        """
+        Validated profile from a dict of the old upper-case keys
+        (SERVICE_UUID, ACCEL_X_UUID, ..., PACKED_UUID, PACKED_LAYOUT).
+        """
+        if isinstance(data, DeviceProfile):
+            return data
+        stream_mode = data.get("STREAM_MODE") or ("packed" if data.get("PACKED_UUID") else "poll")
+        spec = {
+            "name": name,
+            "service_uuid": data.get("SERVICE_UUID"),
+            "stream_mode": stream_mode,
+        }
+        if data.get("POWER_MODE_UUID"):
+            spec["power_mode_uuid"] = data["POWER_MODE_UUID"]
+        if data.get("QUANTIZATION"):
+            spec["quantization"] = dict(data["QUANTIZATION"])
+
+        if stream_mode == "packed":
+            layout = data.get("PACKED_LAYOUT") or {}
+            scales = layout.get("scale", {})
+            spec["packed"] = {"uuid": data.get("PACKED_UUID"),
+                              "samples_per_payload": layout.get("samples_per_payload", 1)}
+            spec["fields"] = [
+                dict({"name": n, "format": f}, **({"scale": scales[n]} if n in scales else {}))
+                for n, f in layout.get("fields", ())
+            ]
+        else:
+            spec["fields"] = [
+                {"name": n, "uuid": data.get(key), "format": "<u4" if n == "t" else "<f4"}
+                for n, key in zip(SAMPLE_FIELDS, FIELD_UUID_KEYS)
+            ]
+        return cls.from_dict(spec, name)
+
+    # ------------------------------------------------------
+    # Views
+    # ------------------------------------------------------
+    @property
+    def packed_layout(self):
+        """
+        core.samples.PackedLayout spec of a packed profile, None otherwise.
+        """
+        if self.packed_uuid is None:
+            return None
+        layout = {
+            "fields": tuple((field.name, field.format) for field in self.fields),
+            "samples_per_payload": self.samples_per_payload,
+        }
+        scale = {f.name: f.factor for f in self.sample_fields if f.factor != 1.0}
+        if scale:
+            layout["scale"] = scale
+        return layout
+
+    @property
+    def field_uuids(self):
+        """
+        Per-field characteristic UUIDs in SAMPLE_FIELDS order (None for packed profiles).
+        """
+        return tuple(field.uuid for field in self.sample_fields)
+
+    def _legacy_view(self):
+        view = {"SERVICE_UUID": self.service_uuid}
+        if self.power_mode_uuid:
+            view["POWER_MODE_UUID"] = self.power_mode_uuid
+        if self.packed_uuid:
+            view["PACKED_UUID"] = self.packed_uuid
+            view["PACKED_LAYOUT"] = self.packed_layout
+        else:
+            view.update(zip(FIELD_UUID_KEYS, self.field_uuids))
+        view["STREAM_MODE"] = self.stream_mode
+        if self.quantization:
+            view["QUANTIZATION"] = self.quantization
+        return view
+
+    def __getitem__(self, key):
+        return self._legacy[key]
+
+    def __iter__(self):
+        return iter(self._legacy)
+
+    def __len__(self):
+        return len(self._legacy)
+
+    def __repr__(self):
+        return f"DeviceProfile({self.name!r}, {self.stream_mode!r})"
+
+
+def as_profile(profile, name="Custom IMU"):
+    """
+    DeviceProfile of a profile or a dict of the old keys (validated).
+    """
+    return profile if isinstance(profile, DeviceProfile) else DeviceProfile.from_legacy(profile, name)
+
+
+# ------------------------------------------------------
+# Registry
+# ------------------------------------------------------
+def load_profile(path):
+    """
+    Read and validate one profile file. Raises ProfileError.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ProfileError(f"{path}: {e}") from None
+    return DeviceProfile.from_dict(data, path)
+
+
+def load_profiles(*directories):
+    """
+    {name: DeviceProfile} of every profile file in the directories, in file
+    name order. Raises ProfileError for the first invalid file or a name used twice.
+    """
+    profiles = {}
+    for directory in directories or (PROFILE_DIRECTORY,):
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(PROFILE_SUFFIX):
+                continue
+            profile = load_profile(os.path.join(directory, filename))
+            if profile.name in profiles:
+                raise ProfileError(
+                    f"{profile.source}: profile name {profile.name!r} already used by {profiles[profile.name].source}"
+                )
+            profiles[profile.name] = profile
+    return profiles
+
+
+AVAILABLE_DEVICES = load_profiles()
+
+# the shipped profiles, for the simulated peripheral and the benchmarks
+IMU_DEVICE = AVAILABLE_DEVICES["Standard IMU"]
+PACKED_IMU_DEVICE = AVAILABLE_DEVICES["Packed IMU"]
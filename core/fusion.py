@@ -0,0 +1,448 @@
+import collections
+import math
+import queue
+import threading
+
+import numpy as np
+
+from core.kinematics import STANDARD_GRAVITY
+from core.samples import as_batch, item_device, item_gap
+from core.timing import DeviceClock
+
+FILTER_MADGWICK = "madgwick"
+FILTER_COMPLEMENTARY = "complementary"
+
+FILTERS = (FILTER_MADGWICK, FILTER_COMPLEMENTARY)
+
+# results kept for consumers that poll the stage
+DEFAULT_HISTORY = 256
+
+# worker queue marker for reset(): (_RESET, device, None, None)
+_RESET = object()
+
+
+# ------------------------------------------------------
+# Quaternion math, vectorized over (N, 4) arrays of [w, x, y, z]
+# ------------------------------------------------------
+def quat_multiply(p, q):
+    pw, px, py, pz = np.moveaxis(np.asarray(p, dtype=np.float64), -1, 0)
+    qw, qx, qy, qz = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    return np.stack((
+        pw * qw - px * qx - py * qy - pz * qz,
+        pw * qx + px * qw + py * qz - pz * qy,
+        pw * qy - px * qz + py * qw + pz * qx,
+        pw * qz + px * qy - py * qx + pz * qw,
+    ), axis=-1)
+
+
+def quat_conjugate(q):
+    q = np.array(q, dtype=np.float64)
+    q[..., 1:] *= -1
+    return q
+
+
+def rotate_vectors(q, v):
+    """
+    Rotate vectors v (N, 3) from the sensor frame to the world frame by the
+    orientations q (N, 4): v' = q v q*.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    w = q[..., :1]
+    u = q[..., 1:]
+    # v + 2w(u x v) + 2u x (u x v)
+    uv = np.cross(u, v)
+    return v + 2.0 * (w * uv + np.cross(u, uv))
+
+
+def quat_to_matrix(q):
+    """
+    (N, 3, 3) rotation matrices of the orientations q (N, 4).
+    """
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)), axis=-1),
+        np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)), axis=-1),
+        np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+
+def quat_to_euler(q):
+    """
+    (N, 3) roll, pitch, yaw in degrees (rotations about x, y, z applied in z-y-x order).
+    """
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    roll = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+    yaw = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return np.degrees(np.stack((roll, pitch, yaw), axis=-1))
+
+
+def euler_to_quat(roll, pitch, yaw):
+    """
+    Quaternions of roll, pitch, yaw angles in radians (arrays of equal shape).
+    """
+    cr, sr = np.cos(np.multiply(roll, 0.5)), np.sin(np.multiply(roll, 0.5))
+    cp, sp = np.cos(np.multiply(pitch, 0.5)), np.sin(np.multiply(pitch, 0.5))
+    cy, sy = np.cos(np.multiply(yaw, 0.5)), np.sin(np.multiply(yaw, 0.5))
+    return np.stack((
+        cr * cp * cy + sr * sp * sy,
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+    ), axis=-1)
+
+
+# ------------------------------------------------------
+# Filters: update(accel (N, 3), gyro (N, 3) rad/s, dt (N,) s) -> (N, 4)
+# ------------------------------------------------------
+def _exponential_recurrence(u, alpha, x0):
+    """
+    x[k] = alpha * x[k-1] + u[k] for every row of u, starting from x0, without a
+    Python loop per sample. Within a block x[k] = alpha^(k+1) * (x0 + sum_j alpha^-(j+1) u[j]);
+    blocks are sized so alpha^-block stays well inside float range.
+    """
+    out = np.empty_like(u)
+    if alpha <= 0.0:
+        out[:] = u
+        return out
+
+    block = max(1, int(12 * math.log(10) / -math.log(alpha))) if alpha < 1.0 else len(u)
+    x = np.asarray(x0, dtype=np.float64)
+    for start in range(0, len(u), block):
+        chunk = u[start:start + block]
+        powers = alpha ** np.arange(1, len(chunk) + 1)[:, None]
+        out[start:start + len(chunk)] = powers * (x + np.cumsum(chunk / powers, axis=0))
+        x = out[start + len(chunk) - 1]
+    return out
+
+
+class ComplementaryFilter:
+    """
+    Roll and pitch blend the integrated angular rate (weight alpha) with the
+    tilt measured from gravity; yaw is the integrated z rate only.
+    Runs over a whole batch with array operations.
+    """
+
+    def __init__(self, alpha=0.98):
+        self.alpha = alpha
+        self.angles = np.zeros(3)  # roll, pitch, yaw (rad)
+        self._initialized = False
+
+    def update(self, accel, gyro, dt):
+        ax, ay, az = accel[:, 0], accel[:, 1], accel[:, 2]
+        tilt = np.stack((np.arctan2(ay, az), np.arctan2(-ax, np.hypot(ay, az))), axis=-1)
+
+        if not self._initialized:
+            # start from the measured tilt instead of converging from level
+            self.angles[:2] = tilt[0]
+            self._initialized = True
+
+        rates = gyro * dt[:, None]
+        tilt_angles = _exponential_recurrence(
+            self.alpha * rates[:, :2] + (1.0 - self.alpha) * tilt, self.alpha, self.angles[:2]
+        )
+        yaw = self.angles[2] + np.cumsum(rates[:, 2])
+
+        self.angles[:2] = tilt_angles[-1]
+        self.angles[2] = yaw[-1]
+        return euler_to_quat(tilt_angles[:, 0], tilt_angles[:, 1], yaw)
+
+
+class MadgwickFilter:
+    """
+    Madgwick's gradient-descent IMU filter (gyroscope + accelerometer).
+    The update is sequential, so the per-sample step runs on plain floats;
+    normalisation and conversions are done for the whole batch up front.
+
+    beta: gradient step weight, larger converges faster but is noisier
+    """
+
+    def __init__(self, beta=0.1):
+        self.beta = beta
+        self.q = np.array([1.0, 0.0, 0.0, 0.0])
+
+    def update(self, accel, gyro, dt):
+        norms = np.linalg.norm(accel, axis=1)
+        has_accel = norms > 0
+        accel = np.divide(accel, norms[:, None], out=np.zeros_like(accel), where=has_accel[:, None])
+
+        beta = self.beta
+        q0, q1, q2, q3 = self.q.tolist()
+        out = np.empty((len(dt), 4))
+
+        rows = zip(accel.tolist(), gyro.tolist(), dt.tolist(), has_accel.tolist())
+        for i, ((ax, ay, az), (gx, gy, gz), step, use_accel) in enumerate(rows):
+            # rate of change of the quaternion from the gyroscope
+            d0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+            d1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+            d2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+            d3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+
+            if use_accel:
+                # gradient of the gravity direction error
+                q0q0, q1q1, q2q2, q3q3 = q0 * q0, q1 * q1, q2 * q2, q3 * q3
+                s0 = 4 * q0 * q2q2 + 2 * q2 * ax + 4 * q0 * q1q1 - 2 * q1 * ay
+                s1 = (4 * q1 * q3q3 - 2 * q3 * ax + 4 * q0q0 * q1 - 2 * q0 * ay - 4 * q1
+                      + 8 * q1 * q1q1 + 8 * q1 * q2q2 + 4 * q1 * az)
+                s2 = (4 * q0q0 * q2 + 2 * q0 * ax + 4 * q2 * q3q3 - 2 * q3 * ay - 4 * q2
+                      + 8 * q2 * q1q1 + 8 * q2 * q2q2 + 4 * q2 * az)
+                s3 = 4 * q1q1 * q3 - 2 * q1 * ax + 4 * q2q2 * q3 - 2 * q2 * ay
+                norm = math.sqrt(s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3)
+                if norm > 0:
+                    norm = beta / norm
+                    d0 -= norm * s0
+                    d1 -= norm * s1
+                    d2 -= norm * s2
+                    d3 -= norm * s3
+
+            q0 += d0 * step
+            q1 += d1 * step
+            q2 += d2 * step
+            q3 += d3 * step
+            norm = 1.0 / math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+            q0 *= norm
+            q1 *= norm
+            q2 *= norm
+            q3 *= norm
+            out[i] = (q0, q1, q2, q3)
+
+        self.q[:] = (q0, q1, q2, q3)
+        return out
+
+
+def make_filter(name, **options):
+    if name == FILTER_MADGWICK:
+        return MadgwickFilter(**options)
+    if name == FILTER_COMPLEMENTARY:
+        return ComplementaryFilter(**options)
+    raise ValueError(f"Unknown fusion filter: {name}")
+
+
+# ------------------------------------------------------
+# Fusion stage
+# ------------------------------------------------------
+class FusionResult:
+    """
+    Orientation of one batch of samples from one device.
+    quaternion (N, 4), euler (N, 3) roll/pitch/yaw in degrees,
+    world_accel (N, 3) in m/s^2 with gravity removed, t (N,) unwrapped device
+    time in seconds, gaps (N,) True for samples that follow lost samples.
+    """
+
+    __slots__ = ("device", "t", "quaternion", "euler", "world_accel", "gaps")
+
+    def __init__(self, device, t, quaternion, euler, world_accel, gaps=None):
+        self.device = device
+        self.t = t
+        self.quaternion = quaternion
+        self.euler = euler
+        self.world_accel = world_accel
+        self.gaps = gaps
+
+    def __len__(self):
+        return len(self.t)
+
+
+class FusionStage:
+    """
+    Runs an orientation filter per device on a background thread, so the
+    Qt event loop only hands batches over and reads the latest result.
+
+    filter_name: "madgwick" or "complementary"
+    accel_scale: multiplies raw accelerations into m/s^2 (samples are in g)
+    gyro_scale: multiplies raw angular rates into rad/s (samples are in deg/s)
+    time_scale: seconds per device time stamp tick (stamps are in ms); the
+        32-bit counter is unwrapped and gaps are stepped over at the nominal rate
+    on_result: optional callable(FusionResult), called on the worker thread
+
+    Results are kept in `results` (newest last, bounded) and the newest one of
+    each device in `latest`.
+    """
+
+    def __init__(
+        self,
+        filter_name=FILTER_MADGWICK,
+        filter_options=None,
+        accel_scale=STANDARD_GRAVITY,
+        gyro_scale=math.pi / 180.0,
+        time_scale=1e-3,
+        history=DEFAULT_HISTORY,
+        on_result=None,
+    ):
+        if filter_name not in FILTERS:
+            raise ValueError(f"Unknown fusion filter: {filter_name}")
+
+        self.filter_name = filter_name
+        self.filter_options = dict(filter_options or {})
+        self.accel_scale = accel_scale
+        self.gyro_scale = gyro_scale
+        self.time_scale = time_scale
+        self.on_result = on_result
+
+        self.results = collections.deque(maxlen=history)
+        self.latest = {}
+        self.samples_fused = 0
+        self.is_running = False
+
+        self._queue = None
+        self._thread = None
+
+        # worker thread state: device -> (filter, DeviceClock)
+        self._devices = {}
+
+    # ------------------------------------------------------
+    # Control (any thread)
+    # ------------------------------------------------------
+    def start(self):
+        if self.is_running:
+            return
+        self._devices = {}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker_loop, name="imu-fusion", daemon=True)
+        self.is_running = True
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        Hand a queue item (sample tuple, batch or SampleBatch) to the worker. Never blocks.
+        """
+        if self.is_running:
+            self._queue.put((
+                item_device(item), as_batch(item), getattr(item, "host_t", None), item_gap(item)
+            ))
+
+    def stop(self):
+        """
+        Fuse everything submitted so far and stop the worker.
+        """
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def timing_stats(self):
+        """
+        DeviceClock.stats() of every device: gaps, missing samples, clock drift.
+        """
+        return {device: clock.stats() for device, (_, clock) in list(self._devices.items())}
+
+    def clock(self, device):
+        """
+        DeviceClock of a device (its sample timing model), None before its first sample.
+        """
+        state = self._devices.get(device)
+        return state[1] if state else None
+
+    def reset(self, device=None):
+        """
+        Forget the filter state of one device (or all), e.g. after a reconnect.
+        """
+        if self.is_running:
+            self._queue.put((_RESET, device, None, None))
+
+    # ------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # process everything waiting, grouped per device, as few large batches
+            items = [item]
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._fuse_items(items)
+                    return
+                items.append(item)
+            self._fuse_items(items)
+
+    def _fuse_items(self, items):
+        # device -> ([batches], host time of the newest, gap before the first)
+        grouped = {}
+        for device, batch, host_t, gap in items:
+            if device is _RESET:
+                self._fuse_grouped(grouped)
+                grouped = {}
+                if batch is None:
+                    self._devices.clear()
+                else:
+                    self._devices.pop(batch, None)
+                continue
+            if gap is not None and device in grouped:
+                # samples after a reconnect start a new group
+                self._fuse_grouped({device: grouped.pop(device)})
+            batches, _, first_gap = grouped.get(device, ([], None, gap))
+            batches.append(batch)
+            grouped[device] = (batches, host_t, first_gap)
+        self._fuse_grouped(grouped)
+
+    def _fuse_grouped(self, grouped):
+        for device, (batches, host_t, gap) in grouped.items():
+            batch = np.concatenate(batches) if len(batches) > 1 else batches[0]
+            result = self.fuse(device, batch, host_t, gap)
+            if result is None:
+                continue
+            self.results.append(result)
+            self.latest[device] = result
+            self.samples_fused += len(result)
+            if self.on_result:
+                self.on_result(result)
+
+    def fuse(self, device, batch, host_t=None, gap=None):
+        """
+        Run the device's filter over one SAMPLE_DTYPE batch (any thread, but not
+        concurrently with the worker). The first sample of a device only sets
+        its time base. Returns a FusionResult, or None when nothing was fused.
+        host_t: host receive time of the batch, feeds the device clock model
+        gap: outage (s) before the batch (SampleBatch.gap); the device clock
+            starts over and the filter steps over the hole, keeping its orientation
+        """
+        state = self._devices.get(device)
+        if state is None:
+            state = self._devices[device] = (
+                make_filter(self.filter_name, **self.filter_options),
+                DeviceClock(tick=self.time_scale),
+            )
+        fusion_filter, clock = state
+
+        period = clock.period
+        if gap is not None and clock.last_time is not None:
+            # the device counter may have jumped or restarted while the link was down
+            clock.reset()
+            seconds, gaps, _ = clock.update(batch["t"], host_t)
+            previous = seconds[0] - (period or 0.0)
+            gaps[0] = True
+        else:
+            previous = clock.last_time
+            seconds, gaps, _ = clock.update(batch["t"], host_t)
+        if previous is None:
+            # the first sample of a device only sets the time base
+            previous = seconds[0]
+            batch, seconds, gaps = batch[1:], seconds[1:], gaps[1:]
+            if not len(batch):
+                return None
+
+        dt = np.diff(seconds, prepend=previous)
+        if gaps.any() and clock.period:
+            # the motion during a gap is unknown, step over it at the nominal rate
+            dt[gaps] = clock.period
+
+        accel = np.stack((batch["ax"], batch["ay"], batch["az"]), axis=-1).astype(np.float64)
+        accel *= self.accel_scale
+        gyro = np.stack((batch["gx"], batch["gy"], batch["gz"]), axis=-1).astype(np.float64)
+        gyro *= self.gyro_scale
+
+        quaternion = fusion_filter.update(accel, gyro, dt)
+        world_accel = rotate_vectors(quaternion, accel)
+        world_accel[:, 2] -= STANDARD_GRAVITY
+
+        return FusionResult(device, seconds, quaternion, quat_to_euler(quaternion), world_accel, gaps)
@@ -0,0 +1,276 @@
+import numpy as np
+
+METHOD_TRAPEZOID = "trapezoid"
+METHOD_SIMPSON = "simpson"
+
+METHODS = (METHOD_TRAPEZOID, METHOD_SIMPSON)
+
+STANDARD_GRAVITY = 9.80665  # m/s^2
+
+
+def _as_vectors(values):
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    return values
+
+
+def _as_times(t, count, time_scale):
+    t = np.asarray(t, dtype=np.float64)
+    if t.ndim != 1 or len(t) != count:
+        raise ValueError("t must be a 1-D array with one entry per sample")
+    return t * time_scale if time_scale != 1.0 else t
+
+
+# ------------------------------------------------------
+# Cumulative integration
+# ------------------------------------------------------
+def cumulative_trapezoid(y, t, initial=0.0):
+    """
+    Running integral of y over t with the trapezoid rule.
+    y: (N, k) or (N,) samples
+    t: (N,) sample times, spacing may vary
+    initial: value of the integral at t[0], scalar or (k,)
+    Returns an array shaped like y (as (N, k)).
+    """
+    y = _as_vectors(y)
+    out = np.empty_like(y)
+    out[0] = initial
+    if len(y) > 1:
+        dt = np.diff(t)[:, None]
+        # (y[i] + y[i+1]) * dt / 2, accumulated in place
+        np.add(y[:-1], y[1:], out=out[1:])
+        out[1:] *= dt * 0.5
+        np.cumsum(out, axis=0, out=out)
+    return out
+
+
+def _simpson_intervals(y, t):
+    """
+    Integral of y over every interval [t[i], t[i+1]] using the parabola through
+    three neighbouring samples: (i, i+1, i+2), or (i-1, i, i+1) for the last one.
+    Intervals of zero length, or whose neighbour has zero length, fall back to the
+    trapezoid rule.
+    """
+    h = np.diff(t)
+    out = (y[:-1] + y[1:]) * (h * 0.5)[:, None]
+    if len(y) < 3:
+        return out
+
+    h0 = h[:-1]
+    h1 = h[1:]
+    span = h0 + h1
+    valid = (h0 > 0) & (h1 > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # forward parabola, interval [t[i], t[i+1]] for i = 0 .. N-3
+        w0 = h0 / 6 * (3 - h0 / span)
+        w1 = h0 / 6 * (3 * span - 2 * h0) / h1
+        w2 = -h0 ** 3 / (6 * span * h1)
+
+        # backward parabola for the last interval [t[-2], t[-1]]
+        a, b = h[-2], h[-1]
+        last = (
+            -b ** 3 / (6 * (a + b) * a) * y[-3]
+            + b / 6 * (3 * (a + b) - 2 * b) / a * y[-2]
+            + b / 6 * (3 - b / (a + b)) * y[-1]
+        )
+
+        # intervals with invalid weights keep the trapezoid already in out
+        forward = np.multiply(y[:-2], w0[:, None])
+        term = np.multiply(y[1:-1], w1[:, None])
+        forward += term
+        np.multiply(y[2:], w2[:, None], out=term)
+        forward += term
+        del term
+
+    if valid.all():
+        out[:-1] = forward
+    else:
+        out[:-1][valid] = forward[valid]
+    if h[-2] > 0 and h[-1] > 0:
+        out[-1] = last
+    return out
+
+
+def cumulative_simpson(y, t, initial=0.0):
+    """
+    Running integral of y over t with Simpson's rule for unequal spacing
+    (a parabola through three neighbouring samples per interval).
+    Same arguments and result as cumulative_trapezoid.
+    """
+    y = _as_vectors(y)
+    out = np.empty_like(y)
+    out[0] = initial
+    if len(y) > 1:
+        out[1:] = _simpson_intervals(y, np.asarray(t, dtype=np.float64))
+        np.cumsum(out, axis=0, out=out)
+    return out
+
+
+def cumulative_integral(y, t, initial=0.0, method=METHOD_TRAPEZOID):
+    if method == METHOD_TRAPEZOID:
+        return cumulative_trapezoid(y, t, initial)
+    if method == METHOD_SIMPSON:
+        return cumulative_simpson(y, t, initial)
+    raise ValueError(f"Unknown integration method: {method}")
+
+
+# ------------------------------------------------------
+# Drift control
+# ------------------------------------------------------
+def estimate_bias(accel, stationary=None):
+    """
+    Mean acceleration over samples where the sensor is at rest, to subtract
+    before integrating (includes gravity for a sensor held in one orientation).
+    stationary: boolean mask or slice selecting the rest samples (default: all)
+    """
+    accel = _as_vectors(accel)
+    rest = accel if stationary is None else accel[stationary]
+    if not len(rest):
+        raise ValueError("No stationary samples to estimate the bias from")
+    return rest.mean(axis=0)
+
+
+def detect_stationary(accel, gyro=None, gravity=STANDARD_GRAVITY,
+                      accel_tolerance=0.3, gyro_tolerance=0.2, window=1):
+    """
+    Boolean mask of samples where the sensor is at rest: the acceleration
+    magnitude is within accel_tolerance of gravity and, if given, the angular
+    rate magnitude is below gyro_tolerance.
+    window: a sample is only at rest if the whole window ending at it is
+    """
+    accel = _as_vectors(accel)
+    still = np.abs(np.linalg.norm(accel, axis=1) - gravity) <= accel_tolerance
+    if gyro is not None:
+        still &= np.linalg.norm(_as_vectors(gyro), axis=1) <= gyro_tolerance
+
+    if window > 1 and len(still) >= window:
+        # count of moving samples in each trailing window
+        moving = np.concatenate(([0], np.cumsum(~still)))
+        counts = moving[window:] - moving[:-window]
+        windowed = np.zeros_like(still)
+        windowed[window - 1:] = counts == 0
+        still = windowed
+    return still
+
+
+def _zero_velocity_updates(velocity, stationary):
+    """
+    Reset velocity to zero at every stationary sample (in place). After a reset
+    the velocity restarts from zero, so subtract the running integral reached
+    at the last reset.
+    """
+    index = np.arange(len(velocity))
+    last_reset = np.maximum.accumulate(np.where(stationary, index, -1))
+    reset = last_reset >= 0
+    velocity[reset] -= velocity[last_reset[reset]]
+    return velocity
+
+
+# ------------------------------------------------------
+# Batch integration
+# ------------------------------------------------------
+def integrate(accel, t, initial_velocity=0.0, initial_position=0.0,
+              method=METHOD_TRAPEZOID, bias=None, stationary=None, time_scale=1.0):
+    """
+    Integrate acceleration into velocity and position in one call.
+
+    accel: (N, 3) acceleration (m/s^2)
+    t: (N,) sample times; time_scale converts them to seconds (e.g. 1e-3 for ms)
+    initial_velocity, initial_position: state at t[0], scalar or (3,)
+    method: "trapezoid" or "simpson"
+    bias: (3,) subtracted from every sample before integrating (see estimate_bias)
+    stationary: (N,) boolean mask, velocity is reset to zero at these samples (ZUPT)
+
+    Returns (velocity, position), both (N, 3).
+    """
+    accel = _as_vectors(accel)
+    t = _as_times(t, len(accel), time_scale)
+    if bias is not None:
+        accel = accel - np.asarray(bias, dtype=np.float64)
+
+    velocity = cumulative_integral(accel, t, initial_velocity, method)
+    if stationary is not None:
+        velocity = _zero_velocity_updates(velocity, np.asarray(stationary, dtype=bool))
+    position = cumulative_integral(velocity, t, initial_position, method)
+    return velocity, position
+
+
+class KinematicsIntegrator:
+    """
+    Streaming integrate(): feed consecutive chunks of a capture and get the
+    same velocity and position as integrating it in one go. The last sample of
+    each chunk is carried over so the interval between chunks is integrated too.
+
+    With "simpson" the last interval of each chunk uses the backward parabola
+    (its forward neighbour has not arrived yet), so results can differ from the
+    batch call in the last digits around chunk boundaries.
+    """
+
+    def __init__(self, method=METHOD_TRAPEZOID, bias=None, time_scale=1.0,
+                 initial_velocity=0.0, initial_position=0.0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown integration method: {method}")
+        self.method = method
+        self.bias = None if bias is None else np.asarray(bias, dtype=np.float64)
+        self.time_scale = time_scale
+
+        self.velocity = np.broadcast_to(np.asarray(initial_velocity, dtype=np.float64), (3,)).copy()
+        self.position = np.broadcast_to(np.asarray(initial_position, dtype=np.float64), (3,)).copy()
+        self.samples = 0
+
+        # last sample of the previous chunk: time (s), bias-corrected acceleration
+        self._last_t = None
+        self._last_accel = None
+
+    def reset(self, velocity=0.0, position=None):
+        """
+        Restart from a known state, e.g. after a gap in the stream.
+        The position is kept unless given.
+        """
+        self.velocity[:] = velocity
+        if position is not None:
+            self.position[:] = position
+        self._last_t = None
+        self._last_accel = None
+
+    def update(self, accel, t, stationary=None):
+        """
+        Integrate the next chunk.
+        accel: (n, 3), t: (n,) in the integrator's time unit
+        stationary: optional (n,) ZUPT mask for the chunk
+        Returns (velocity, position) for the chunk's samples, both (n, 3).
+        """
+        accel = _as_vectors(accel)
+        t = _as_times(t, len(accel), self.time_scale)
+        if not len(accel):
+            return np.empty((0, 3)), np.empty((0, 3))
+        if self.bias is not None:
+            accel = accel - self.bias
+
+        carried = self._last_t is not None
+        if carried:
+            accel_all = np.concatenate((self._last_accel[None, :], accel))
+            t_all = np.concatenate(([self._last_t], t))
+        else:
+            accel_all, t_all = accel, t
+
+        velocity = cumulative_integral(accel_all, t_all, self.velocity, self.method)
+        if stationary is not None:
+            mask = np.asarray(stationary, dtype=bool)
+            if carried:
+                mask = np.concatenate(([False], mask))
+            velocity = _zero_velocity_updates(velocity, mask)
+        position = cumulative_integral(velocity, t_all, self.position, self.method)
+
+        if carried:
+            velocity = velocity[1:]
+            position = position[1:]
+
+        self.velocity[:] = velocity[-1]
+        self.position[:] = position[-1]
+        self._last_t = t[-1]
+        self._last_accel = accel[-1].copy()
+        self.samples += len(accel)
+        return velocity, position
@@ -1,5 +1,7 @@
 # NOTE
-# instead of list, use custom struct/class
+# single-sample helpers kept for existing callers,
+# use core.kinematics (integrate / KinematicsIntegrator) for whole arrays;
+# plain arithmetic here, numpy costs more than it saves on one sample
 
 '''
 Given:
@@ -54,4 +56,4 @@ def get_current_position(current_accel, prev_vel, prev_position, delta_time):
     current_pos_y = prev_position[1] + displacement[1]
     current_pos_z = prev_position[2] + displacement[2]
 
-    return [current_pos_x, current_pos_y, current_pos_z]
\ No newline at end of file
+    return [current_pos_x, current_pos_y, current_pos_z]
@@ -0,0 +1,359 @@
+"""
+Pipeline instrumentation: counters, gauges and latency histograms, shown in
+the GUI's stats panel and exportable as JSON or Prometheus text.
+
+Instruments are created once (at setup) and updated on the hot path. Each one
+is meant to be updated from a single thread; readers on other threads see
+slightly stale but consistent-enough values. When the registry is disabled an
+update is a single attribute check, and hot paths that need extra clock reads
+check registry.enabled first.
+"""
+import asyncio
+import bisect
+import json
+import os
+import time
+
+# seconds, from sub-millisecond GATT round trips to multi-second stalls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.0075, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+# counts, e.g. samples per frame
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+# counter rates are measured over windows of this length (s)
+RATE_WINDOW = 1.0
+
+FORMAT_JSON = "json"
+FORMAT_PROMETHEUS = "prometheus"
+FORMATS = (FORMAT_JSON, FORMAT_PROMETHEUS)
+
+
+# ------------------------------------------------------
+# Instruments
+# ------------------------------------------------------
+class Counter:
+    """
+    Monotonic total, with the rate over the last complete RATE_WINDOW.
+    """
+
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labels):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+        self._window_start = time.monotonic()
+        self._window_value = 0
+        self._rate = 0.0
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        self.value += amount
+        now = time.monotonic()
+        if now - self._window_start >= RATE_WINDOW:
+            self._roll(now)
+
+    def _roll(self, now):
+        self._rate = (self.value - self._window_value) / (now - self._window_start)
+        self._window_start = now
+        self._window_value = self.value
+
+    def rate(self):
+        now = time.monotonic()
+        if now - self._window_start >= 2 * RATE_WINDOW:
+            # nothing counted for a while
+            self._roll(now)
+        return self._rate
+
+    def sample(self):
+        return {"value": self.value, "rate": self.rate()}
+
+
+class Gauge:
+    """
+    Current value, either set() or read from fn() when collected.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, registry, name, help, labels, fn=None):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value):
+        if self.registry.enabled:
+            self.value = value
+
+    def sample(self):
+        return {"value": self.fn() if self.fn is not None else self.value}
+
+
+class Histogram:
+    """
+    Distribution over fixed buckets (upper bounds), Prometheus style.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        if not self.registry.enabled:
+            return
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate of the q-quantile, interpolated inside its bucket (None when empty).
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                low = self.bounds[index - 1] if index else 0.0
+                if index == len(self.bounds):
+                    return low
+                return low + (self.bounds[index] - low) * (target - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def sample(self):
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            cumulative.append([bound, total])
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+
+# ------------------------------------------------------
+# Registry
+# ------------------------------------------------------
+class MetricsRegistry:
+    """
+    Named instruments, one per (name, labels). Asking twice for the same one
+    returns the existing instrument.
+
+    enabled: False turns every update into a no-op (can be flipped at runtime)
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._instruments = {}
+        self._collectors = []
+
+    def counter(self, name, help="", **labels):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help="", fn=None, **labels):
+        gauge = self._get(Gauge, name, help, labels)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels):
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def _get(self, kind, name, help, labels, *args):
+        key = (name, tuple(sorted(labels.items())))
+        instrument = self._instruments.get(key)
+        if instrument is None:
+            instrument = self._instruments[key] = kind(self, name, help, labels, *args)
+        return instrument
+
+    def remove(self, name, **labels):
+        self._instruments.pop((name, tuple(sorted(labels.items()))), None)
+
+    def add_collector(self, collect):
+        """
+        collect: callable returning extra snapshot series (e.g. the latest
+        snapshot reported by another process), included in snapshot()
+        """
+        self._collectors.append(collect)
+
+    def snapshot(self):
+        """
+        Every series as a JSON-ready dict: name, type, help, labels and the values.
+        """
+        if not self.enabled:
+            return []
+        series = []
+        for instrument in list(self._instruments.values()):
+            entry = {
+                "name": instrument.name,
+                "type": instrument.kind,
+                "help": instrument.help,
+                "labels": dict(instrument.labels),
+            }
+            try:
+                entry.update(instrument.sample())
+            except Exception:
+                # a gauge whose source went away
+                continue
+            series.append(entry)
+        for collect in self._collectors:
+            series.extend(collect() or [])
+        return series
+
+
+# default registry used by the pipeline's instrumentation hooks
+METRICS = MetricsRegistry()
+
+
+# ------------------------------------------------------
+# Formats
+# ------------------------------------------------------
+def to_json(series):
+    return json.dumps({"timestamp": time.time(), "metrics": series}, indent=1)
+
+
+def _prometheus_labels(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in items
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def to_prometheus(series):
+    """
+    Prometheus text exposition format.
+    """
+    lines = []
+    described = set()
+    for entry in sorted(series, key=lambda e: e["name"]):
+        name = entry["name"]
+        if name not in described:
+            described.add(name)
+            if entry.get("help"):
+                lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+
+        labels = entry.get("labels", {})
+        if entry["type"] == "histogram":
+            for bound, count in entry["buckets"]:
+                lines.append(f"{name}_bucket{_prometheus_labels(labels, {'le': bound})} {count}")
+            lines.append(f"{name}_bucket{_prometheus_labels(labels, {'le': '+Inf'})} {entry['count']}")
+            lines.append(f"{name}_sum{_prometheus_labels(labels)} {entry['sum']}")
+            lines.append(f"{name}_count{_prometheus_labels(labels)} {entry['count']}")
+        else:
+            lines.append(f"{name}{_prometheus_labels(labels)} {entry['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def format_metrics(series, fmt=FORMAT_JSON):
+    if fmt == FORMAT_PROMETHEUS:
+        return to_prometheus(series)
+    if fmt == FORMAT_JSON:
+        return to_json(series)
+    raise ValueError(f"Unknown metrics format {fmt!r}, expected one of {FORMATS}")
+
+
+# ------------------------------------------------------
+# Export
+# ------------------------------------------------------
+class MetricsExporter:
+    """
+    Publishes registry snapshots to a local file (rewritten every interval
+    seconds) and/or a TCP port on localhost, where every connection gets the
+    current snapshot as an HTTP response (so Prometheus can scrape it, and
+    `curl localhost:<port>` shows it).
+
+    fmt: "json" or "prometheus"
+    """
+
+    def __init__(self, registry=METRICS, path=None, port=None, fmt=FORMAT_JSON, interval=1.0, host="127.0.0.1"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown metrics format {fmt!r}, expected one of {FORMATS}")
+        self.registry = registry
+        self.path = path
+        self.port = port
+        self.host = host
+        self.fmt = fmt
+        self.interval = interval
+        self._server = None
+        self._task = None
+
+    def render(self):
+        return format_metrics(self.registry.snapshot(), self.fmt)
+
+    def write(self):
+        """
+        Replace the file atomically, so readers never see half a snapshot.
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(self.render())
+        os.replace(temporary, self.path)
+
+    async def start(self):
+        if self.port is not None:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        if self.path is not None:
+            self._task = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _write_loop(self):
+        while True:
+            try:
+                self.write()
+            except OSError:
+                pass
+            await asyncio.sleep(self.interval)
+
+    async def _serve(self, reader, writer):
+        try:
+            # the request itself does not matter, every path gets the snapshot
+            await asyncio.wait_for(reader.readline(), 1.0)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        body = self.render().encode("utf-8")
+        content_type = "application/json" if self.fmt == FORMAT_JSON else "text/plain; version=0.0.4"
+        writer.write(
+            f"HTTP/1.0 200 OK\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
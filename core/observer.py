@@ -0,0 +1,26 @@
+class Observable:
+    """
+    Minimal stand-in for a Qt Signal without Qt: callbacks registered with
+    connect() are called synchronously, in order, by emit().
+    A callback that raises does not stop the others.
+    """
+
+    def __init__(self):
+        self._callbacks = []
+
+    def connect(self, callback):
+        self._callbacks.append(callback)
+        return callback
+
+    def disconnect(self, callback):
+        try:
+            self._callbacks.remove(callback)
+        except ValueError:
+            pass
+
+    def emit(self, *args):
+        for callback in list(self._callbacks):
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Observer callback error: {e}")
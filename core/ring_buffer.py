@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-memory, columnar sample store.
+
+    Every column is a float64 array of 2 * capacity slots and each value is written
+    twice (at i and i + capacity), so the most recent `capacity` samples are always
+    available as one contiguous slice. Reads therefore return zero-copy views.
+
+    columns: column names, e.g. ("t", "ax", "ay", "az")
+    capacity: maximum number of samples kept
+    window: optional time span kept visible by view() (same units as time_column)
+    """
+
+    def __init__(self, columns, capacity, window=None, time_column=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self.columns = tuple(columns)
+        self.capacity = int(capacity)
+        self.window = window
+        self.time_column = time_column or self.columns[0]
+
+        self._data = {name: np.zeros(2 * self.capacity) for name in self.columns}
+        self._head = 0      # next write position in [0, capacity)
+        self._size = 0      # number of valid samples
+        self.total = 0      # samples ever appended
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def append(self, **values):
+        """
+        Append one sample, given as column=value keyword arguments.
+        """
+        head = self._head
+        mirror = head + self.capacity
+        for name, column in self._data.items():
+            value = values[name]
+            column[head] = value
+            column[mirror] = value
+
+        self._head = (head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, **columns):
+        """
+        Append a batch, given as column=array keyword arguments of equal length.
+        Only the last `capacity` samples of an oversized batch are kept.
+        """
+        count = len(columns[self.time_column])
+        if count == 0:
+            return
+
+        skip = max(0, count - self.capacity)
+        n = count - skip
+        head = self._head
+
+        # split into the part that fits before wrapping and the part after
+        first = min(n, self.capacity - head)
+        second = n - first
+
+        for name, column in self._data.items():
+            values = np.asarray(columns[name])[skip:]
+            column[head:head + first] = values[:first]
+            column[head + self.capacity:head + self.capacity + first] = values[:first]
+            if second:
+                column[:second] = values[first:]
+                column[self.capacity:self.capacity + second] = values[first:]
+
+        self._head = (head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+        self.total += count
+
+    def _bounds(self):
+        end = self._head + self.capacity
+        return end - self._size, end
+
+    def column(self, name):
+        """
+        Zero-copy view of every stored sample of one column, oldest first.
+        """
+        start, end = self._bounds()
+        return self._data[name][start:end]
+
+    def view(self, window=None):
+        """
+        Zero-copy views {column: array} of the visible window, oldest first.
+        window overrides the buffer's time window; None keeps every stored sample.
+        """
+        start, end = self._bounds()
+        window = self.window if window is None else window
+
+        if window is not None and self._size:
+            times = self._data[self.time_column][start:end]
+            start += int(np.searchsorted(times, times[-1] - window, side="left"))
+
+        return {name: column[start:end] for name, column in self._data.items()}
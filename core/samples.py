@@ -0,0 +1,297 @@
+import collections
+import sys
+
+import numpy as np
+
+# order of the fields in every sample tuple put on the data queue
+SAMPLE_FIELDS = ("ax", "ay", "az", "gx", "gy", "gz", "t")
+
+# structured dtype used for batches of samples (same field order as the tuples)
+SAMPLE_DTYPE = np.dtype([
+    ("ax", "<f4"),
+    ("ay", "<f4"),
+    ("az", "<f4"),
+    ("gx", "<f4"),
+    ("gy", "<f4"),
+    ("gz", "<f4"),
+    ("t", "<u8"),
+])
+
+
+# byte offset of every field within a SAMPLE_DTYPE record, in SAMPLE_FIELDS order
+FIELD_OFFSETS = tuple(SAMPLE_DTYPE.fields[name][1] for name in SAMPLE_FIELDS)
+
+# samples per pooled block, and filled blocks a SamplePool keeps for reuse
+DEFAULT_BLOCK_SAMPLES = 1024
+DEFAULT_POOL_BLOCKS = 32
+
+_RECORD_SIZE = SAMPLE_DTYPE.itemsize
+
+# references to a retired block when nobody else holds it: the pool's and getrefcount()'s argument
+_UNREFERENCED = 2
+
+
+class SampleBatch:
+    """
+    Queue item tagged with the device it came from.
+    samples is a single (ax, ay, az, gx, gy, gz, t) tuple, a SAMPLE_DTYPE batch
+    or a SampleSpan of a pooled block.
+    seq is the per-device sequence number of the first sample (the others follow
+    on), host_t the time.perf_counter() at which the host received it.
+    gap marks the first batch after the link to the device was lost and restored:
+    the length (s) of the outage before it, None otherwise. Device time stamps
+    may have jumped or restarted across it.
+    """
+
+    __slots__ = ("device", "samples", "seq", "host_t", "gap")
+
+    def __init__(self, device, samples, seq=None, host_t=None, gap=None):
+        self.device = device
+        self.samples = samples
+        self.seq = seq
+        self.host_t = host_t
+        self.gap = gap
+
+    def __len__(self):
+        return len(self.samples) if isinstance(self.samples, (np.ndarray, SampleSpan)) else 1
+
+
+class SampleSpan:
+    """
+    Handle of `count` consecutive samples from `start` in a pooled
+    SAMPLE_DTYPE block (see BlockWriter). as_batch() turns it into a
+    zero-copy view; the block is not reused while either is alive.
+    """
+
+    __slots__ = ("block", "start", "count")
+
+    def __init__(self, block, start, count):
+        self.block = block
+        self.start = start
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def array(self):
+        return self.block[self.start:self.start + self.count]
+
+
+def item_device(item):
+    """
+    Device address a queue item came from (None for untagged items).
+    """
+    return item.device if isinstance(item, SampleBatch) else None
+
+
+def item_gap(item):
+    """
+    Outage (s) before a queue item, None when it does not follow a reconnect.
+    """
+    return item.gap if isinstance(item, SampleBatch) else None
+
+
+def as_batch(item):
+    """
+    Return a queue item as a structured array of SAMPLE_DTYPE.
+    item is a single (ax, ay, az, gx, gy, gz, t) tuple, a batch, a SampleSpan
+    (returned as a view of its block), or a SampleBatch of any of them.
+    """
+    if isinstance(item, SampleBatch):
+        item = item.samples
+    if isinstance(item, np.ndarray):
+        return item
+    if isinstance(item, SampleSpan):
+        return item.array()
+    return np.array([tuple(item)], dtype=SAMPLE_DTYPE)
+
+
+class PackedLayout:
+    """
+    Decoder for a characteristic carrying several samples per payload.
+
+    spec is the packed_layout of a device profile (core.device_profiles):
+        {
+            "fields": (("t", "<u4"), ("ax", "<f4"), ...),  # one record, in payload order
+            "samples_per_payload": 8,
+            "scale": {"gx": 0.0625, ...},  # optional, into g and deg/s
+        }
+    Every name in SAMPLE_FIELDS must appear in "fields"; other names are padding.
+    """
+
+    def __init__(self, spec):
+        fields = [(name, fmt) for name, fmt in spec["fields"]]
+        names = [name for name, _ in fields]
+
+        missing = [name for name in SAMPLE_FIELDS if name not in names]
+        if missing:
+            raise ValueError(f"Packed layout is missing fields: {', '.join(missing)}")
+
+        self.record_dtype = np.dtype(fields)
+        self.record_size = self.record_dtype.itemsize
+        self.samples_per_payload = int(spec.get("samples_per_payload", 1))
+        self.scale = {name: float(factor) for name, factor in spec.get("scale", {}).items() if factor != 1.0}
+
+        # payload records can be reinterpreted in place when they already match SAMPLE_DTYPE
+        self._zero_copy = self.record_dtype == SAMPLE_DTYPE and not self.scale
+
+    def count(self, payload):
+        """
+        Whole records in a payload.
+        """
+        return len(payload) // self.record_size
+
+    def decode(self, payload):
+        """
+        Decode one payload into a SAMPLE_DTYPE batch in a single pass.
+        Trailing bytes that do not form a whole record are ignored.
+        """
+        count = self.count(payload)
+        records = np.frombuffer(payload, dtype=self.record_dtype, count=count)
+
+        if self._zero_copy:
+            return records
+
+        batch = np.empty(count, dtype=SAMPLE_DTYPE)
+        for name in SAMPLE_FIELDS:
+            batch[name] = records[name]
+        for name, factor in self.scale.items():
+            batch[name] *= factor
+        return batch
+
+    def decode_into(self, payload, out):
+        """
+        Decode one payload into the first records of out, a SAMPLE_DTYPE array
+        with room for them. Returns the number of samples written.
+        """
+        count = self.count(payload)
+        records = np.frombuffer(payload, dtype=self.record_dtype, count=count)
+
+        if self._zero_copy:
+            out[:count] = records
+        else:
+            for name in SAMPLE_FIELDS:
+                out[name][:count] = records[name]
+            for name, factor in self.scale.items():
+                out[name][:count] *= factor
+        return count
+
+
+# ------------------------------------------------------
+# Pooled ingest
+# ------------------------------------------------------
+class SamplePool:
+    """
+    Preallocated SAMPLE_DTYPE blocks, recycled instead of allocating arrays
+    for every payload.
+
+    A filled block is retired to the pool and handed out again once nothing
+    refers to it: no queue item, SampleSpan or array view of it is alive.
+    Consumers just drop them, there is no release call to forget or to make
+    twice. While the oldest retired block is still in use a new one is
+    allocated; past `blocks` retired blocks the oldest are left to the
+    garbage collector.
+    """
+
+    def __init__(self, block_samples=DEFAULT_BLOCK_SAMPLES, blocks=DEFAULT_POOL_BLOCKS):
+        self.block_samples = block_samples
+        self.blocks = blocks
+        self.allocated = 0
+        self.reused = 0
+        self._retired = collections.deque()
+
+    def take(self):
+        if self._retired and sys.getrefcount(self._retired[0]) <= _UNREFERENCED:
+            self.reused += 1
+            return self._retired.popleft()
+        self.allocated += 1
+        return np.empty(self.block_samples, dtype=SAMPLE_DTYPE)
+
+    def retire(self, block):
+        self._retired.append(block)
+        if len(self._retired) > self.blocks:
+            self._retired.popleft()
+
+
+class BlockWriter:
+    """
+    Writes the samples of one stream straight into pooled blocks and hands
+    them out as SampleSpans, without a tuple, Python float or array per sample.
+
+    Per-characteristic streams write the raw bytes of each field of the
+    sample being assembled through a memoryview (write_field) and then
+    commit() it; packed streams decode whole payloads in place (write_payload).
+    Not thread safe: one writer per stream, used from the event loop.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or SamplePool()
+        self.block = None
+        self._raw = None  # bytes of block
+        self._next = 0  # slot of the sample being assembled
+        self._offset = 0  # its byte offset in block
+        self._new_block()
+
+    def _new_block(self):
+        if self.block is not None:
+            self._raw = None
+            self.pool.retire(self.block)
+        self.block = self.pool.take()
+        # fields shorter than 8 bytes (a 32-bit device time) only write their low bytes
+        self.block["t"] = 0
+        self._raw = memoryview(self.block).cast("B")
+        self._next = 0
+        self._offset = 0
+
+    def _advance(self, count):
+        self._next += count
+        self._offset = self._next * _RECORD_SIZE
+        if self._next == self.pool.block_samples:
+            self._new_block()
+
+    def write_field(self, index, data):
+        """
+        Store field SAMPLE_FIELDS[index] of the sample being assembled from its
+        little-endian payload: 4 bytes for the float fields, up to 8 for "t".
+        Writing a field again before commit() overwrites it.
+        """
+        offset = self._offset + FIELD_OFFSETS[index]
+        self._raw[offset:offset + len(data)] = data
+
+    def write_decoded(self, index, data, dtype, factor=1.0):
+        """
+        Store field SAMPLE_FIELDS[index] from a payload in another encoding
+        (e.g. int16 counts): decoded as dtype and multiplied by factor.
+        """
+        value = np.frombuffer(data, dtype=dtype, count=1)[0]
+        self.block[SAMPLE_FIELDS[index]][self._next] = value * factor if factor != 1.0 else value
+
+    def commit(self):
+        """
+        Finish the sample being assembled. Returns its SampleSpan.
+        """
+        span = SampleSpan(self.block, self._next, 1)
+        self._advance(1)
+        return span
+
+    def write_payload(self, payload, layout):
+        """
+        Decode a packed payload (PackedLayout) into the block. Returns its
+        SampleSpan, a plain batch when it holds more than a block, None when empty.
+        """
+        count = layout.count(payload)
+        if not count:
+            return None
+        if count > self.pool.block_samples:
+            return layout.decode(payload)
+        if self._next + count > self.pool.block_samples:
+            self._new_block()
+        span = SampleSpan(self.block, self._next, count)
+        size = count * _RECORD_SIZE
+        if layout._zero_copy and len(payload) == size:
+            # the records already are SAMPLE_DTYPE: one copy of the bytes
+            self._raw[self._offset:self._offset + size] = payload
+        else:
+            layout.decode_into(payload, span.array())
+        self._advance(count)
+        return span
@@ -0,0 +1,133 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.samples import SAMPLE_DTYPE
+
+# one slot: the sample, the index of its device, its sequence number and host receive time
+RING_DTYPE = np.dtype(SAMPLE_DTYPE.descr + [
+    ("device", "<u4"),
+    ("seq", "<u8"),
+    ("host_t", "<f8"),
+])
+
+# header: head, tail, dropped, capacity (u8 each), padded to a cache line
+_HEADER_SIZE = 64
+_HEAD, _TAIL, _DROPPED, _CAPACITY = range(4)
+
+
+class SharedSampleRing:
+    """
+    Single-producer / single-consumer ring of RING_DTYPE records in shared
+    memory, used to move samples between processes without locks.
+
+    head and tail are ever-increasing counters; only the producer writes head
+    and only the consumer writes tail. The producer stores the records before
+    publishing the new head, and the consumer copies them out before publishing
+    the new tail, so neither side ever sees a half-written slot.
+    When the ring is full the producer drops the incoming samples and counts them
+    (it cannot discard old ones without touching the consumer's tail).
+
+    Create it in one process with SharedSampleRing(capacity=...), and attach from
+    a multiprocessing child with SharedSampleRing(name=ring.name).
+    """
+
+    def __init__(self, capacity=1 << 16, name=None):
+        self._owner = name is None
+        if self._owner:
+            size = _HEADER_SIZE + capacity * RING_DTYPE.itemsize
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            # processes started by multiprocessing share the creator's resource
+            # tracker, so attaching does not take ownership of the segment
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        self._counters = np.ndarray((4,), dtype="<u8", buffer=self._shm.buf)
+        if self._owner:
+            self._counters[:] = 0
+            self._counters[_CAPACITY] = capacity
+
+        self.capacity = int(self._counters[_CAPACITY])
+        self._slots = np.ndarray(
+            (self.capacity,), dtype=RING_DTYPE, buffer=self._shm.buf, offset=_HEADER_SIZE
+        )
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def dropped(self):
+        return int(self._counters[_DROPPED])
+
+    def __len__(self):
+        return int(self._counters[_HEAD]) - int(self._counters[_TAIL])
+
+    def close(self):
+        """
+        Detach; the creating process also frees the segment.
+        """
+        self._counters = None
+        self._slots = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    # ------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------
+    def write(self, samples, device, seq, host_t):
+        """
+        Append a SAMPLE_DTYPE batch of one device. Returns the number written.
+        seq: sequence number of the first sample
+        """
+        head = int(self._counters[_HEAD])
+        free = self.capacity - (head - int(self._counters[_TAIL]))
+        count = min(len(samples), free)
+        if count < len(samples):
+            self._counters[_DROPPED] += len(samples) - count
+        if count <= 0:
+            return 0
+
+        start = head % self.capacity
+        first = min(count, self.capacity - start)
+        self._fill(self._slots[start:start + first], samples[:first], device, seq, host_t)
+        if first < count:
+            self._fill(self._slots[:count - first], samples[first:count], device, seq + first, host_t)
+
+        # publish only once the records are in place
+        self._counters[_HEAD] = head + count
+        return count
+
+    @staticmethod
+    def _fill(slots, samples, device, seq, host_t):
+        for name in SAMPLE_DTYPE.names:
+            slots[name] = samples[name]
+        slots["device"] = device
+        slots["seq"] = np.arange(seq, seq + len(slots), dtype=np.uint64)
+        slots["host_t"] = host_t
+
+    # ------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------
+    def read(self, max_count=None):
+        """
+        Copy out and release everything written so far (at most max_count records).
+        """
+        tail = int(self._counters[_TAIL])
+        count = int(self._counters[_HEAD]) - tail
+        if max_count is not None:
+            count = min(count, max_count)
+        if count <= 0:
+            return np.empty(0, dtype=RING_DTYPE)
+
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        if first == count:
+            records = self._slots[start:start + count].copy()
+        else:
+            records = np.concatenate((self._slots[start:], self._slots[:count - first]))
+
+        # release the slots only after copying them
+        self._counters[_TAIL] = tail + count
+        return records
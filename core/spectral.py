@@ -0,0 +1,375 @@
+"""
+Streaming spectral analysis for vibration monitoring: a sliding-window FFT of
+each accelerometer axis, giving the power spectral density, a spectrogram of
+the recent past and the dominant frequencies.
+
+Samples are taken as evenly spaced at the device's sample period (from
+DeviceClock); a gap in the stream starts the window over. Every `hop` new
+samples the newest `window_size` of them are detrended, Hann windowed and
+transformed. All buffers are allocated when a device's stream starts, so the
+per-frame work runs in place, without allocating.
+"""
+import queue
+import threading
+import time
+
+import numpy as np
+
+from core.metrics import METRICS
+from core.samples import as_batch, item_device, item_gap
+from core.timing import DeviceClock
+
+# samples per FFT frame, and the share of a frame the next one overlaps
+DEFAULT_WINDOW = 256
+DEFAULT_OVERLAP = 0.75
+
+# spectrogram frames kept
+DEFAULT_HISTORY = 200
+
+# weight of the newest frame in the averaged PSD
+DEFAULT_AVERAGING = 0.2
+
+# a sample rate estimate this far (fraction) from the one in use restarts the analysis
+RATE_TOLERANCE = 0.02
+
+AXES = ("ax", "ay", "az")
+
+# worker queue marker for reset(): (_RESET, device, None, None)
+_RESET = object()
+
+
+class SlidingSpectrum:
+    """
+    Incremental windowed FFT / PSD of one 3-axis stream.
+
+    rate: sample rate (Hz)
+    window_size: samples per frame
+    hop: new samples between frames
+    history: spectrogram frames kept
+    averaging: weight of the newest frame in the averaged PSD
+
+    The PSD is one-sided, in (input unit)^2 / Hz. The spectrogram holds the
+    PSD summed over the axes, one row per frame.
+    """
+
+    def __init__(self, rate, window_size=DEFAULT_WINDOW, hop=None, history=DEFAULT_HISTORY,
+                 averaging=DEFAULT_AVERAGING):
+        n = int(window_size)
+        self.rate = float(rate)
+        self.window_size = n
+        self.hop = int(hop or max(1, round(n * (1.0 - DEFAULT_OVERLAP))))
+        if not 0 < self.hop <= n:
+            raise ValueError("hop must be between 1 and window_size")
+        self.averaging = averaging
+        self.bins = n // 2 + 1
+
+        self.window = np.hanning(n)
+        self.frequencies = np.fft.rfftfreq(n, 1.0 / self.rate)
+        # density scaling; DC and Nyquist are not doubled
+        self._scale = np.full(self.bins, 2.0 / (self.rate * np.sum(self.window ** 2)))
+        self._scale[0] /= 2.0
+        if n % 2 == 0:
+            self._scale[-1] /= 2.0
+
+        # newest window_size samples, written twice so they are always one contiguous slice
+        self._ring = np.zeros((3, 2 * n))
+        self._head = 0
+        self._filled = 0
+        self._since_frame = 0
+
+        # per-frame work buffers
+        self._frame = np.empty((3, n))
+        self._fft = np.empty((3, self.bins), dtype=np.complex128)
+        self._power = np.empty((3, self.bins))
+
+        self.psd = np.zeros((3, self.bins))
+        self.spectrogram = np.zeros((history, self.bins))
+        self.frame_times = np.full(history, np.nan)
+        self._row = 0
+        self.frames = 0
+        self.dominant = [0.0, 0.0, 0.0]  # Hz, per axis, from the averaged PSD
+
+        # the GUI reads while the worker writes
+        self.lock = threading.Lock()
+
+    def restart(self):
+        """
+        Start filling the window over (after a gap); the history stays.
+        """
+        self._filled = 0
+        self._since_frame = 0
+
+    def update(self, values, seconds):
+        """
+        Feed consecutive samples.
+        values: the three axes' (count,) arrays, e.g. a batch's ax, ay, az fields
+        seconds: (count,) sample times, the frame time is its last sample's
+        Returns the number of frames computed.
+        """
+        count = len(seconds)
+        frames = 0
+        position = 0
+        while position < count:
+            take = min(count - position, self.hop - self._since_frame)
+            self._push(values, position, take)
+            position += take
+            self._since_frame += take
+            if self._since_frame == self.hop:
+                self._since_frame = 0
+                if self._filled == self.window_size:
+                    self._compute_frame(seconds[position - 1])
+                    frames += 1
+        return frames
+
+    def _push(self, values, position, take):
+        n = self.window_size
+        head = self._head
+        first = min(take, n - head)
+        rest = take - first
+        for row, column in zip(self._ring, values):
+            block = column[position:position + take]
+            row[head:head + first] = block[:first]
+            row[head + n:head + n + first] = block[:first]
+            if rest:
+                row[:rest] = block[first:]
+                row[n:n + rest] = block[first:]
+        self._head = (head + take) % n
+        self._filled = min(self._filled + take, n)
+
+    def _compute_frame(self, frame_time):
+        # row by row: numpy buffers broadcasting 2D operations, 1D ones run in place
+        samples = self._ring[:, self._head:self._head + self.window_size]
+        for row, frame in zip(samples, self._frame):
+            np.subtract(row, row.mean(), out=frame)
+            frame *= self.window
+        np.fft.rfft(self._frame, axis=1, out=self._fft)
+        np.abs(self._fft, out=self._power)
+        self._power *= self._power
+        for power in self._power:
+            power *= self._scale
+
+        with self.lock:
+            np.sum(self._power, axis=0, out=self.spectrogram[self._row])
+            self.frame_times[self._row] = frame_time
+            self._row = (self._row + 1) % len(self.frame_times)
+
+            if self.frames:
+                self.psd *= 1.0 - self.averaging
+                self._power *= self.averaging
+                self.psd += self._power
+            else:
+                self.psd[:] = self._power
+            self.frames += 1
+
+            # strongest bin above DC, refined by a parabola through its neighbours
+            for axis in range(3):
+                k = int(self.psd[axis, 1:].argmax()) + 1
+                offset = 0.0
+                if k < self.bins - 1:
+                    left, middle, right = self.psd[axis, k - 1], self.psd[axis, k], self.psd[axis, k + 1]
+                    curvature = left - 2.0 * middle + right
+                    if curvature < 0.0:
+                        offset = 0.5 * (left - right) / curvature
+                self.dominant[axis] = (k + offset) * self.rate / self.window_size
+
+    def snapshot(self, device=None):
+        """
+        Copy of the current state, oldest spectrogram row first.
+        """
+        with self.lock:
+            order = np.roll(np.arange(len(self.frame_times)), -self._row)
+            return SpectrumSnapshot(
+                device,
+                self.frequencies,
+                self.spectrogram[order],
+                self.frame_times[order],
+                self.psd.copy(),
+                list(self.dominant),
+                self.rate,
+                self.hop,
+                self.frames,
+            )
+
+
+class SpectrumSnapshot:
+    """
+    State of one device's analysis, as published to the GUI.
+    frequencies: (bins,) Hz
+    spectrogram: (history, bins) PSD summed over the axes, oldest row first
+    frame_times: (history,) device time (s) of each row, NaN for unused rows
+    psd: (3, bins) averaged PSD per axis
+    dominant: [Hz] per axis
+    """
+
+    def __init__(self, device, frequencies, spectrogram, frame_times, psd, dominant, rate, hop, frames):
+        self.device = device
+        self.frequencies = frequencies
+        self.spectrogram = spectrogram
+        self.frame_times = frame_times
+        self.psd = psd
+        self.dominant = dominant
+        self.rate = rate
+        self.hop = hop
+        self.frames = frames
+
+
+class SpectralStage:
+    """
+    Runs a SlidingSpectrum per device on a background thread, like FusionStage:
+    the Qt event loop hands batches over and polls snapshot().
+
+    window_size / overlap: FFT frame length and the share consecutive frames overlap
+    time_scale: seconds per device time stamp tick (stamps are in ms)
+    nominal_rate: sample rate (Hz), estimated from the time stamps when None
+    """
+
+    def __init__(
+        self,
+        window_size=DEFAULT_WINDOW,
+        overlap=DEFAULT_OVERLAP,
+        history=DEFAULT_HISTORY,
+        averaging=DEFAULT_AVERAGING,
+        time_scale=1e-3,
+        nominal_rate=None,
+    ):
+        if not 0.0 <= overlap < 1.0:
+            raise ValueError("overlap must be in [0, 1)")
+        self.window_size = window_size
+        self.hop = max(1, round(window_size * (1.0 - overlap)))
+        self.history = history
+        self.averaging = averaging
+        self.time_scale = time_scale
+        self.nominal_rate = nominal_rate
+
+        self.spectra = {}  # device -> SlidingSpectrum
+        self.samples_analysed = 0
+        self.is_running = False
+
+        self._queue = None
+        self._thread = None
+
+        # worker thread state: device -> DeviceClock
+        self._clocks = {}
+
+        self._batch_metric = METRICS.histogram("imu_spectral_batch_seconds", "Spectral analysis time per batch")
+
+    # ------------------------------------------------------
+    # Control (any thread)
+    # ------------------------------------------------------
+    def start(self):
+        if self.is_running:
+            return
+        self._clocks = {}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker_loop, name="imu-spectral", daemon=True)
+        self.is_running = True
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        Hand a queue item (sample tuple, batch or SampleBatch) to the worker. Never blocks.
+        """
+        if self.is_running:
+            self._queue.put((item_device(item), as_batch(item), getattr(item, "host_t", None), item_gap(item)))
+
+    def stop(self):
+        """
+        Analyse everything submitted so far and stop the worker.
+        """
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def reset(self, device=None):
+        """
+        Drop the analysis of one device (or all).
+        """
+        if self.is_running:
+            self._queue.put((_RESET, device, None, None))
+
+    def snapshot(self, device):
+        """
+        SpectrumSnapshot of a device (the first one when None), None before its first frame.
+        """
+        if device is None:
+            device = next(iter(self.spectra), None)
+        spectrum = self.spectra.get(device)
+        if spectrum is None or not spectrum.frames:
+            return None
+        return spectrum.snapshot(device)
+
+    # ------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            device, batch, host_t, gap = item
+            if device is _RESET:
+                if batch is None:
+                    self._clocks.clear()
+                    self.spectra.clear()
+                else:
+                    self._clocks.pop(batch, None)
+                    self.spectra.pop(batch, None)
+                continue
+            started = time.perf_counter() if METRICS.enabled else None
+            self.analyse(device, batch, host_t, gap)
+            if started is not None:
+                self._batch_metric.observe(time.perf_counter() - started)
+
+    def analyse(self, device, batch, host_t=None, gap=None):
+        """
+        Feed one SAMPLE_DTYPE batch of a device (any thread, but not
+        concurrently with the worker). Returns the number of frames computed.
+        """
+        clock = self._clocks.get(device)
+        if clock is None:
+            clock = self._clocks[device] = DeviceClock(tick=self.time_scale, nominal_rate=self.nominal_rate)
+
+        spectrum = self.spectra.get(device)
+        if gap is not None:
+            # the device counter may have restarted while the link was down
+            clock.reset()
+            if spectrum is not None:
+                spectrum.restart()
+
+        seconds, gaps, _ = clock.update(batch["t"], host_t)
+        if not clock.period:
+            return 0
+
+        rate = 1.0 / clock.period
+        if spectrum is None or abs(rate - spectrum.rate) > RATE_TOLERANCE * spectrum.rate:
+            spectrum = self.spectra[device] = SlidingSpectrum(
+                rate, self.window_size, self.hop, self.history, self.averaging
+            )
+
+        values = [batch[axis] for axis in AXES]
+        self.samples_analysed += len(batch)
+
+        # feed the runs between gaps, starting the window over at each gap
+        frames = 0
+        starts = np.flatnonzero(gaps)
+        bounds = [0] + [int(s) for s in starts if s > 0] + [len(batch)]
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            if begin in starts:
+                spectrum.restart()
+            frames += spectrum.update([column[begin:end] for column in values], seconds[begin:end])
+        return frames
+
+
+def dominant_peaks(snapshot, count=3, axis=None):
+    """
+    The `count` strongest local maxima (Hz, PSD) of the averaged PSD, summed
+    over the axes or of one axis index.
+    """
+    psd = snapshot.psd.sum(axis=0) if axis is None else snapshot.psd[axis]
+    inner = psd[1:-1]
+    maxima = np.flatnonzero((inner > psd[:-2]) & (inner >= psd[2:])) + 1
+    strongest = maxima[np.argsort(psd[maxima])[::-1][:count]]
+    return [(float(snapshot.frequencies[k]), float(psd[k])) for k in strongest]
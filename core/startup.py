@@ -0,0 +1,71 @@
+"""
+Startup phase timing for the GUI application (main.py --profile-startup).
+
+The clock starts when this module is imported, which main.py does before
+anything else, so the phases add up to the time from the first line of
+main.py to the window being on screen. Interpreter start-up itself is not
+included; benchmarks/startup.py measures it from outside the process, along
+with the per-package import times.
+"""
+import json
+import time
+
+_ORIGIN = time.perf_counter()
+
+# the phase ending once the window is usable (plot canvas created and drawn),
+# which startup budgets are checked against
+READY_PHASE = "plot canvas"
+
+
+class StartupProfiler:
+    """
+    Named phases between successive mark() calls.
+    """
+
+    def __init__(self, origin=_ORIGIN):
+        self.origin = origin
+        self.marks = []
+
+    def mark(self, phase):
+        """
+        End the current phase, naming it.
+        """
+        self.marks.append((phase, time.perf_counter()))
+
+    def elapsed(self, phase=None):
+        """
+        Seconds from the origin to the end of phase (the last mark by default).
+        """
+        for name, at in reversed(self.marks):
+            if phase is None or name == phase:
+                return at - self.origin
+        raise KeyError(phase)
+
+    def phases(self):
+        """
+        [(phase, seconds in the phase, seconds since the origin)], in order.
+        """
+        result = []
+        previous = self.origin
+        for name, at in self.marks:
+            result.append((name, at - previous, at - self.origin))
+            previous = at
+        return result
+
+    def report(self):
+        lines = [f"{name:<24} {duration * 1000:8.1f} ms  {total * 1000:8.1f} ms" for name, duration, total in self.phases()]
+        return "\n".join([f"{'phase':<24} {'duration':>11}  {'total':>11}"] + lines)
+
+    def to_json(self):
+        return json.dumps({
+            # when the clock started, for measuring interpreter start-up from outside
+            "origin_time": time.time() - (time.perf_counter() - self.origin),
+            "phases": [
+                {"phase": name, "seconds": duration, "total_seconds": total}
+                for name, duration, total in self.phases()
+            ],
+        })
+
+
+# phases of the running application
+STARTUP = StartupProfiler()
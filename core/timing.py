@@ -0,0 +1,348 @@
+import numpy as np
+
+# device time stamps are 32-bit millisecond counters unless a profile says otherwise
+DEFAULT_COUNTER_BITS = 32
+DEFAULT_TICK = 1e-3  # seconds per device tick
+
+# a step longer than this many nominal periods is a gap
+DEFAULT_GAP_TOLERANCE = 1.5
+
+
+# ------------------------------------------------------
+# Counter wraparound
+# ------------------------------------------------------
+def unwrap_counter(t, bits=DEFAULT_COUNTER_BITS):
+    """
+    Undo wraparound of an unsigned counter of `bits` bits. A backwards step of
+    more than half the range is taken as a wrap; smaller ones are kept as they
+    are (reordering or jitter). Returns int64 ticks since the first wrap-free value.
+    """
+    return CounterUnwrapper(bits).unwrap(t)
+
+
+class CounterUnwrapper:
+    """
+    Streaming unwrap_counter(): carries the wrap count across batches.
+    """
+
+    def __init__(self, bits=DEFAULT_COUNTER_BITS):
+        self.modulus = 1 << bits
+        self.wraps = 0
+        self.last_raw = None
+        self.last = None  # last unwrapped value
+
+    def reset(self):
+        self.wraps = 0
+        self.last_raw = None
+        self.last = None
+
+    def unwrap(self, t):
+        raw = np.asarray(t).astype(np.int64) & (self.modulus - 1)
+        if not len(raw):
+            return raw
+
+        half = self.modulus // 2
+        previous = raw[0] if self.last_raw is None else self.last_raw
+        steps = np.diff(raw, prepend=previous)
+        wraps = self.wraps + np.cumsum(steps < -half) - np.cumsum(steps > half)
+
+        unwrapped = raw + wraps * self.modulus
+        self.wraps = int(wraps[-1])
+        self.last_raw = int(raw[-1])
+        self.last = int(unwrapped[-1])
+        return unwrapped
+
+
+# ------------------------------------------------------
+# Gaps
+# ------------------------------------------------------
+def find_gaps(t, period, tolerance=DEFAULT_GAP_TOLERANCE, previous=None):
+    """
+    Samples that follow a gap in the time stamps t (unwrapped).
+    period: nominal sample period, in the unit of t
+    previous: time of the sample before t[0], to check the first step too
+    Returns (mask, missing): mask[i] is True when t[i] follows a gap and
+    missing[i] is the estimated number of samples lost before it.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    if not len(t):
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+
+    steps = np.diff(t, prepend=t[0] if previous is None else previous)
+    mask = steps > tolerance * period
+    missing = np.where(mask, np.round(steps / period).astype(np.int64) - 1, 0)
+    return mask, missing
+
+
+# ------------------------------------------------------
+# Device-to-host clock model
+# ------------------------------------------------------
+class ClockModel:
+    """
+    Online least-squares fit of host time against device time,
+        host = offset + rate * device
+    with exponential forgetting, so drift that changes with temperature is
+    followed. Host times are receive times, so the offset includes the mean
+    transport latency; the rate (drift) is unaffected by it.
+
+    forgetting: weight multiplier per pair, 1.0 keeps every pair forever
+    """
+
+    def __init__(self, forgetting=0.999):
+        self.forgetting = forgetting
+        self.pairs = 0
+
+        # pairs are centred on the first one to keep the sums well conditioned
+        self._origin = None
+        self._sums = np.zeros(5)  # w, x, y, xx, xy
+
+    def reset(self):
+        self.pairs = 0
+        self._origin = None
+        self._sums[:] = 0.0
+
+    def update(self, device_t, host_t):
+        """
+        Add (device time, host time) pairs, both in seconds (scalars or arrays).
+        """
+        x = np.atleast_1d(np.asarray(device_t, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(host_t, dtype=np.float64))
+        if not len(x):
+            return
+        if self._origin is None:
+            self._origin = (x[0], y[0])
+
+        x = x - self._origin[0]
+        y = y - self._origin[1]
+
+        # newest pair has weight 1, older ones decay
+        weights = self.forgetting ** np.arange(len(x) - 1, -1, -1, dtype=np.float64)
+        self._sums *= self.forgetting ** len(x)
+        self._sums += (
+            weights.sum(),
+            weights @ x,
+            weights @ y,
+            weights @ (x * x),
+            weights @ (x * y),
+        )
+        self.pairs += len(x)
+
+    @property
+    def rate(self):
+        """
+        Host seconds per device second (1.0 when there is not enough data).
+        """
+        w, sx, _, sxx, _ = self._sums
+        denominator = w * sxx - sx * sx
+        if self.pairs < 2 or denominator <= 1e-12 * max(1.0, w * sxx):
+            return 1.0
+        _, sx, sy, _, sxy = self._sums
+        return (w * sxy - sx * sy) / denominator
+
+    @property
+    def drift_ppm(self):
+        """
+        How much faster (+) or slower (-) the host clock runs than the device clock.
+        """
+        return (self.rate - 1.0) * 1e6
+
+    @property
+    def offset(self):
+        """
+        Host time (s) at device time 0.
+        """
+        if self._origin is None:
+            return 0.0
+        w, sx, sy, _, _ = self._sums
+        rate = self.rate
+        intercept = (sy - rate * sx) / w
+        return self._origin[1] + intercept - rate * self._origin[0]
+
+    def to_host(self, device_t):
+        """
+        Host time (s) of device times (s).
+        """
+        if self._origin is None:
+            raise ValueError("ClockModel has no data yet")
+        w, sx, sy, _, _ = self._sums
+        rate = self.rate
+        intercept = (sy - rate * sx) / w
+        x = np.asarray(device_t, dtype=np.float64) - self._origin[0]
+        return self._origin[1] + intercept + rate * x
+
+
+class DeviceClock:
+    """
+    Time stamp reconstruction for one device stream: unwraps the counter,
+    converts ticks to seconds, flags gaps and tracks the clock model.
+
+    tick: seconds per device tick
+    bits: counter width
+    nominal_rate: expected sample rate (Hz); estimated from the stream when None
+    """
+
+    def __init__(
+        self,
+        tick=DEFAULT_TICK,
+        bits=DEFAULT_COUNTER_BITS,
+        nominal_rate=None,
+        gap_tolerance=DEFAULT_GAP_TOLERANCE,
+        forgetting=0.999,
+    ):
+        self.tick = tick
+        self.nominal_rate = nominal_rate
+        self.gap_tolerance = gap_tolerance
+        self.unwrapper = CounterUnwrapper(bits)
+        self.clock = ClockModel(forgetting)
+
+        self.samples = 0
+        self.gaps = 0
+        self.missing = 0
+        self.last_time = None  # seconds
+
+        # running estimate of the sample period when nominal_rate is not given
+        self._period = None
+
+    @property
+    def period(self):
+        if self.nominal_rate:
+            return 1.0 / self.nominal_rate
+        return self._period
+
+    def reset(self):
+        """
+        Start over, e.g. after a reconnect (the device counter may have restarted).
+        """
+        self.unwrapper.reset()
+        self.clock.reset()
+        self.last_time = None
+        self._period = None
+
+    def update(self, t, host_t=None):
+        """
+        Process the raw time stamps of one batch.
+        host_t: host receive time (s) of the batch's last sample, for the clock model
+        Returns (seconds, gap_mask, missing) for the batch.
+        """
+        seconds = self.unwrapper.unwrap(t) * self.tick
+        if not len(seconds):
+            return seconds, np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+
+        if not self.nominal_rate:
+            previous = seconds[0] if self.last_time is None else self.last_time
+            steps = np.diff(seconds, prepend=previous)
+            steps = steps[steps > 0]
+            if len(steps):
+                period = float(np.median(steps))
+                if self._period is None:
+                    self._period = period
+                else:
+                    # a gap in a one-sample batch must not drag the estimate away
+                    self._period = 0.9 * self._period + 0.1 * min(period, 2 * self._period)
+
+        if self.period:
+            gap_mask, missing = find_gaps(seconds, self.period, self.gap_tolerance, self.last_time)
+        else:
+            gap_mask, missing = np.zeros(len(seconds), dtype=bool), np.zeros(len(seconds), dtype=np.int64)
+
+        if host_t is not None:
+            self.clock.update(seconds[-1], host_t)
+
+        self.samples += len(seconds)
+        self.gaps += int(gap_mask.sum())
+        self.missing += int(missing.sum())
+        self.last_time = float(seconds[-1])
+        return seconds, gap_mask, missing
+
+    def to_host(self, seconds):
+        return self.clock.to_host(seconds)
+
+    def stats(self):
+        return {
+            "samples": self.samples,
+            "gaps": self.gaps,
+            "missing": self.missing,
+            "period": self.period,
+            "drift_ppm": float(self.clock.drift_ppm),
+            "offset": float(self.clock.offset),
+        }
+
+
+# ------------------------------------------------------
+# Uniform resampling
+# ------------------------------------------------------
+def resample_uniform(t, values, rate, t_start=None, t_end=None, max_gap=None):
+    """
+    Linearly interpolate samples at irregular times t (s, increasing) onto a
+    uniform grid of `rate` Hz.
+    values: (N,) or (N, k)
+    max_gap: grid points inside a step longer than this (s) become NaN
+    Returns (grid, resampled) with resampled shaped (M, k) (or (M,) for 1-D values).
+    """
+    t = np.asarray(t, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(t) < 2:
+        return np.empty(0), np.empty((0,) + values.shape[1:])
+
+    start = t[0] if t_start is None else t_start
+    end = t[-1] if t_end is None else t_end
+    grid = start + np.arange(int(np.floor((end - start) * rate + 1e-9)) + 1) / rate
+    return grid, _interpolate(t, values, grid, max_gap)
+
+
+def _interpolate(t, values, grid, max_gap=None):
+    # one searchsorted for every column
+    right = np.clip(np.searchsorted(t, grid, side="right"), 1, len(t) - 1)
+    left = right - 1
+    span = t[right] - t[left]
+    weight = np.divide(grid - t[left], span, out=np.zeros_like(grid), where=span > 0)
+    weight = np.clip(weight, 0.0, 1.0)
+    if values.ndim > 1:
+        weight = weight[:, None]
+
+    out = values[left] * (1.0 - weight) + values[right] * weight
+    if max_gap is not None:
+        out[span > max_gap] = np.nan
+    return out
+
+
+class UniformResampler:
+    """
+    Streaming resample_uniform(): feed consecutive batches, get the grid points
+    they complete. The last sample is carried over to interpolate across batches.
+    """
+
+    def __init__(self, rate, max_gap=None):
+        self.rate = rate
+        self.max_gap = max_gap
+        self._next = None  # next grid time (s)
+        self._last_t = None
+        self._last_values = None
+
+    def reset(self):
+        self._next = None
+        self._last_t = None
+        self._last_values = None
+
+    def update(self, t, values):
+        t = np.asarray(t, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        empty = np.empty(0), np.empty((0,) + values.shape[1:])
+        if not len(t):
+            return empty
+
+        if self._last_t is not None:
+            t = np.concatenate(([self._last_t], t))
+            values = np.concatenate((self._last_values[None], values))
+        if self._next is None:
+            self._next = t[0]
+
+        self._last_t = t[-1]
+        self._last_values = values[-1].copy()
+        if len(t) < 2 or self._next > t[-1]:
+            return empty
+
+        count = int(np.floor((t[-1] - self._next) * self.rate + 1e-9)) + 1
+        grid = self._next + np.arange(count) / self.rate
+        self._next = grid[-1] + 1.0 / self.rate
+        return grid, _interpolate(t, values, grid, self.max_gap)
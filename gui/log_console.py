@@ -0,0 +1,135 @@
+"""
+Status log view that stays cheap during message storms (read failures,
+reconnect loops) on the event loop it shares with the BLE I/O.
+
+Messages are buffered and rendered in one batch at most MAX_RENDERS_PER_SEC
+times per second, repeats of the same message collapse into one line with a
+counter, and the view keeps only the last MAX_LOG_LINES lines. The full
+history goes to a rotating file, written by a background thread.
+"""
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QPlainTextEdit
+
+# lines kept in the view
+MAX_LOG_LINES = 1000
+
+# view updates per second at most
+MAX_RENDERS_PER_SEC = 10
+
+# history file size before rotating, and rotated files kept
+LOG_FILE_BYTES = 1_000_000
+LOG_FILE_BACKUPS = 3
+
+
+def _line(text, count):
+    return text if count == 1 else f"{text}  (x{count})"
+
+
+class LogConsole(QPlainTextEdit):
+    """
+    Read-only, rate-limited, bounded log view.
+
+    max_lines: lines kept in the view
+    max_rate: view updates per second at most
+    path: optional file receiving every message, rotated at max_bytes
+    """
+
+    def __init__(
+        self,
+        max_lines=MAX_LOG_LINES,
+        max_rate=MAX_RENDERS_PER_SEC,
+        path=None,
+        max_bytes=LOG_FILE_BYTES,
+        backups=LOG_FILE_BACKUPS,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self.max_lines = max_lines
+        self.path = path
+
+        # [text, count] runs not rendered yet
+        self._pending = collections.deque()
+        self._skipped = 0
+
+        # last rendered line, updated in place while it keeps repeating
+        self._shown_text = None
+        self._shown_count = 0
+        self._shown_changed = False
+
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(int(1000 / max_rate))
+        self._render_timer.timeout.connect(self._render)
+
+        # the file is written by the listener's thread
+        self._history = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self._history_queue = queue.SimpleQueue()
+            self._history = logging.handlers.QueueListener(self._history_queue, handler)
+            self._history.start()
+
+    def add_message(self, text):
+        if self._history is not None:
+            self._history_queue.put_nowait(logging.makeLogRecord({"msg": text}))
+
+        if self._pending and self._pending[-1][0] == text:
+            self._pending[-1][1] += 1
+        elif not self._pending and text == self._shown_text:
+            self._shown_count += 1
+            self._shown_changed = True
+        else:
+            self._pending.append([text, 1])
+            if len(self._pending) > self.max_lines:
+                # would scroll out of the view before it is ever shown
+                self._skipped += self._pending.popleft()[1]
+
+        if not self._render_timer.isActive():
+            self._render_timer.start()
+
+    def _render(self):
+        if self._shown_changed:
+            self._shown_changed = False
+            cursor = self.textCursor()
+            cursor.movePosition(QTextCursor.End)
+            cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+            cursor.insertText(_line(self._shown_text, self._shown_count))
+
+        if not self._pending:
+            return
+
+        lines = [_line(text, count) for text, count in self._pending]
+        if self._skipped:
+            where = f", see {self.path}" if self.path else ""
+            lines.insert(0, f"... {self._skipped} messages not shown{where}")
+            self._skipped = 0
+
+        # one document update for the whole batch
+        self.appendPlainText("\n".join(lines))
+        self._shown_text, self._shown_count = self._pending[-1]
+        self._pending.clear()
+
+    def stop_history(self):
+        """
+        Write out the queued history and close the file.
+        """
+        if self._history is not None:
+            self._history.stop()
+            for handler in self._history.handlers:
+                handler.close()
+            self._history = None
@@ -1,21 +1,26 @@
 import os
 import asyncio
 
-os.environ["QT_API"] = "PyQt6"
+os.environ["QT_API"] = "PySide6"
 
 from PySide6.QtWidgets import (
     QMainWindow, QPushButton, QVBoxLayout,
-    QWidget, QTextEdit, QComboBox
+    QWidget, QComboBox, QLabel, QCheckBox
 )
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
+from PySide6.QtGui import QFontDatabase
+
+from gui.log_console import LogConsole
 
 class MainWindow(QMainWindow):
-    def __init__(self, device_profiles):
+    def __init__(self, device_profiles, log_path=None):
+        """
+        log_path: optional file keeping the full status log history
+        """
         super().__init__()
 
         self.device_profiles = device_profiles  # <-- no UUIDs stored here
         self.selected_profile = None
+        self.selected_device = None  # address of the device shown in the plot
 
         layout = QVBoxLayout()
 
@@ -25,9 +30,8 @@ class MainWindow(QMainWindow):
         self.profile_box.currentIndexChanged.connect(self._on_profile_selected)
         layout.addWidget(self.profile_box)
 
-        # Logs
-        self.log_box = QTextEdit()
-        self.log_box.setReadOnly(True)
+        # Logs (rate-limited and bounded, full history in log_path)
+        self.log_box = LogConsole(path=log_path)
         layout.addWidget(self.log_box)
 
         # Scan button
@@ -38,6 +42,10 @@ class MainWindow(QMainWindow):
         self.connect_button = QPushButton("Connect")
         layout.addWidget(self.connect_button)
 
+        # Connect every device in range
+        self.connect_all_button = QPushButton("Connect All")
+        layout.addWidget(self.connect_all_button)
+
         # Disconnect button
         self.disconnect_button = QPushButton("Disonnect")
         layout.addWidget(self.disconnect_button)
@@ -49,10 +57,37 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.low_power_button)
         layout.addWidget(self.high_power_button)
 
-        # Add Matplotlib canvas for plot
-        self.figure, self.ax = plt.subplots()
-        self.canvas = FigureCanvas(self.figure)
-        layout.addWidget(self.canvas)
+        # Switch the power mode from motion activity (bluetooth.power_policy);
+        # pressing Low/High takes manual control back
+        self.auto_power_box = QCheckBox("Automatic Power Mode")
+        layout.addWidget(self.auto_power_box)
+        self.low_power_button.clicked.connect(lambda: self.auto_power_box.setChecked(False))
+        self.high_power_button.clicked.connect(lambda: self.auto_power_box.setChecked(False))
+
+        # Connected devices: plotted device selector and per-device throughput
+        self.device_box = QComboBox()
+        self.device_box.currentIndexChanged.connect(self._on_device_selected)
+        layout.addWidget(self.device_box)
+
+        self.device_stats_label = QLabel("No devices connected.")
+        layout.addWidget(self.device_stats_label)
+
+        # Orientation of the plotted device (from the fusion stage)
+        self.orientation_label = QLabel("Orientation: -")
+        layout.addWidget(self.orientation_label)
+
+        # Pipeline metrics (core.metrics), hidden while collection is off
+        self.metrics_label = QLabel("")
+        self.metrics_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.metrics_label.hide()
+        layout.addWidget(self.metrics_label)
+
+        # Matplotlib canvas for the plot, created on first use (see ensure_plot)
+        self._layout = layout
+        self._figure = None
+        self._ax = None
+        self._spectrum_ax = None
+        self._canvas = None
 
         container = QWidget()
         container.setLayout(layout)
@@ -62,9 +97,142 @@ class MainWindow(QMainWindow):
         if self.profile_box.count() > 0:
             self._on_profile_selected(0)
 
+    def ensure_plot(self):
+        """
+        Create the Matplotlib figure and canvas. Importing the Qt backend is the
+        slowest part of startup, so main.py does this once the window is shown;
+        figure, ax, spectrum_ax and canvas call it when used earlier. The figure is built
+        without pyplot, which is slower still to import.
+        """
+        if self._figure is not None:
+            return
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+
+        # live samples on top, the spectrogram (plotting.spectrogram) below
+        self._figure = Figure(figsize=(6.4, 7.2))
+        self._ax, self._spectrum_ax = self._figure.subplots(2, 1, height_ratios=(3, 2))
+        self._figure.subplots_adjust(hspace=0.4)
+        self._canvas = FigureCanvas(self._figure)
+        self._layout.addWidget(self._canvas)
+
+    @property
+    def figure(self):
+        self.ensure_plot()
+        return self._figure
+
+    @property
+    def ax(self):
+        self.ensure_plot()
+        return self._ax
+
+    @property
+    def spectrum_ax(self):
+        self.ensure_plot()
+        return self._spectrum_ax
+
+    @property
+    def canvas(self):
+        self.ensure_plot()
+        return self._canvas
+
     def _on_profile_selected(self, index):
         key = list(self.device_profiles.keys())[index]
         self.selected_profile = self.device_profiles[key]
     
+    def _on_device_selected(self, index):
+        self.selected_device = self.device_box.itemData(index) if index >= 0 else None
+
+    def update_devices(self, device_stats, channel_stats=()):
+        """
+        Refresh the device selector and throughput counters.
+        device_stats: BLEImuManager.device_stats()
+        channel_stats: SampleChannel.stats() of the data channels
+        """
+        connected = [addr for addr, stats in device_stats.items() if stats["connected"]]
+        listed = [self.device_box.itemData(i) for i in range(self.device_box.count())]
+
+        if connected != listed:
+            self.device_box.blockSignals(True)
+            self.device_box.clear()
+            for addr in connected:
+                self.device_box.addItem(f"{device_stats[addr]['name']} ({addr})", addr)
+            index = self.device_box.findData(self.selected_device)
+            self.device_box.setCurrentIndex(index if index >= 0 else 0)
+            self.device_box.blockSignals(False)
+            self._on_device_selected(self.device_box.currentIndex())
+
+        lines = [self._device_line(device_stats[addr]) for addr in connected] or ["No devices connected."]
+
+        lines += [
+            f"{c['name']} queue: {c['depth']}/{c['maxsize']} ({c['policy']}), "
+            f"dropped {c['dropped']}, lag {c['lag'] * 1000:.0f} ms"
+            for c in channel_stats
+        ]
+        self.device_stats_label.setText("\n".join(lines))
+
+    @staticmethod
+    def _device_line(stats):
+        details = [f"{stats['samples']} total", stats["mode"]]
+        if stats.get("time_to_first_sample") is not None:
+            details.append(f"first sample after {stats['time_to_first_sample'] * 1000:.0f} ms")
+        if stats.get("reconnects"):
+            details.append(f"{stats['reconnects']} reconnects, {stats['gap_seconds']:.1f} s lost")
+
+        line = f"{stats['name']}: {stats['samples_per_sec']:.0f} samples/s ({', '.join(details)})"
+        if stats.get("state") == "reconnecting":
+            line += " - reconnecting..."
+        return line
+
+    def update_orientation(self, result):
+        """
+        Show the newest orientation of a FusionResult (None when there is none yet).
+        """
+        if result is None or not len(result):
+            self.orientation_label.setText("Orientation: -")
+            return
+
+        roll, pitch, yaw = result.euler[-1]
+        ax, ay, az = result.world_accel[-1]
+        self.orientation_label.setText(
+            f"Roll {roll:.1f}°  Pitch {pitch:.1f}°  Yaw {yaw:.1f}°  |  "
+            f"World accel {ax:.2f}, {ay:.2f}, {az:.2f} m/s²"
+        )
+
+    def update_metrics(self, series):
+        """
+        Show a MetricsRegistry.snapshot(): latency percentiles, rates and queue gauges.
+        """
+        if not series:
+            self.metrics_label.hide()
+            return
+
+        lines = []
+        for entry in sorted(series, key=lambda e: (e["name"], sorted(e["labels"].items()))):
+            labels = ",".join(str(value) for value in entry["labels"].values())
+            name = entry["name"].removeprefix("imu_") + (f"[{labels}]" if labels else "")
+
+            if entry["type"] == "histogram":
+                if not entry["count"]:
+                    continue
+                if entry["name"].endswith("_seconds"):
+                    values = f"p50 {entry['p50'] * 1000:.2f} ms  p99 {entry['p99'] * 1000:.2f} ms"
+                else:
+                    values = f"p50 {entry['p50']:.0f}  p99 {entry['p99']:.0f}"
+                lines.append(f"{name}: {values}  (n={entry['count']})")
+            elif entry["type"] == "counter":
+                lines.append(f"{name}: {entry['value']}  ({entry['rate']:.0f}/s)")
+            elif entry["name"].endswith("_seconds"):
+                lines.append(f"{name}: {entry['value'] * 1000:.0f} ms")
+            else:
+                lines.append(f"{name}: {entry['value']}")
+
+        self.metrics_label.setText("\n".join(lines))
+        self.metrics_label.show()
+
     def append_log(self, text: str):
-        self.log_box.append(text)
+        self.log_box.add_message(text)
+
+    def closeEvent(self, event):
+        self.log_box.stop_history()
+        super().closeEvent(event)
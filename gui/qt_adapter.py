@@ -0,0 +1,15 @@
+from PySide6.QtCore import QObject, Signal
+
+
+class QtStatusRelay(QObject):
+    """
+    Qt adapter for an Observable status interface (e.g. BLEImuManager.status):
+    re-emits every message as a Qt signal, so slots run on the thread owning
+    the relay (the GUI thread) whichever thread emitted it.
+    """
+
+    status = Signal(str)
+
+    def __init__(self, observable, parent=None):
+        super().__init__(parent)
+        observable.connect(self.status.emit)
@@ -16,16 +16,46 @@
 # -------------------------------------------
 
 
+# first, so the startup clock covers every import below
+from core.startup import READY_PHASE, STARTUP
+
+import argparse
 import asyncio
-import matplotlib.pyplot as plt
+import sys
 
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication
 from qasync import QEventLoop
 
 from plotting.visualization import plot_2d_data
 from core.device_profiles import AVAILABLE_DEVICES
 from gui.main_window import MainWindow
-from bluetooth.ble_imu_manager import BLEImuManager
+from core.channel import (
+    ChannelFanout, SampleChannel, POLICY_BLOCK, POLICY_DROP_OLDEST, drain_into, watch_channel
+)
+from core.metrics import METRICS, FORMATS, FORMAT_JSON, MetricsExporter
+
+# Matplotlib, Bluetooth, acquisition, recording, fusion and DSP modules are imported
+# once the window is on screen (see wire_in_process / wire_isolated / main_async)
+
+STARTUP.mark("imports")
+
+# live view and analysis keep only fresh data (a slow consumer must not stall
+# the BLE reads), the recorder must not lose any
+LIVE_QUEUE_SIZE = 256
+LIVE_QUEUE_POLICY = POLICY_DROP_OLDEST
+RECORD_QUEUE_SIZE = 4096
+FUSION_QUEUE_SIZE = 4096
+FUSION_QUEUE_POLICY = POLICY_DROP_OLDEST
+
+# orientation readout refresh period
+ORIENTATION_INTERVAL_MS = 100
+
+# metrics panel refresh period
+METRICS_INTERVAL_MS = 1000
+
+# status log history
+LOG_FILE = "logs/central.log"
 
 
 async def scan(gui, ble):
@@ -38,37 +68,32 @@ async def scan(gui, ble):
         gui.append_log("No device profile selected.")
         return
 
-    devices = await ble.scan_devices(profile["SERVICE_UUID"])
+    devices = await ble.scan_devices(profile.service_uuid)
     if devices:
         for d in devices:
             gui.append_log(f"Found: {d.name}  ({d.address})")
 
 
-async def connect_and_stream(gui, ble, data_queue):
+async def connect_and_stream(gui, ble, data_queue, recorder, all_devices=False):
     """
-    Connect to first matching device and start IMU read loop.
+    Connect to the next matching device (or every one in range), start the IMU
+    read loops and recording.
     """
     profile = gui.selected_profile
     if not profile:
         gui.append_log("No device profile selected.")
         return
 
-    await ble.connect(
-        data_queue,
-        profile["SERVICE_UUID"],
-        profile["TIME_UUID"],
-        profile["ACCEL_X_UUID"],
-        profile["ACCEL_Y_UUID"],
-        profile["ACCEL_Z_UUID"],
-        profile["GYRO_X_UUID"],
-        profile["GYRO_Y_UUID"],
-        profile["GYRO_Z_UUID"],
-    )
+    await ble.connect_profile(data_queue, profile, all_devices)
 
+    if ble.is_connected and not recorder.is_recording:
+        recorder.start(device_profile=gui.profile_box.currentText())
+        gui.append_log(f"Recording to {recorder.directory}/")
 
-async def disconnect(gui, ble):
+
+async def disconnect(gui, ble, recorder):
     """
-    Disconnect from the Bluetooth device.
+    Disconnect from the Bluetooth device and finish the recording.
     """
     if not ble.is_connected:
         gui.append_log("No device is currently connected.")
@@ -76,47 +101,54 @@ async def disconnect(gui, ble):
 
     gui.append_log("Disconnecting...")
     await ble.disconnect()
+    recorder.stop()
     gui.append_log("Disconnected.")
 
 
-async def main_async():
+def wire_in_process(gui, loop, live_channel, fusion_channel):
     """
-    Runs inside the qasync event loop.
+    BLE, decoding and recording share the GUI's event loop.
+    Returns (stats, set_power_mode): a callable giving (device_stats,
+    channel_stats) for the stats display, and one writing (address, mode).
     """
-    # Qt application
-    # app = QApplication(sys.argv)
-    app = QApplication()
-
-    # qasync event loop
-    loop = QEventLoop(app)
-    asyncio.set_event_loop(loop)
+    from bluetooth.ble_imu_manager import BLEImuManager
+    from gui.qt_adapter import QtStatusRelay
+    from recording.recorder import BinaryRecorder, record_from
 
-    # BLE + GUI setup
     ble = BLEImuManager()
-    gui = MainWindow(AVAILABLE_DEVICES)
 
     # Forward BLE log messages into GUI
-    ble.status.connect(gui.append_log)
+    relay = QtStatusRelay(ble.status, gui)
+    relay.status.connect(gui.append_log)
+
+    record_channel = SampleChannel(RECORD_QUEUE_SIZE, POLICY_BLOCK, name="recorder")
+    watch_channel(record_channel)
+    data_queue = ChannelFanout([live_channel, record_channel, fusion_channel])
 
-    # Data queue for IMU readings
-    data_queue = asyncio.Queue()
+    # Background binary recorder (see recording/export.py for CSV)
+    recorder = BinaryRecorder("recordings", status=ble.status.emit)
 
     # Button wiring
     gui.scan_button.clicked.connect(
         lambda: asyncio.create_task(scan(gui, ble))
     )
     gui.connect_button.clicked.connect(
-        lambda: asyncio.create_task(connect_and_stream(gui, ble, data_queue))
+        lambda: asyncio.create_task(connect_and_stream(gui, ble, data_queue, recorder))
+    )
+    gui.connect_all_button.clicked.connect(
+        lambda: asyncio.create_task(
+            connect_and_stream(gui, ble, data_queue, recorder, all_devices=True)
+        )
     )
     gui.disconnect_button.clicked.connect(
-        lambda: asyncio.create_task(disconnect(gui, ble))
+        lambda: asyncio.create_task(disconnect(gui, ble, recorder))
     )
 
     # Write Low Power Mode
     gui.low_power_button.clicked.connect(
         lambda: asyncio.create_task(
             ble.set_power_mode(
-                gui.selected_profile["POWER_MODE_UUID"],
+                gui.selected_profile.power_mode_uuid,
                 0  # MODE_LOW
             )
         )
@@ -126,24 +158,256 @@ async def main_async():
     gui.high_power_button.clicked.connect(
         lambda: asyncio.create_task(
             ble.set_power_mode(
-                gui.selected_profile["POWER_MODE_UUID"],
+                gui.selected_profile.power_mode_uuid,
                 1  # MODE_HIGH
             )
         )
     )
 
+    # Recording loop
+    loop.create_task(record_from(record_channel, recorder))
+
+    def set_power_mode(address, mode):
+        return ble.set_power_mode(gui.selected_profile.power_mode_uuid, mode, address)
+
+    stats = lambda: (
+        ble.device_stats(),
+        [live_channel.stats(), record_channel.stats(), fusion_channel.stats()],
+    )
+    return stats, set_power_mode
+
+
+def wire_isolated(gui, loop, app, live_channel, fusion_channel):
+    """
+    BLE, decoding and recording run in an acquisition process; samples arrive
+    through shared memory, so a slow redraw cannot cost samples.
+    Returns (stats, set_power_mode), as wire_in_process does.
+    """
+    from acquisition.process import AcquisitionProcess
+
+    acquisition = AcquisitionProcess(
+        recording_directory="recordings",
+        on_status=gui.append_log,
+        on_scan=lambda devices: [gui.append_log(f"Found: {name}  ({address})") for name, address in devices],
+    )
+    acquisition.start()
+    app.aboutToQuit.connect(acquisition.stop)
+
+    # the acquisition process reports its own metrics with its stats
+    METRICS.add_collector(lambda: acquisition.metrics)
+
+    def selected_profile():
+        if not gui.selected_profile:
+            gui.append_log("No device profile selected.")
+        return gui.selected_profile
+
+    def scan_devices():
+        profile = selected_profile()
+        if profile:
+            acquisition.scan(profile.service_uuid)
+
+    def connect(all_devices=False):
+        profile = selected_profile()
+        if profile:
+            acquisition.connect(profile, gui.profile_box.currentText(), all_devices)
+
+    # Button wiring
+    gui.scan_button.clicked.connect(scan_devices)
+    gui.connect_button.clicked.connect(lambda: connect())
+    gui.connect_all_button.clicked.connect(lambda: connect(all_devices=True))
+    gui.disconnect_button.clicked.connect(acquisition.disconnect)
+    gui.low_power_button.clicked.connect(
+        lambda: acquisition.set_power_mode(gui.selected_profile.power_mode_uuid, 0)  # MODE_LOW
+    )
+    gui.high_power_button.clicked.connect(
+        lambda: acquisition.set_power_mode(gui.selected_profile.power_mode_uuid, 1)  # MODE_HIGH
+    )
+
+    # Samples from the shared ring into the GUI-side channels
+    loop.create_task(acquisition.pump(ChannelFanout([live_channel, fusion_channel])))
+
+    def set_power_mode(address, mode):
+        acquisition.set_power_mode(gui.selected_profile.power_mode_uuid, mode, address)
+
+    stats = lambda: (
+        acquisition.device_stats(),
+        acquisition.channel_stats + [acquisition.ring_stats(), live_channel.stats(), fusion_channel.stats()],
+    )
+    return stats, set_power_mode
+
+
+async def main_async(
+    isolated=False,
+    metrics=True,
+    metrics_file=None,
+    metrics_port=None,
+    metrics_format=FORMAT_JSON,
+    log_file=LOG_FILE,
+    profile_startup=False,
+    startup_budget=None,
+):
+    """
+    Runs inside the qasync event loop.
+    isolated: run acquisition and recording in a separate process
+    metrics: collect pipeline metrics (core.metrics) for the stats panel and export
+    metrics_file / metrics_port: also publish them to a file or a localhost port
+    log_file: file keeping the full status log history, None for none
+    profile_startup: print the startup phase times and quit once everything is wired
+    startup_budget: seconds allowed until the window is usable (plot drawn);
+    checked before the event loop starts, then the application quits, with
+    exit code 1 when over budget
+
+    Returns the exit code.
+    """
+    METRICS.enabled = metrics
+
+    # Qt application
+    # app = QApplication(sys.argv)
+    app = QApplication()
+
+    # qasync event loop
+    loop = QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    STARTUP.mark("qt application")
+
+    # GUI setup
+    gui = MainWindow(AVAILABLE_DEVICES, log_path=log_file)
+    STARTUP.mark("main window")
+
+    # On screen before Matplotlib's Qt backend, Bluetooth and fusion modules are even imported
     gui.show()
+    app.processEvents()
+    STARTUP.mark("window shown")
+
+    # usable once the canvas has been drawn the first time
+    gui.ensure_plot()
+    gui.canvas.draw()
+    app.processEvents()
+    STARTUP.mark(READY_PHASE)
+
+    exit_code = 0
+    if startup_budget is not None:
+        ready = STARTUP.elapsed(READY_PHASE)
+        if ready > startup_budget:
+            print(f"Startup over budget: usable after {ready:.3f} s, budget {startup_budget:.3f} s", file=sys.stderr)
+            exit_code = 1
+
+    # Data channels for the GUI-side consumers
+    live_channel = SampleChannel(LIVE_QUEUE_SIZE, LIVE_QUEUE_POLICY, name="live")
+    fusion_channel = SampleChannel(FUSION_QUEUE_SIZE, FUSION_QUEUE_POLICY, name="fusion")
+    watch_channel(live_channel)
+    watch_channel(fusion_channel)
+
+    # Orientation filter and spectral analysis, each on its own thread
+    from core.fusion import FusionStage
+    from core.spectral import SpectralStage
+    from plotting.spectrogram import plot_spectrogram
+    fusion = FusionStage()
+    fusion.start()
+    spectral = SpectralStage()
+    spectral.start()
+
+    if isolated:
+        stats, set_power_mode = wire_isolated(gui, loop, app, live_channel, fusion_channel)
+    else:
+        stats, set_power_mode = wire_in_process(gui, loop, live_channel, fusion_channel)
+
+    # Automatic power mode from motion activity, while the box is ticked
+    from bluetooth.power_policy import PowerModeController
+    power = PowerModeController(set_power_mode, status=gui.append_log)
+    power.enabled = False
+
+    def toggle_auto_power(enabled):
+        power.reset()
+        power.enabled = bool(enabled) and gui.selected_profile is not None
+        if enabled and not power.enabled:
+            gui.append_log("No device profile selected.")
+            gui.auto_power_box.setChecked(False)
+
+    gui.auto_power_box.toggled.connect(toggle_auto_power)
 
     # Use GUI's axes
     ax = gui.ax
     canvas = gui.canvas
 
+    # Per-device throughput counters, refreshed once a second
+    stats_timer = QTimer(gui)
+    stats_timer.timeout.connect(lambda: gui.update_devices(*stats()))
+    stats_timer.start(1000)
+
+    # Orientation of the plotted device
+    orientation_timer = QTimer(gui)
+    orientation_timer.timeout.connect(
+        lambda: gui.update_orientation(fusion.latest.get(gui.selected_device))
+    )
+    orientation_timer.start(ORIENTATION_INTERVAL_MS)
+
+    # Pipeline metrics panel and export
+    if metrics:
+        metrics_timer = QTimer(gui)
+        metrics_timer.timeout.connect(lambda: gui.update_metrics(METRICS.snapshot()))
+        metrics_timer.start(METRICS_INTERVAL_MS)
+
+        if metrics_file or metrics_port is not None:
+            exporter = MetricsExporter(METRICS, metrics_file, metrics_port, metrics_format)
+            loop.create_task(exporter.start())
+
     # Plot loop
-    loop.create_task(plot_2d_data(ax, canvas, data_queue))
+    loop.create_task(plot_2d_data(
+        ax, canvas, live_channel,
+        device_selector=lambda: gui.selected_device,
+    ))
+
+    # Spectrogram and dominant frequencies of the plotted device
+    plot_spectrogram(gui.spectrum_ax, canvas, spectral, device_selector=lambda: gui.selected_device)
+
+    # Fusion, spectral analysis and power policy loop
+    def analyse(item):
+        fusion.submit(item)
+        spectral.submit(item)
+        power.submit(item)
+
+    loop.create_task(drain_into(fusion_channel, analyse))
+    STARTUP.mark("pipeline wired")
+
+    if profile_startup:
+        print(STARTUP.report())
+        print(STARTUP.to_json())
+    if profile_startup or startup_budget is not None:
+        loop.call_soon(app.quit)
 
     # Run forever
     with loop:
         loop.run_forever()
+    return exit_code
 
 if __name__ == "__main__":
-    asyncio.run(main_async())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Bluetooth IMU central")
+    parser.add_argument(
+        "--isolated", action="store_true",
+        help="run Bluetooth acquisition and recording in a separate process",
+    )
+    parser.add_argument("--no-metrics", action="store_true", help="do not collect pipeline metrics")
+    parser.add_argument("--metrics-file", help="keep the latest metrics in this file")
+    parser.add_argument("--metrics-port", type=int, help="serve the metrics on this localhost port")
+    parser.add_argument("--metrics-format", choices=FORMATS, default=FORMAT_JSON)
+    parser.add_argument("--log-file", default=LOG_FILE, help="status log history file")
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="print how long each startup phase took and quit",
+    )
+    parser.add_argument(
+        "--startup-budget", type=float, metavar="SECONDS",
+        help="quit once started, with status 1 when the window took longer than this to become usable",
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(
+        isolated=args.isolated,
+        metrics=not args.no_metrics,
+        metrics_file=args.metrics_file,
+        metrics_port=args.metrics_port,
+        metrics_format=args.metrics_format,
+        log_file=args.log_file,
+        profile_startup=args.profile_startup,
+        startup_budget=args.startup_budget,
+    )))
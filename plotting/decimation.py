@@ -0,0 +1,198 @@
+"""
+Level-of-detail store for the live plot.
+
+Drawing every raw point of a long window pushes hundreds of thousands of
+vertices through Agg per frame, for a plot a few hundred pixels wide. The
+store keeps, next to the raw samples, a pyramid of min/max summaries (level k
+holds one entry per factor**k samples) that is extended as samples arrive.
+A view for N pixels reads the coarsest level that still has at least N entries
+in the visible span and reduces it to one min and one max per pixel, so the
+cost of a frame depends on the plot width, not the number of samples, and a
+single-sample spike still shows up.
+
+NaN rows (line breaks, e.g. across a reconnect) propagate through the
+minima/maxima, so the break stays visible at every level.
+"""
+import numpy as np
+
+from core.ring_buffer import RingBuffer
+
+# samples summarised by one entry of the next level
+DEFAULT_FACTOR = 8
+
+# views this many points per pixel or less are drawn from the raw samples
+RAW_POINTS_PER_PIXEL = 2
+
+
+def minmax_buckets(times, low, high, buckets):
+    """
+    Reduce time-sorted entries to at most `buckets` equal-width time buckets,
+    keeping the minimum and maximum of each.
+
+    times: (N,) entry times
+    low / high: (N, C) per-entry minima and maxima (the same array for raw samples)
+    Returns (bucket_times, minima, maxima), the time being the first entry's of each bucket.
+    """
+    if len(times) == 0:
+        return times, low, high
+
+    span = times[-1] - times[0]
+    if span <= 0:
+        index = np.zeros(len(times), dtype=np.intp)
+    else:
+        index = ((times - times[0]) * (buckets / span)).astype(np.intp)
+        np.minimum(index, buckets - 1, out=index)
+
+    starts = np.flatnonzero(np.diff(index, prepend=-1))
+    # minimum/maximum (not fmin/fmax) so NaN line breaks survive the reduction
+    return times[starts], np.minimum.reduceat(low, starts), np.maximum.reduceat(high, starts)
+
+
+def interleave(times, minima, maxima):
+    """
+    Two points per bucket, min then max at the bucket time, so the line draws
+    the bucket's full range as a vertical stroke.
+    """
+    points = np.empty((2 * len(times), minima.shape[1]))
+    points[0::2] = minima
+    points[1::2] = maxima
+    return np.repeat(times, 2), points
+
+
+class LevelOfDetail:
+    """
+    RingBuffer of raw samples plus a min/max pyramid over its value columns.
+    Drop-in for the plot's RingBuffer: extend(), clear() and view(), the
+    latter taking the plot width in pixels.
+
+    columns: time column first, then the value columns, e.g. ("t", "x", "y", "z")
+    capacity: raw samples kept
+    window: optional time span shown by view() (same units as the time column)
+    factor: raw samples per level-1 entry, level-1 entries per level-2 entry, ...
+    """
+
+    def __init__(self, columns, capacity, window=None, factor=DEFAULT_FACTOR):
+        if factor < 2:
+            raise ValueError("factor must be at least 2")
+
+        self.time_column, *self.value_columns = columns
+        self.window = window
+        self.factor = int(factor)
+
+        self.raw = RingBuffer(columns, capacity, window=window)
+
+        # level k (k >= 1) entries: start/end time and min/max of every value column
+        summary_columns = ["t", "t_end"]
+        for name in self.value_columns:
+            summary_columns += [name + "_min", name + "_max"]
+
+        self.levels = [self.raw]
+        size = int(capacity)
+        while size >= self.factor * self.factor:
+            size //= self.factor
+            self.levels.append(RingBuffer(summary_columns, size + 1))
+
+        # entries of level k - 1 (by its total) already summarised into level k
+        self._consumed = [0] * len(self.levels)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def clear(self):
+        for level in self.levels:
+            level.clear()
+        for k in range(1, len(self.levels)):
+            self._consumed[k] = self.levels[k - 1].total
+
+    def extend(self, **columns):
+        """
+        Append a batch of raw samples and summarise every block it completes.
+        """
+        self.raw.extend(**columns)
+        for k in range(1, len(self.levels)):
+            if not self._summarise(k):
+                break
+
+    def _summarise(self, k):
+        """
+        Fold complete blocks of level k - 1 into level k. Returns False when none completed.
+        """
+        lower = self.levels[k - 1]
+        pending = lower.total - self._consumed[k]
+        if pending > len(lower):
+            # an oversized batch overran the lower level, those entries are gone
+            self._consumed[k] += pending - len(lower)
+            pending = len(lower)
+
+        blocks = pending // self.factor
+        if not blocks:
+            return False
+
+        count = blocks * self.factor
+        end = len(lower) - pending + count
+
+        def block_view(name):
+            return lower.column(name)[end - count:end].reshape(blocks, self.factor)
+
+        if k == 1:
+            times = block_view(self.time_column)
+            summary = {"t": times[:, 0], "t_end": times[:, -1]}
+            for name in self.value_columns:
+                values = block_view(name)
+                summary[name + "_min"] = values.min(axis=1)
+                summary[name + "_max"] = values.max(axis=1)
+        else:
+            summary = {"t": block_view("t")[:, 0], "t_end": block_view("t_end")[:, -1]}
+            for name in self.value_columns:
+                summary[name + "_min"] = block_view(name + "_min").min(axis=1)
+                summary[name + "_max"] = block_view(name + "_max").max(axis=1)
+
+        self.levels[k].extend(**summary)
+        self._consumed[k] += count
+        return True
+
+    def view(self, pixels, window=None):
+        """
+        {column: array} of the visible window for a plot `pixels` wide, oldest
+        first. Short windows are the raw samples (zero-copy); longer ones hold
+        two points (min, max) per pixel.
+        window overrides the store's time window; None keeps every stored sample.
+        """
+        raw = self.raw.view(window)
+        times = raw[self.time_column]
+        pixels = max(int(pixels), 1)
+        if len(times) <= RAW_POINTS_PER_PIXEL * pixels:
+            return raw
+
+        # coarsest level that still has an entry per pixel
+        k = int(np.log(len(times) / pixels) / np.log(self.factor))
+        k = min(max(k, 1), len(self.levels) - 1)
+        while k > 0 and not len(self.levels[k]):
+            k -= 1
+        if k == 0:
+            return raw
+
+        level = self.levels[k]
+        start_time = times[0]
+        starts = level.column("t")
+        first = int(np.searchsorted(starts, start_time, side="left"))
+        last_end = level.column("t_end")[-1]
+
+        # raw samples newer than the level's last complete block
+        tail = int(np.searchsorted(times, last_end, side="right"))
+
+        block_times = np.concatenate((starts[first:], times[tail:]))
+        low = np.concatenate((
+            np.column_stack([level.column(name + "_min")[first:] for name in self.value_columns]),
+            np.column_stack([raw[name][tail:] for name in self.value_columns]),
+        ))
+        high = np.concatenate((
+            np.column_stack([level.column(name + "_max")[first:] for name in self.value_columns]),
+            np.column_stack([raw[name][tail:] for name in self.value_columns]),
+        ))
+
+        bucket_times, points = interleave(*minmax_buckets(block_times, low, high, pixels))
+        view = {self.time_column: bucket_times}
+        for index, name in enumerate(self.value_columns):
+            view[name] = points[:, index]
+        return view
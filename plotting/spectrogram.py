@@ -0,0 +1,63 @@
+import numpy as np
+from PySide6.QtCore import QTimer
+
+from core.spectral import dominant_peaks
+
+# spectrogram redraw period; a frame arrives every hop samples (64 ms at 1 kHz by default)
+SPECTROGRAM_INTERVAL_MS = 250
+
+# dynamic range shown (dB below the strongest bin)
+DYNAMIC_RANGE_DB = 60.0
+
+# floor keeping log10 finite for empty rows
+_POWER_FLOOR = 1e-20
+
+
+def plot_spectrogram(ax, canvas, stage, device_selector=None, interval_ms=SPECTROGRAM_INTERVAL_MS):
+    """
+    Show the SpectralStage's spectrogram of the selected device on ax, with its
+    dominant frequencies in the title, refreshed every interval_ms.
+
+    device_selector: optional callable returning the device to show; by
+    default the first device analysed.
+
+    Returns the QTimer driving the updates.
+    """
+    ax.clear()
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Frequency (Hz)")
+    ax.set_title("Spectrogram (waiting for data)")
+    image = None
+    shown = None  # (rate, hop, history, bins) the image is laid out for
+
+    def update():
+        nonlocal image, shown
+        snapshot = stage.snapshot(device_selector() if device_selector else None)
+        if snapshot is None:
+            return
+
+        history, bins = snapshot.spectrogram.shape
+        levels = 10.0 * np.log10(np.maximum(snapshot.spectrogram.T, _POWER_FLOOR))
+        top = float(levels.max())
+
+        layout = (snapshot.rate, snapshot.hop, history, bins)
+        if image is None or layout != shown:
+            span = history * snapshot.hop / snapshot.rate
+            extent = (-span, 0.0, 0.0, snapshot.rate / 2.0)
+            if image is None:
+                image = ax.imshow(levels, origin="lower", aspect="auto", extent=extent, cmap="viridis")
+            else:
+                image.set_extent(extent)
+            shown = layout
+        image.set_data(levels)
+        image.set_clim(top - DYNAMIC_RANGE_DB, top)
+
+        peaks = ", ".join(f"{frequency:.1f}" for frequency, _ in dominant_peaks(snapshot))
+        x, y, z = snapshot.dominant
+        ax.set_title(f"Dominant: x {x:.1f} Hz, y {y:.1f} Hz, z {z:.1f} Hz  |  peaks {peaks} Hz", fontsize="small")
+        canvas.draw_idle()
+
+    timer = QTimer(canvas)
+    timer.timeout.connect(update)
+    timer.start(interval_ms)
+    return timer
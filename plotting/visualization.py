@@ -1,14 +1,20 @@
-import matplotlib.pyplot as plt
 import collections
 import numpy as np
-from ahrs.filters import Madgwick
-from ahrs.common.orientation import q2euler
-from math import atan2, sqrt, pi, radians
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import Qt, QTimer
 import asyncio
-import csv
+import time
 
-MAX_NUM_DATA_PLOT = 100
+from core.samples import as_batch, item_device, item_gap
+from core.ring_buffer import RingBuffer
+from core.metrics import METRICS, SIZE_BUCKETS
+from core.timing import CounterUnwrapper
+from plotting.decimation import LevelOfDetail
+
+# number of samples kept for the live plot
+MAX_NUM_DATA_PLOT = 5000
+
+# live plot redraw period (~40 FPS)
+FRAME_INTERVAL_MS = 25
 
 
 async def test_loop(ax, canvas, data_queue):
@@ -32,75 +38,294 @@ async def test_loop(ax, canvas, data_queue):
     timer.timeout.connect(foo)
     timer.start(50)
 
+class FrameCounter:
+    """
+    Frame-time statistics for the live plot.
+    Ticks are the timer callbacks (ingest + artist update), frames are actual
+    canvas draws reported by matplotlib's draw_event.
+    """
+
+    def __init__(self, history=120):
+        self.ticks = 0
+        self.frames = 0
+        self.samples = 0
+        self.last_samples_per_tick = 0
+        self.last_tick_time = 0.0
+        self.max_tick_time = 0.0
+        self.total_tick_time = 0.0
+        self._frame_times = collections.deque(maxlen=history)
+
+        self._tick_metric = METRICS.histogram("imu_plot_frame_seconds", "Live plot update time per frame")
+        self._samples_metric = METRICS.histogram(
+            "imu_plot_samples_per_frame", "Samples consumed per live plot frame", buckets=SIZE_BUCKETS
+        )
+
+    def record_tick(self, duration, num_samples):
+        self._tick_metric.observe(duration)
+        self._samples_metric.observe(num_samples)
+        self.ticks += 1
+        self.samples += num_samples
+        self.last_samples_per_tick = num_samples
+        self.last_tick_time = duration
+        self.total_tick_time += duration
+        if duration > self.max_tick_time:
+            self.max_tick_time = duration
+
+    def record_frame(self, _event=None):
+        self.frames += 1
+        self._frame_times.append(time.perf_counter())
+
+    def fps(self):
+        """
+        Frames per second over the recent frame history.
+        """
+        if len(self._frame_times) < 2:
+            return 0.0
+        span = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / span if span > 0 else 0.0
+
+
+def _drain_queue(data_queue):
+    """
+    Take every pending item off the queue.
+    """
+    items = []
+    while True:
+        try:
+            items.append(data_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            return items
+
+
+def _join_batches(items):
+    """
+    Merge queue items into one batch (or None).
+    """
+    if not items:
+        return None
+    if len(items) == 1:
+        return as_batch(items[0])
+    return np.concatenate([as_batch(item) for item in items])
+
+
+def _split_at_gaps(items):
+    """
+    Merge queue items of one device into (gap, batch) runs, a new run starting
+    at every item that follows a reconnect.
+    """
+    runs = []
+    for item in items:
+        gap = item_gap(item)
+        if gap is not None or not runs:
+            runs.append((gap, []))
+        runs[-1][1].append(item)
+    return [(gap, _join_batches(run)) for gap, run in runs]
+
+
 ## --- 2d plotting ---
-async def plot_2d_data(ax, canvas, data_queue):
-    # data lists to store timestamps and x, y, z values
-    xdata, ydata, zdata = [], [], []
-    timestamp = []
+async def plot_2d_data(
+    ax,
+    canvas,
+    data_queue,
+    capacity=MAX_NUM_DATA_PLOT,
+    window=None,
+    frame_interval_ms=FRAME_INTERVAL_MS,
+    blit=True,
+    recorder=None,
+    device_selector=None,
+    lod=True,
+):
+    """
+    capacity: maximum number of samples kept for plotting
+    window: optional time span (ms) shown, None shows every kept sample
+    frame_interval_ms: redraw period; every pending sample is consumed per frame,
+    so the frame rate does not depend on the sample rate.
+    blit: only redraw the lines over a cached background while the axes limits
+    hold; a full draw_idle() happens when the limits have to move.
+    recorder: optional BinaryRecorder every drained batch is handed to; the
+    writing happens on the recorder's own thread.
+    device_selector: optional callable returning the address of the device to
+    plot; by default the first device seen is plotted. Every device is recorded.
+    lod: draw long windows decimated to min/max per pixel (plotting.decimation)
+    instead of every raw sample.
+
+    Returns the FrameCounter tracking the render loop.
+    """
+    blit = blit and getattr(canvas, "supports_blit", False)
+    # fixed-memory store of timestamps and x, y, z values
+    if lod:
+        samples = LevelOfDetail(("t", "x", "y", "z"), capacity, window=window)
+    else:
+        samples = RingBuffer(("t", "x", "y", "z"), capacity, window=window)
     first_time_unit = 0
 
+    # device time stamps are a wrapping counter
+    unwrapper = CounterUnwrapper()
+
     # to check if this is the first reading we get
     initial_reading = True
-
-    # Create/open CSV file and write header
-    csv_file = open("accel_log.csv", "w", newline="")
-    csv_writer = csv.writer(csv_file)
-    csv_writer.writerow(["time", "accel_x", "accel_y", "accel_z"])
+    last_time = 0.0
+
+    # device currently shown
+    plotted_device = None
+
+    # Persistent artists, updated in place every frame
+    ax.clear()
+    line_x, = ax.plot([], [], label="X-axes", color="r", animated=blit)
+    line_y, = ax.plot([], [], label="Y-axes", color="g", animated=blit)
+    line_z, = ax.plot([], [], label="Z-axes", color="b", animated=blit)
+    lines = (line_x, line_y, line_z)
+
+    ax.set_xlabel('Time (ms)')  # Label for x-axis
+    ax.set_ylabel('Values')  # Label for y-axis
+    ax.set_title('Real-Time Plot of acceleration in x, y, z, axis')  # Title of the plot
+    ax.legend(loc="upper left")  # Show legend
+
+    counter = FrameCounter()
+    background = None
+
+    def draw_lines():
+        for line in lines:
+            ax.draw_artist(line)
+
+    def blit_lines():
+        canvas.restore_region(background)
+        draw_lines()
+        canvas.blit(ax.bbox)
+
+    def on_draw(event):
+        nonlocal background
+        counter.record_frame(event)
+        if blit:
+            # full redraw (new limits, resize): cache the static parts, then add the
+            # lines to the buffer that is about to be painted
+            background = canvas.copy_from_bbox(ax.bbox)
+            draw_lines()
+
+    canvas.mpl_connect("draw_event", on_draw)
+
+    def limits_for(times, low, high):
+        """
+        Return new (xlim, ylim) when the data left the current limits, else None.
+        Limits get headroom so a full redraw is only needed every so often.
+        """
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        if times[0] >= x0 and times[-1] <= x1 and low >= y0 and high <= y1:
+            return None
+
+        span = max(times[-1] - times[0], 1.0)
+        if window is not None:
+            span = max(span, window)
+        xlim = (times[0], times[0] + span * 1.25)
+
+        margin = (high - low) * 0.25 or 0.5
+        ylim = (min(low - margin, y0), max(high + margin, y1))
+        if high - low < (ylim[1] - ylim[0]) * 0.25:
+            # data range shrank a lot, tighten instead of keeping stale headroom
+            ylim = (low - margin, high + margin)
+        return xlim, ylim
 
     # Set up QTimer to periodically update the plot
     def update_plot():
-        nonlocal xdata, ydata, zdata, timestamp, first_time_unit, initial_reading
+        nonlocal first_time_unit, initial_reading, plotted_device, last_time
+        tick_start = time.perf_counter()
         try:
-            if not data_queue.empty():
-                # Get data
-                data = data_queue.get_nowait()
-                accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, t = data
+            # Get every pending item (single tuples and decoded batches, any device)
+            items = _drain_queue(data_queue)
+            if not items:
+                return
+
+            # Hand every item to the background recorder
+            if recorder is not None:
+                for item in items:
+                    recorder.submit(item)
+
+            # Keep only the selected device
+            selected = device_selector() if device_selector else None
+            if selected is None:
+                selected = plotted_device if plotted_device is not None else item_device(items[0])
+            if selected != plotted_device:
+                plotted_device = selected
+                samples.clear()
+                unwrapper.reset()
+                initial_reading = True
+
+            selected_items = [item for item in items if item_device(item) == selected]
+            if not selected_items:
+                return
+
+            num_samples = 0
+            for gap, batch in _split_at_gaps(selected_items):
+                if gap is not None and not initial_reading:
+                    # the device counter may have restarted: continue the time axis
+                    # across the outage (ms) and break the lines there
+                    unwrapper.reset()
+                    t = unwrapper.unwrap(batch["t"])
+                    first_time_unit = int(t[0]) - (last_time + gap * 1000.0)
+                    samples.extend(t=[last_time], x=[np.nan], y=[np.nan], z=[np.nan])
+                else:
+                    t = unwrapper.unwrap(batch["t"])
 
                 # Mark the initial reading
                 if initial_reading:
                     initial_reading = False
-                    first_time_unit = t
+                    first_time_unit = int(t[0])
 
                 # get relative time
                 rel_time = t - first_time_unit
-                
-                # Append the data to respective lists for plotting
-                timestamp.append(rel_time)
-                xdata.append(accel_x)
-                ydata.append(accel_y)
-                zdata.append(accel_z)
-
-                # ⭐ Write directly to CSV (no RAM accumulation)
-                csv_writer.writerow([rel_time, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z])
-                
-                # Clear the plot to redraw it with the updated data
-                ax.clear()
-                
-                # Plot x, y, z values with respect to time (timestamp)
-                ax.plot(timestamp, xdata, label="X-axes", color="r")
-                ax.plot(timestamp, ydata, label="Y-axes", color="g")
-                ax.plot(timestamp, zdata, label="Z-axes", color="b")
-                
-                ax.set_xlabel('Time (ms)')  # Label for x-axis
-                ax.set_ylabel('Values')  # Label for y-axis
-                ax.set_title('Real-Time Plot of acceleration in x, y, z, axis')  # Title of the plot
-                
-                ax.legend()  # Show legend
-                
-                canvas.draw()  # Redraw the plot
+                last_time = float(rel_time[-1])
+                num_samples += len(batch)
+
+                # Append the data to the sample store for plotting
+                samples.extend(t=rel_time, x=batch["ax"], y=batch["ay"], z=batch["az"])
+
+            # Update the existing lines with the visible window
+            visible = samples.view(ax.bbox.width) if lod else samples.view()
+            times = visible["t"]
+            line_x.set_data(times, visible["x"])
+            line_y.set_data(times, visible["y"])
+            line_z.set_data(times, visible["z"])
+
+            # Fit the axes to the window without a full relim over the artists
+            low = min(np.nanmin(visible["x"]), np.nanmin(visible["y"]), np.nanmin(visible["z"]))
+            high = max(np.nanmax(visible["x"]), np.nanmax(visible["y"]), np.nanmax(visible["z"]))
+            limits = limits_for(times, low, high)
+
+            if limits is not None:
+                ax.set_xlim(*limits[0])
+                ax.set_ylim(*limits[1])
+                canvas.draw_idle()  # Full redraw on the next idle Qt cycle
+            elif blit and background is not None:
+                blit_lines()
+                counter.record_frame()
+            else:
+                canvas.draw_idle()
+
+            counter.record_tick(time.perf_counter() - tick_start, num_samples)
         except Exception as e:
             print(f"Plot update error: {e}")
-    
-    # Set up QTimer to update the plot periodically (e.g., every 50ms)
+
+    # Set up QTimer to update the plot at the frame rate
     timer = QTimer(canvas)
+    timer.setTimerType(Qt.PreciseTimer)
     timer.timeout.connect(update_plot)
-    timer.start(10)  # Update every 25ms
+    timer.start(frame_interval_ms)
+
+    # Ensure the recording is flushed when the window closes
+    if recorder is not None:
+        canvas.destroyed.connect(lambda: recorder.stop())
 
-    # Ensure file closes when the window closes
-    canvas.destroyed.connect(lambda: csv_file.close())
+    return counter
 
 
 
+# 3D view, not in use; needs these imports when re-enabled:
+# from math import atan2, sqrt, pi, radians
+# import matplotlib.pyplot as plt
+# from ahrs.filters import Madgwick
+# from ahrs.common.orientation import q2euler
+#
 # def rotate_to_world_frame(ax, ay, az, pitch_deg, roll_deg):
 #     pitch = radians(pitch_deg)
 #     roll = radians(roll_deg)
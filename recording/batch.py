@@ -0,0 +1,494 @@
+"""
+Batch processing of recorded sessions: run the offline pipeline over every
+session found in one or more directories, one worker process per session.
+
+Sessions are legacy accel_log.csv-style logs and binary recordings (.imu,
+.imuz); the rotated segments of one recording (<name>_000.imu, <name>_001.imu,
+...) form one session. Each session is streamed in chunks, so memory stays
+flat whatever its length, through the steps selected with --steps:
+
+    timestamps   unwrap the device counter, seconds, gaps and missing samples
+    fusion       orientation filter and world-frame acceleration (core.fusion)
+    integration  velocity and position from the world-frame acceleration (core.kinematics)
+    summary      per-channel statistics
+
+Results go to the output directory: <session>.json per session (plus the
+per-sample trajectory in <session>.traj.csv with --trajectory) and report.json
+over all sessions. A session whose result is already there for the same
+source files and settings is skipped, so an interrupted run resumes where it
+stopped; --force processes everything again.
+
+Usage:
+    python -m recording.batch DIR [DIR ...] [-o results] [--jobs N]
+                              [--steps timestamps,fusion,integration,summary]
+                              [--filter madgwick] [--method trapezoid] [--zupt]
+                              [--chunk 65536] [--trajectory] [--force]
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from core.fusion import FILTER_MADGWICK, FILTERS, FusionStage
+from core.kinematics import METHOD_TRAPEZOID, METHODS, STANDARD_GRAVITY, KinematicsIntegrator, detect_stationary
+from core.timing import DeviceClock
+from recording.compressed import FILE_EXTENSION as COMPRESSED_EXTENSION
+from recording.format import FILE_EXTENSION as BINARY_EXTENSION
+from recording.reader import DEFAULT_CHUNK, Session, iter_csv_chunks
+
+STEP_TIMESTAMPS = "timestamps"
+STEP_FUSION = "fusion"
+STEP_INTEGRATION = "integration"
+STEP_SUMMARY = "summary"
+
+STEPS = (STEP_TIMESTAMPS, STEP_FUSION, STEP_INTEGRATION, STEP_SUMMARY)
+
+# step -> step it needs
+STEP_REQUIRES = {STEP_FUSION: STEP_TIMESTAMPS, STEP_INTEGRATION: STEP_FUSION}
+
+CHANNELS = ("ax", "ay", "az", "gx", "gy", "gz")
+
+REPORT_NAME = "report.json"
+
+# trailing samples that must all be at rest for a zero-velocity update
+ZUPT_WINDOW = 50
+
+# <name>_<segment> of a rotated recording segment (recording.recorder)
+_SEGMENT = re.compile(r"^(?P<name>.+)_\d{3,}$")
+
+# name for the one stream of a session inside the fusion stage
+_DEVICE = "session"
+
+
+# ------------------------------------------------------
+# Session discovery
+# ------------------------------------------------------
+def find_sessions(roots):
+    """
+    Sessions below the given directories (or files), as {name: [paths]}.
+    Names are relative to their root, with "__" for directory separators, so
+    day1/accel_log.csv and day2/accel_log.csv stay apart.
+    """
+    sessions = {}
+    for root in roots:
+        if os.path.isfile(root):
+            files = [(os.path.dirname(root), os.path.basename(root))]
+            base = os.path.dirname(root)
+        else:
+            files = [(directory, name) for directory, _, names in os.walk(root) for name in names]
+            base = root
+
+        for directory, filename in files:
+            stem, extension = os.path.splitext(filename)
+            extension = extension.lower()
+            if extension == ".csv":
+                if stem.endswith(".traj"):
+                    continue  # our own --trajectory output
+                name = stem
+            elif extension in (BINARY_EXTENSION, COMPRESSED_EXTENSION):
+                match = _SEGMENT.match(stem)
+                name = match.group("name") if match else stem
+            else:
+                continue
+            relative = os.path.relpath(os.path.join(directory, name), base)
+            key = relative.replace(os.sep, "__")
+            sessions.setdefault(key, []).append(os.path.join(directory, filename))
+
+    # segment numbers are zero padded, so name order is recording order
+    return {name: sorted(paths) for name, paths in sorted(sessions.items())}
+
+
+def iter_session_chunks(paths, chunk_size=DEFAULT_CHUNK):
+    """
+    Yield SAMPLE_DTYPE chunks of a session without loading it whole.
+    """
+    for path in paths:
+        if path.lower().endswith(".csv"):
+            yield from iter_csv_chunks(path, chunk_size)
+        else:
+            yield from Session.open([path]).iter_chunks(chunk_size)
+
+
+def fingerprint(paths):
+    """
+    What a result was computed from: name, size and modification time of every file.
+    """
+    return [[os.path.basename(path), os.path.getsize(path), os.stat(path).st_mtime_ns] for path in paths]
+
+
+# ------------------------------------------------------
+# Per-session pipeline
+# ------------------------------------------------------
+class RunningStats:
+    """
+    Count, mean, standard deviation, min and max of named columns, merged
+    chunk by chunk (Chan et al.), so no chunk needs to stay in memory.
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.count = 0
+        self._mean = np.zeros(len(self.names))
+        self._m2 = np.zeros(len(self.names))
+        self._min = np.full(len(self.names), np.inf)
+        self._max = np.full(len(self.names), -np.inf)
+
+    def update(self, columns):
+        """
+        columns: (n, k) values, in the order of names
+        """
+        columns = np.asarray(columns, dtype=np.float64)
+        n = len(columns)
+        if not n:
+            return
+        mean = columns.mean(axis=0)
+        m2 = ((columns - mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = mean - self._mean
+        self._mean += delta * (n / total)
+        self._m2 += m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+        np.minimum(self._min, columns.min(axis=0), out=self._min)
+        np.maximum(self._max, columns.max(axis=0), out=self._max)
+
+    def result(self):
+        if not self.count:
+            return {}
+        std = np.sqrt(self._m2 / self.count)
+        return {
+            name: {
+                "mean": float(self._mean[i]),
+                "std": float(std[i]),
+                "min": float(self._min[i]),
+                "max": float(self._max[i]),
+            }
+            for i, name in enumerate(self.names)
+        }
+
+
+class SessionProcessor:
+    """
+    The selected steps for one session, fed chunk by chunk.
+
+    steps: subset of STEPS
+    filter_name: fusion filter ("madgwick" or "complementary")
+    method: integration method ("trapezoid" or "simpson")
+    zupt: reset the velocity while the sensor is at rest
+    time_scale: seconds per device time stamp tick (stamps are in ms)
+    """
+
+    def __init__(self, steps=STEPS, filter_name=FILTER_MADGWICK, method=METHOD_TRAPEZOID, zupt=False,
+                 time_scale=1e-3):
+        check_steps(steps)
+        self.steps = tuple(step for step in STEPS if step in steps)
+        self.zupt = zupt
+        self.samples = 0
+        self.first_time = None
+        self.last_time = None
+        self.euler = None
+
+        self.clock = None
+        self.fusion = None
+        self.integrator = None
+        if STEP_FUSION in self.steps:
+            # the fusion stage reconstructs the time stamps itself
+            self.fusion = FusionStage(filter_name, time_scale=time_scale)
+        elif STEP_TIMESTAMPS in self.steps:
+            self.clock = DeviceClock(tick=time_scale)
+        if STEP_INTEGRATION in self.steps:
+            self.integrator = KinematicsIntegrator(method)
+
+        self.channel_stats = RunningStats(CHANNELS) if STEP_SUMMARY in self.steps else None
+        self.speed_stats = RunningStats(("speed",)) if self.integrator and self.channel_stats else None
+
+    @property
+    def trajectory_columns(self):
+        columns = ["t"]
+        if self.fusion:
+            columns += ["roll", "pitch", "yaw"]
+        if self.integrator:
+            columns += ["vx", "vy", "vz", "px", "py", "pz"]
+        return columns
+
+    def process(self, batch):
+        """
+        Run the steps over the next chunk. Returns the chunk's trajectory as an
+        (n, len(trajectory_columns)) array, None when there is none.
+        """
+        self.samples += len(batch)
+        if self.channel_stats:
+            self.channel_stats.update(np.stack([batch[name] for name in CHANNELS], axis=-1))
+
+        seconds = None
+        trajectory = None
+        if self.fusion:
+            result = self.fusion.fuse(_DEVICE, batch)
+            if result is None:
+                return None
+            # the first sample of the session only sets the time base
+            batch = batch[len(batch) - len(result):]
+            seconds, gaps = result.t, result.gaps
+            self.euler = result.euler[-1]
+            trajectory = [seconds[:, None], result.euler]
+            if self.integrator:
+                trajectory += self._integrate(result.world_accel, seconds, gaps, batch)
+        elif self.clock:
+            seconds, _, _ = self.clock.update(batch["t"])
+
+        if seconds is not None and len(seconds):
+            self.first_time = float(seconds[0]) if self.first_time is None else self.first_time
+            self.last_time = float(seconds[-1])
+        return np.hstack(trajectory) if trajectory else None
+
+    def _integrate(self, world_accel, seconds, gaps, batch):
+        stationary = None
+        if self.zupt:
+            accel = np.stack([batch[name] for name in CHANNELS[:3]], axis=-1) * STANDARD_GRAVITY
+            gyro = np.radians(np.stack([batch[name] for name in CHANNELS[3:]], axis=-1))
+            stationary = detect_stationary(accel, gyro, window=ZUPT_WINDOW)
+
+        # the motion during a gap is unknown: integrate the runs between gaps,
+        # carrying the velocity across
+        velocity, position = [], []
+        bounds = [0] + [int(s) for s in np.flatnonzero(gaps) if s > 0] + [len(seconds)]
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            if gaps[begin]:
+                self.integrator.reset(self.integrator.velocity.copy())
+            run = self.integrator.update(
+                world_accel[begin:end], seconds[begin:end], None if stationary is None else stationary[begin:end]
+            )
+            velocity.append(run[0])
+            position.append(run[1])
+        velocity = np.concatenate(velocity)
+        if self.speed_stats:
+            self.speed_stats.update(np.linalg.norm(velocity, axis=1)[:, None])
+        return [velocity, np.concatenate(position)]
+
+    def summary(self):
+        summary = {"samples": self.samples, "steps": list(self.steps)}
+        if self.first_time is not None:
+            summary["duration_s"] = self.last_time - self.first_time
+        clock = self.clock or (self.fusion and self.fusion.clock(_DEVICE))
+        if clock:
+            timing = clock.stats()
+            summary["rate_hz"] = 1.0 / timing["period"] if timing["period"] else None
+            summary["gaps"] = timing["gaps"]
+            summary["missing"] = timing["missing"]
+        if self.euler is not None:
+            summary["final_euler_deg"] = self.euler.tolist()
+        if self.integrator:
+            summary["final_velocity"] = self.integrator.velocity.tolist()
+            summary["final_position"] = self.integrator.position.tolist()
+        if self.channel_stats:
+            summary["channels"] = self.channel_stats.result()
+        if self.speed_stats:
+            summary["speed"] = self.speed_stats.result().get("speed")
+        return summary
+
+
+def check_steps(steps):
+    for step in steps:
+        if step not in STEPS:
+            raise ValueError(f"Unknown step: {step}")
+        required = STEP_REQUIRES.get(step)
+        if required and required not in steps:
+            raise ValueError(f"Step {step} needs {required}")
+
+
+# ------------------------------------------------------
+# Running sessions
+# ------------------------------------------------------
+def result_path(output, name):
+    return os.path.join(output, name + ".json")
+
+
+def load_result(output, name):
+    try:
+        with open(result_path(output, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_done(result, source, config):
+    return result is not None and result.get("status") == "ok" and \
+        result.get("source") == source and result.get("config") == config
+
+
+def _write_json(path, data):
+    # write then rename, so an interrupted run never leaves a half result behind
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temporary, path)
+
+
+def process_session(name, paths, config, output):
+    """
+    Process one session and write its result. Runs in a worker process.
+    config: {"steps", "filter", "method", "zupt", "chunk", "trajectory"}
+    Returns the result dict (also written to <output>/<name>.json).
+    """
+    started = time.perf_counter()
+    result = {"session": name, "paths": paths, "source": fingerprint(paths), "config": config}
+    trajectory_path = os.path.join(output, name + ".traj.csv")
+    try:
+        processor = SessionProcessor(config["steps"], config["filter"], config["method"], config["zupt"])
+        trajectory_file = None
+        if config["trajectory"] and processor.fusion:
+            trajectory_file = open(trajectory_path + ".tmp", "w", newline="")
+            trajectory_file.write(",".join(processor.trajectory_columns) + "\n")
+        try:
+            for batch in iter_session_chunks(paths, config["chunk"]):
+                trajectory = processor.process(batch)
+                if trajectory_file and trajectory is not None:
+                    np.savetxt(trajectory_file, trajectory, delimiter=",", fmt="%.7g")
+        except Exception:
+            if trajectory_file:
+                trajectory_file.close()
+                os.remove(trajectory_path + ".tmp")
+            raise
+        if trajectory_file:
+            trajectory_file.close()
+            os.replace(trajectory_path + ".tmp", trajectory_path)
+            result["trajectory"] = trajectory_path
+        result["summary"] = processor.summary()
+        result["status"] = "ok"
+    except Exception as e:
+        # reported, and retried by the next run
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed_s"] = time.perf_counter() - started
+    _write_json(result_path(output, name), result)
+    return result
+
+
+def run_batch(roots, output, config, jobs=None, force=False, progress=None):
+    """
+    Process every session below roots that has no up-to-date result in output,
+    jobs sessions at a time (default: one per CPU), then write the report.
+    progress: optional callable(done, total, result) after each session
+    Returns the report dict (also written to <output>/report.json).
+    """
+    check_steps(config["steps"])
+    os.makedirs(output, exist_ok=True)
+    started = time.perf_counter()
+    sessions = find_sessions(roots)
+
+    results = {}
+    pending = []
+    for name, paths in sessions.items():
+        previous = load_result(output, name)
+        if not force and is_done(previous, fingerprint(paths), config):
+            results[name] = previous
+        else:
+            pending.append(name)
+    skipped = len(results)
+
+    # largest first, so a long session does not start last and hold up the run
+    pending.sort(key=lambda name: sum(os.path.getsize(path) for path in sessions[name]), reverse=True)
+    jobs = min(jobs or os.cpu_count() or 1, max(len(pending), 1))
+
+    def finished(result):
+        results[result["session"]] = result
+        if progress:
+            progress(len(results) - skipped, len(pending), result)
+
+    if jobs == 1:
+        for name in pending:
+            finished(process_session(name, sessions[name], config, output))
+    else:
+        # spawned workers, like the acquisition process: no inherited Qt or Bluetooth state
+        context = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(jobs, mp_context=context) as pool:
+            futures = [pool.submit(process_session, name, sessions[name], config, output) for name in pending]
+            for future in concurrent.futures.as_completed(futures):
+                finished(future.result())
+
+    report = make_report([results[name] for name in sessions], skipped, jobs, time.perf_counter() - started)
+    _write_json(os.path.join(output, REPORT_NAME), report)
+    return report
+
+
+def make_report(results, skipped, jobs, elapsed):
+    """
+    Totals over all sessions and one line per session.
+    """
+    ok = [r for r in results if r["status"] == "ok"]
+    return {
+        "sessions": len(results),
+        "processed": len(results) - skipped,
+        "skipped": skipped,
+        "failed": len(results) - len(ok),
+        "jobs": jobs,
+        "elapsed_s": elapsed,
+        "samples": sum(r["summary"]["samples"] for r in ok),
+        "duration_s": sum(r["summary"].get("duration_s", 0.0) for r in ok),
+        "results": [
+            {
+                "session": r["session"],
+                "status": r["status"],
+                "error": r.get("error"),
+                "samples": r.get("summary", {}).get("samples"),
+                "duration_s": r.get("summary", {}).get("duration_s"),
+                "rate_hz": r.get("summary", {}).get("rate_hz"),
+                "gaps": r.get("summary", {}).get("gaps"),
+                "missing": r.get("summary", {}).get("missing"),
+                "final_position": r.get("summary", {}).get("final_position"),
+                "max_speed": (r.get("summary", {}).get("speed") or {}).get("max"),
+                "processing_s": r.get("elapsed_s"),
+            }
+            for r in results
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("roots", nargs="+", help="directories (or files) holding the sessions")
+    parser.add_argument("-o", "--output", default="results", help="result directory")
+    parser.add_argument("--jobs", type=int, help="sessions processed at once (default: one per CPU)")
+    parser.add_argument("--steps", default=",".join(STEPS), help="comma separated, from: " + ", ".join(STEPS))
+    parser.add_argument("--filter", choices=FILTERS, default=FILTER_MADGWICK, help="fusion filter")
+    parser.add_argument("--method", choices=METHODS, default=METHOD_TRAPEZOID, help="integration method")
+    parser.add_argument("--zupt", action="store_true", help="zero the velocity while the sensor is at rest")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="samples read at a time")
+    parser.add_argument("--trajectory", action="store_true", help="also write <session>.traj.csv")
+    parser.add_argument("--force", action="store_true", help="process sessions that already have a result")
+    args = parser.parse_args(argv)
+
+    steps = [step.strip() for step in args.steps.split(",") if step.strip()]
+    try:
+        check_steps(steps)
+    except ValueError as e:
+        parser.error(str(e))
+    config = {
+        "steps": [step for step in STEPS if step in steps],
+        "filter": args.filter,
+        "method": args.method,
+        "zupt": args.zupt,
+        "chunk": args.chunk,
+        "trajectory": args.trajectory,
+    }
+
+    def progress(done, total, result):
+        detail = result.get("error") or f"{result['summary']['samples']} samples"
+        print(f"[{done}/{total}] {result['session']}: {result['status']} ({detail}, {result['elapsed_s']:.1f} s)")
+
+    report = run_batch(args.roots, args.output, config, args.jobs, args.force, progress)
+    print(
+        f"{report['sessions']} sessions ({report['skipped']} up to date, {report['failed']} failed), "
+        f"{report['samples']} samples in {report['elapsed_s']:.1f} s with {report['jobs']} jobs; "
+        f"report in {os.path.join(args.output, REPORT_NAME)}"
+    )
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,465 @@
+"""
+Chunked, compressed IMU recordings (.imuz), for long sessions.
+
+    8 bytes   magic b"IMUZIP1\\n"
+    4 bytes   header length (uint32, little endian)
+    N bytes   UTF-8 JSON header (recording.format.make_header plus codec,
+              chunk_samples, channels and quantization)
+    ...       chunks: a fixed chunk header, then the compressed payload
+    ...       chunk index, then a trailer pointing at it
+
+Every chunk is encoded column by column:
+  - t as its first value (in the chunk header) and the deltas, in the narrowest
+    unsigned integer type that holds them
+  - each channel as float32, or, when the header gives it a quantization step
+    and every value of the chunk fits, as int16 steps, delta encoded
+  - each column's bytes grouped by significance (byte shuffle), which is what
+    makes slowly varying values compress well
+then compressed with a stdlib codec (zlib or lzma).
+
+The index (offset, count, first and last time stamp of every chunk) lets a
+time-range read decompress only the chunks it overlaps. A file whose writer
+died before writing the index is still readable: the chunk headers are
+scanned instead, and a truncated last chunk is dropped.
+
+Usage (convert binary recordings):
+    python -m recording.compressed session_000.imu [...] [--codec lzma] [--quantize ax=0.00049 ...]
+"""
+import argparse
+import json
+import lzma
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from core.samples import SAMPLE_DTYPE
+from recording.format import layout_to_dtype, make_header
+
+MAGIC = b"IMUZIP1\n"
+INDEX_MAGIC = b"IMUZIDX\n"
+FORMAT_VERSION = 1
+FILE_EXTENSION = ".imuz"
+
+CODEC_ZLIB = "zlib"
+CODEC_LZMA = "lzma"
+CODECS = (CODEC_ZLIB, CODEC_LZMA)
+
+# samples per chunk: the unit of compression and of random access
+DEFAULT_CHUNK_SAMPLES = 8192
+
+# zlib level / lzma preset
+DEFAULT_LEVEL = 6
+
+# channels: every field but the time stamp
+CHANNELS = tuple(name for name in SAMPLE_DTYPE.names if name != "t")
+
+# channel encodings in the chunk header
+_FLOAT32 = 0
+_INT16_DELTA = 1
+
+_LENGTH = struct.Struct("<I")
+# payload length, sample count, first and last time stamp, time delta width, one encoding per channel
+_CHUNK = struct.Struct(f"<IIQQB{len(CHANNELS)}B")
+# index offset, chunk count, magic
+_TRAILER = struct.Struct("<QI8s")
+
+_INDEX_DTYPE = np.dtype([("offset", "<u8"), ("count", "<u4"), ("t_first", "<u8"), ("t_last", "<u8")])
+
+_DELTA_TYPES = (np.dtype("<u1"), np.dtype("<u2"), np.dtype("<u4"), np.dtype("<u8"))
+
+
+def _compress(codec, data, level):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, level)
+    if codec == CODEC_LZMA:
+        return lzma.compress(data, preset=level)
+    raise ValueError(f"Unknown codec {codec!r}, expected one of {CODECS}")
+
+
+def _decompress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_LZMA:
+        return lzma.decompress(data)
+    raise ValueError(f"Unknown codec {codec!r}, expected one of {CODECS}")
+
+
+def _shuffle(values):
+    """
+    Bytes of an array grouped by significance: all first bytes, all second bytes, ...
+    """
+    return values.view(np.uint8).reshape(len(values), values.itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype, count):
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, count)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(count)
+
+
+# ------------------------------------------------------
+# Chunk encoding
+# ------------------------------------------------------
+def encode_chunk(records, codec, level, quantization):
+    """
+    records: SAMPLE_DTYPE array with non-decreasing time stamps
+    quantization: {channel: step} for channels that may be stored as int16 steps
+    Returns the chunk bytes (chunk header and compressed payload).
+    """
+    t = records["t"]
+    deltas = np.diff(t)
+    widest = int(deltas.max()) if len(deltas) else 0
+    delta_type = next(d for d in _DELTA_TYPES if widest <= np.iinfo(d).max)
+
+    parts = [_shuffle(deltas.astype(delta_type))]
+    encodings = []
+    for name in CHANNELS:
+        values = records[name]
+        step = quantization.get(name)
+        if step:
+            steps = np.rint(values / step)
+            if np.all(np.abs(steps) <= np.iinfo(np.int16).max):
+                steps = steps.astype(np.int16)
+                # wrapping int16 deltas, undone exactly by a wrapping cumulative sum
+                parts.append(_shuffle(np.diff(steps, prepend=np.int16(0))))
+                encodings.append(_INT16_DELTA)
+                continue
+        # unquantized channel, or a value out of the int16 range (or NaN): keep it exact
+        parts.append(_shuffle(values.astype("<f4")))
+        encodings.append(_FLOAT32)
+
+    payload = _compress(codec, b"".join(parts), level)
+    header = _CHUNK.pack(len(payload), len(records), int(t[0]), int(t[-1]), delta_type.itemsize, *encodings)
+    return header + payload
+
+
+def decode_chunk(chunk_header, payload, codec, quantization):
+    """
+    Inverse of encode_chunk. chunk_header is the unpacked _CHUNK tuple.
+    """
+    _, count, t_first, _, delta_size, *encodings = chunk_header
+    data = memoryview(_decompress(codec, payload))
+    records = np.empty(count, dtype=SAMPLE_DTYPE)
+
+    delta_type = next(d for d in _DELTA_TYPES if d.itemsize == delta_size)
+    position = (count - 1) * delta_size
+    deltas = _unshuffle(data[:position], delta_type, count - 1)
+    times = records["t"]
+    times[0] = t_first
+    np.cumsum(deltas, dtype=np.uint64, out=times[1:])
+    times[1:] += np.uint64(t_first)
+
+    for name, encoding in zip(CHANNELS, encodings):
+        if encoding == _INT16_DELTA:
+            end = position + 2 * count
+            steps = np.cumsum(_unshuffle(data[position:end], np.dtype("<i2"), count), dtype=np.int16)
+            records[name] = steps * quantization[name]
+        else:
+            end = position + 4 * count
+            records[name] = _unshuffle(data[position:end], np.dtype("<f4"), count)
+        position = end
+
+    return records
+
+
+# ------------------------------------------------------
+# Writing
+# ------------------------------------------------------
+class CompressedWriter:
+    """
+    Writes one .imuz file. Records are buffered until a chunk is full, so a
+    chunk's worth of samples is only on disk after the next full chunk or close().
+
+    codec: "zlib" or "lzma"
+    level: codec level (zlib 0-9, lzma preset 0-9)
+    quantization: {channel: step} of channels the device profile allows to be
+    stored as int16 multiples of step (values are rounded to the step)
+    """
+
+    def __init__(
+        self,
+        path,
+        header,
+        codec=CODEC_ZLIB,
+        level=None,
+        chunk_samples=DEFAULT_CHUNK_SAMPLES,
+        quantization=None,
+    ):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}, expected one of {CODECS}")
+
+        self.path = path
+        self.codec = codec
+        self.level = DEFAULT_LEVEL if level is None else level
+        self.chunk_samples = chunk_samples
+        self.quantization = {name: float(step) for name, step in (quantization or {}).items() if name in CHANNELS}
+
+        self.header = dict(header)
+        self.header.update({
+            "version": FORMAT_VERSION,
+            "codec": codec,
+            "chunk_samples": chunk_samples,
+            "channels": list(CHANNELS),
+            "quantization": self.quantization,
+        })
+
+        self.samples_written = 0
+        self._pending = []
+        self._pending_count = 0
+        self._index = []
+
+        self._file = open(path, "wb")
+        body = json.dumps(self.header).encode("utf-8")
+        self._file.write(MAGIC + _LENGTH.pack(len(body)) + body)
+        self.bytes_written = self._file.tell()
+
+    def write(self, records):
+        """
+        Append SAMPLE_DTYPE records. Returns the bytes written to the file by this call.
+        """
+        before = self.bytes_written
+        self._pending.append(records)
+        self._pending_count += len(records)
+        if self._pending_count >= self.chunk_samples:
+            data = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+            full = len(data) - len(data) % self.chunk_samples
+            for start in range(0, full, self.chunk_samples):
+                self._write_chunk(data[start:start + self.chunk_samples])
+            rest = data[full:]
+            self._pending = [rest] if len(rest) else []
+            self._pending_count = len(rest)
+        return self.bytes_written - before
+
+    def _write_chunk(self, records):
+        offset = self.bytes_written
+        chunk = encode_chunk(records, self.codec, self.level, self.quantization)
+        self._file.write(chunk)
+        self.bytes_written += len(chunk)
+        self.samples_written += len(records)
+        self._index.append((offset, len(records), int(records["t"][0]), int(records["t"][-1])))
+
+    def close(self):
+        """
+        Write the last partial chunk and the index. Returns the bytes written by this call.
+        """
+        if self._file is None:
+            return 0
+        before = self.bytes_written
+        if self._pending_count:
+            data = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+            self._write_chunk(data)
+            self._pending = []
+            self._pending_count = 0
+
+        index_offset = self.bytes_written
+        index = np.array(self._index, dtype=_INDEX_DTYPE)
+        self._file.write(index.tobytes())
+        self._file.write(_TRAILER.pack(index_offset, len(index), INDEX_MAGIC))
+        self.bytes_written += index.nbytes + _TRAILER.size
+        self._file.close()
+        self._file = None
+        return self.bytes_written - before
+
+
+# ------------------------------------------------------
+# Reading
+# ------------------------------------------------------
+def is_compressed(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class CompressedRecording:
+    """
+    Read-only view of one .imuz recording, with the same access methods as
+    recording.reader.Recording. Time-range reads only decompress the chunks
+    they overlap; samples decompresses the whole file (once).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("Not a compressed IMU recording (bad magic)")
+            (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+            self.header = json.loads(f.read(length).decode("utf-8"))
+            if self.header.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compressed recording version: {self.header.get('version')}")
+            data_offset = len(MAGIC) + _LENGTH.size + length
+            self.index = self._read_index(f, data_offset)
+
+        if self.header.get("channels") != list(CHANNELS) or layout_to_dtype(self.header["layout"]) != SAMPLE_DTYPE:
+            raise ValueError("Unsupported sample layout in compressed recording")
+
+        self.codec = self.header["codec"]
+        self.quantization = self.header.get("quantization", {})
+        # sample position of every chunk's first record
+        self._starts = np.concatenate(([0], np.cumsum(self.index["count"], dtype=np.int64)))
+        self._samples = None
+        self._cached = (None, None)  # (chunk number, records)
+        self.chunks_decoded = 0
+
+    @staticmethod
+    def _read_index(f, data_offset):
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size - data_offset >= _TRAILER.size:
+            f.seek(size - _TRAILER.size)
+            index_offset, count, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+            if magic == INDEX_MAGIC and index_offset + count * _INDEX_DTYPE.itemsize + _TRAILER.size == size:
+                f.seek(index_offset)
+                return np.frombuffer(f.read(count * _INDEX_DTYPE.itemsize), dtype=_INDEX_DTYPE)
+
+        # no index (the writer did not close the file): walk the chunk headers
+        entries = []
+        offset = data_offset
+        while offset + _CHUNK.size <= size:
+            f.seek(offset)
+            length, count, t_first, t_last, *_ = _CHUNK.unpack(f.read(_CHUNK.size))
+            if offset + _CHUNK.size + length > size:
+                break  # truncated last chunk
+            entries.append((offset, count, t_first, t_last))
+            offset += _CHUNK.size + length
+        return np.array(entries, dtype=_INDEX_DTYPE)
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def chunk(self, number):
+        """
+        Decoded records of one chunk.
+        """
+        if self._cached[0] == number:
+            return self._cached[1]
+        with open(self.path, "rb") as f:
+            f.seek(int(self.index["offset"][number]))
+            chunk_header = _CHUNK.unpack(f.read(_CHUNK.size))
+            payload = f.read(chunk_header[0])
+        records = decode_chunk(chunk_header, payload, self.codec, self.quantization)
+        self.chunks_decoded += 1
+        self._cached = (number, records)
+        return records
+
+    @property
+    def samples(self):
+        if self._samples is None:
+            chunks = [self.chunk(number) for number in range(len(self.index))]
+            self._samples = np.concatenate(chunks) if chunks else np.empty(0, dtype=SAMPLE_DTYPE)
+        return self._samples
+
+    @property
+    def times(self):
+        return self.samples["t"]
+
+    def time_bounds(self):
+        """
+        (first, last) time stamp, from the index. None when empty.
+        """
+        if not len(self.index):
+            return None
+        return int(self.index["t_first"][0]), int(self.index["t_last"][-1])
+
+    # ------------------------------------------------------
+    # Chunked access
+    # ------------------------------------------------------
+    def iter_chunks(self, chunk_size=None, start=0, stop=None):
+        """
+        Yield consecutive slices of at most chunk_size samples (None: whole
+        chunks), decompressing one chunk at a time. A slice never spans two chunks.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        first = int(np.searchsorted(self._starts, start, side="right")) - 1
+        for number in range(max(first, 0), len(self.index)):
+            begin = int(self._starts[number])
+            if begin >= stop:
+                break
+            records = self.chunk(number)[max(start - begin, 0):stop - begin]
+            step = chunk_size or len(records)
+            for offset in range(0, len(records), step):
+                yield records[offset:offset + step]
+
+    # ------------------------------------------------------
+    # Time-range access
+    # ------------------------------------------------------
+    def index_of(self, t, side="left"):
+        """
+        Position of device time t in the recording (as np.searchsorted),
+        decompressing at most one chunk.
+        """
+        if not len(self):
+            return 0
+        # the first chunk ending at or after t (after t for side="right") holds the position
+        number = int(np.searchsorted(self.index["t_last"], t, side=side))
+        if number >= len(self.index):
+            return len(self)
+        times = self.chunk(number)["t"]
+        return int(self._starts[number]) + int(np.searchsorted(times, t, side=side))
+
+    def time_slice(self, t_start=None, t_end=None):
+        """
+        Samples with t_start <= t < t_end (device time units), a new array.
+        """
+        start = 0 if t_start is None else self.index_of(t_start, "left")
+        stop = len(self) if t_end is None else self.index_of(t_end, "left")
+        parts = list(self.iter_chunks(None, start, stop))
+        if not parts:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        return parts[0].copy() if len(parts) == 1 else np.concatenate(parts)
+
+
+# ------------------------------------------------------
+# Conversion
+# ------------------------------------------------------
+def compress_recording(source, path, codec=CODEC_ZLIB, level=None, chunk_samples=DEFAULT_CHUNK_SAMPLES,
+                       quantization=None):
+    """
+    Write an opened recording (recording.reader.Recording) as .imuz.
+    Returns the CompressedWriter (bytes_written, samples_written).
+    """
+    header = make_header("", 0.0)
+    header.update(source.header or {})
+    writer = CompressedWriter(path, header, codec, level, chunk_samples, quantization)
+    for records in source.iter_chunks(chunk_samples):
+        writer.write(np.asarray(records, dtype=SAMPLE_DTYPE))
+    writer.close()
+    return writer
+
+
+def _parse_quantization(items):
+    quantization = {}
+    for item in items or ():
+        name, _, step = item.partition("=")
+        if name not in CHANNELS or not step:
+            raise argparse.ArgumentTypeError(f"expected CHANNEL=STEP with a channel of {CHANNELS}, got {item!r}")
+        quantization[name] = float(step)
+    return quantization
+
+
+def main():
+    from recording.reader import open_recording
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="binary (.imu) recordings")
+    parser.add_argument("--codec", choices=CODECS, default=CODEC_ZLIB)
+    parser.add_argument("--level", type=int, help=f"codec level (default {DEFAULT_LEVEL})")
+    parser.add_argument("--chunk-samples", type=int, default=DEFAULT_CHUNK_SAMPLES)
+    parser.add_argument("--quantize", nargs="*", metavar="CHANNEL=STEP",
+                        help="store channels as int16 multiples of STEP, e.g. ax=0.000488")
+    args = parser.parse_args()
+    quantization = _parse_quantization(args.quantize)
+
+    for source_path in args.paths:
+        path = os.path.splitext(source_path)[0] + FILE_EXTENSION
+        if os.path.abspath(path) == os.path.abspath(source_path):
+            parser.error(f"{source_path} is already compressed")
+        writer = compress_recording(
+            open_recording(source_path), path, args.codec, args.level, args.chunk_samples, quantization
+        )
+        ratio = os.path.getsize(source_path) / max(writer.bytes_written, 1)
+        print(f"{source_path} -> {path}: {writer.samples_written} samples, "
+              f"{writer.bytes_written} bytes ({ratio:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Export binary IMU recordings to the legacy accel_log.csv column layout.
+
+Usage:
+    python -m recording.export session_000.imu [session_001.imu ...] -o accel_log.csv
+"""
+import argparse
+import os
+
+import numpy as np
+
+from recording.reader import Session
+
+CSV_HEADER = ["time", "accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z"]
+
+# samples converted per chunk, keeps memory flat for large recordings
+EXPORT_CHUNK = 100_000
+
+
+def export_csv(paths, csv_path, chunk=EXPORT_CHUNK):
+    """
+    Write the recordings (segments of one session, in order) as one CSV file.
+    Time is relative to the first sample, like the live plot.
+    Returns the number of rows written.
+    """
+    rows = 0
+    first_time = None
+
+    with open(csv_path, "w", newline="") as out:
+        out.write(",".join(CSV_HEADER) + "\n")
+
+        for records in Session.open(paths).iter_chunks(chunk):
+            t = records["t"].astype(np.int64)
+            if first_time is None:
+                first_time = int(t[0])
+
+            table = np.column_stack((
+                t - first_time,
+                records["ax"], records["ay"], records["az"],
+                records["gx"], records["gy"], records["gz"],
+            ))
+            np.savetxt(out, table, delimiter=",", fmt=["%d"] + ["%.7g"] * 6)
+            rows += len(records)
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="recording segments, in order")
+    parser.add_argument("-o", "--output", help="CSV path (default: first path with .csv)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.paths[0])[0] + ".csv"
+    rows = export_csv(args.paths, output)
+    print(f"Wrote {rows} rows to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+On-disk layout of IMU recordings (.imu):
+
+    8 bytes   magic b"IMUREC1\n"
+    4 bytes   header length (uint32, little endian)
+    N bytes   UTF-8 JSON header, space padded so the records start 64-byte aligned
+    ...       fixed-width records, dtype described by header["layout"]
+
+The header describes the device profile, units, sample layout and start time,
+so a file can be decoded without this code base.
+"""
+import json
+import struct
+
+import numpy as np
+
+from core.samples import SAMPLE_DTYPE
+
+MAGIC = b"IMUREC1\n"
+FORMAT_VERSION = 1
+FILE_EXTENSION = ".imu"
+
+_LENGTH = struct.Struct("<I")
+_ALIGNMENT = 64
+
+DEFAULT_UNITS = {
+    "t": "ms",
+    "ax": "g",
+    "ay": "g",
+    "az": "g",
+    "gx": "deg/s",
+    "gy": "deg/s",
+    "gz": "deg/s",
+}
+
+
+def dtype_to_layout(dtype):
+    return [[name, dtype.fields[name][0].str] for name in dtype.names]
+
+
+def layout_to_dtype(layout):
+    return np.dtype([(name, fmt) for name, fmt in layout])
+
+
+def make_header(device_profile, start_time, units=None, segment=0, dtype=SAMPLE_DTYPE, **extra):
+    """
+    start_time: unix time (s) of the first sample of the session
+    """
+    header = {
+        "version": FORMAT_VERSION,
+        "device_profile": device_profile,
+        "units": dict(units or DEFAULT_UNITS),
+        "layout": dtype_to_layout(dtype),
+        "record_size": dtype.itemsize,
+        "start_time": start_time,
+        "segment": segment,
+    }
+    header.update(extra)
+    return header
+
+
+def encode_header(header):
+    """
+    Return the bytes preceding the first record.
+    """
+    body = json.dumps(header).encode("utf-8")
+    used = len(MAGIC) + _LENGTH.size + len(body)
+    body += b" " * (-used % _ALIGNMENT)
+    return MAGIC + _LENGTH.pack(len(body)) + body
+
+
+def read_header(f):
+    """
+    Read the header of an open binary file.
+    Returns (header dict, offset of the first record).
+    """
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError("Not an IMU recording (bad magic)")
+
+    (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+    header = json.loads(f.read(length).decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported recording version: {header.get('version')}")
+
+    return header, len(MAGIC) + _LENGTH.size + length
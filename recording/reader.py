@@ -0,0 +1,209 @@
+import csv
+import os
+
+import numpy as np
+
+from core.samples import SAMPLE_DTYPE
+from recording.compressed import CompressedRecording, is_compressed
+from recording.format import layout_to_dtype, read_header
+
+# records per entry of the sparse timestamp index
+INDEX_STRIDE = 4096
+
+# default number of samples per chunk when iterating
+DEFAULT_CHUNK = 65536
+
+LEGACY_CSV_COLUMNS = ("t", "ax", "ay", "az", "gx", "gy", "gz")
+
+
+class Recording:
+    """
+    Read-only view of one recording.
+
+    samples is a structured array; for binary recordings it is a np.memmap, so
+    nothing is loaded until it is touched. Timestamps are assumed to be
+    non-decreasing, which is what the time-range lookups rely on.
+    """
+
+    def __init__(self, samples, header=None, path=None):
+        self.samples = samples
+        self.header = header or {}
+        self.path = path
+        self._index = None
+
+    @classmethod
+    def open(cls, path):
+        """
+        Memory-map a binary (.imu) recording.
+        """
+        with open(path, "rb") as f:
+            header, offset = read_header(f)
+
+        dtype = layout_to_dtype(header["layout"])
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+
+        if count:
+            samples = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+        else:
+            samples = np.empty(0, dtype=dtype)
+        return cls(samples, header, path)
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def times(self):
+        return self.samples["t"]
+
+    def time_bounds(self):
+        """
+        (first, last) time stamp. None when empty.
+        """
+        if not len(self):
+            return None
+        return int(self.times[0]), int(self.times[-1])
+
+    # ------------------------------------------------------
+    # Chunked access
+    # ------------------------------------------------------
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK, start=0, stop=None):
+        """
+        Yield consecutive zero-copy slices of at most chunk_size samples.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        for begin in range(start, stop, chunk_size):
+            yield self.samples[begin:min(begin + chunk_size, stop)]
+
+    # ------------------------------------------------------
+    # Time-range access
+    # ------------------------------------------------------
+    def _build_index(self):
+        # every INDEX_STRIDE-th timestamp, so a lookup only touches one block of the file
+        self._index = np.array(self.times[::INDEX_STRIDE])
+
+    def index_of(self, t, side="left"):
+        """
+        Position of device time t in the recording (as np.searchsorted), O(log n).
+        """
+        if not len(self):
+            return 0
+        if self._index is None:
+            self._build_index()
+
+        block = int(np.searchsorted(self._index, t, side=side))
+        lo = max(block - 1, 0) * INDEX_STRIDE
+        hi = min(block * INDEX_STRIDE + 1, len(self))
+        return lo + int(np.searchsorted(self.times[lo:hi], t, side=side))
+
+    def time_slice(self, t_start=None, t_end=None):
+        """
+        Zero-copy view of the samples with t_start <= t < t_end (device time units).
+        """
+        start = 0 if t_start is None else self.index_of(t_start, "left")
+        stop = len(self) if t_end is None else self.index_of(t_end, "left")
+        return self.samples[start:stop]
+
+
+class Session:
+    """
+    Ordered segments of one rotated recording session, read as one stream.
+    """
+
+    def __init__(self, recordings):
+        self.recordings = list(recordings)
+
+    @classmethod
+    def open(cls, paths):
+        return cls(open_recording(path) for path in paths)
+
+    def __len__(self):
+        return sum(len(r) for r in self.recordings)
+
+    @property
+    def header(self):
+        return self.recordings[0].header if self.recordings else {}
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK):
+        for recording in self.recordings:
+            yield from recording.iter_chunks(chunk_size)
+
+    def time_slice(self, t_start=None, t_end=None):
+        """
+        Samples with t_start <= t < t_end. A view when the range lies in a single
+        binary segment, otherwise a copy joining the segments.
+        """
+        parts = []
+        for recording in self.recordings:
+            bounds = recording.time_bounds()
+            if bounds is None:
+                continue
+            if t_end is not None and bounds[0] >= t_end:
+                break
+            if t_start is not None and bounds[1] < t_start:
+                continue
+            parts.append(recording.time_slice(t_start, t_end))
+
+        if not parts:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+
+# ------------------------------------------------------
+# Legacy accel_log.csv
+# ------------------------------------------------------
+def iter_csv_chunks(path, chunk_size=DEFAULT_CHUNK):
+    """
+    Yield SAMPLE_DTYPE batches from an accel_log.csv-style file.
+    Rows may carry 4 (time, accel) or 7 (time, accel, gyro) columns.
+    Raises ValueError on a negative time (written after a device counter
+    restart), which the unsigned time field cannot hold.
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        rows = []
+        for line, row in enumerate(reader, 1):
+            if not row:
+                continue
+            try:
+                t = float(row[0])
+            except ValueError:
+                continue  # header
+            if t < 0:
+                raise ValueError(f"{path}:{line}: negative time {row[0]} (device counter restart?)")
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield _csv_rows_to_batch(rows)
+                rows = []
+        if rows:
+            yield _csv_rows_to_batch(rows)
+
+
+def _csv_rows_to_batch(rows):
+    batch = np.zeros(len(rows), dtype=SAMPLE_DTYPE)
+    width = min(len(rows[0]), len(LEGACY_CSV_COLUMNS))
+    table = np.array([row[:width] for row in rows], dtype=np.float64)
+    for column, name in enumerate(LEGACY_CSV_COLUMNS[:width]):
+        batch[name] = table[:, column]
+    return batch
+
+
+def read_legacy_csv(path):
+    """
+    Load a whole accel_log.csv-style file as a Recording (in memory).
+    """
+    chunks = list(iter_csv_chunks(path))
+    samples = np.concatenate(chunks) if chunks else np.empty(0, dtype=SAMPLE_DTYPE)
+    return Recording(samples, {"device_profile": "", "source": "csv"}, path)
+
+
+def open_recording(path):
+    """
+    Open a binary recording (memory-mapped), a compressed one (.imuz) or a legacy CSV log.
+    """
+    if path.lower().endswith(".csv"):
+        return read_legacy_csv(path)
+    if is_compressed(path):
+        return CompressedRecording(path)
+    return Recording.open(path)
@@ -0,0 +1,331 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from core.channel import drain_into
+from core.metrics import METRICS
+from core.samples import SAMPLE_DTYPE, as_batch, item_device, item_gap
+from recording.compressed import FILE_EXTENSION as COMPRESSED_EXTENSION, CompressedWriter, DEFAULT_CHUNK_SAMPLES
+from recording.format import FILE_EXTENSION, encode_header, make_header
+
+# bytes gathered before the writer thread issues a write
+DEFAULT_FLUSH_BYTES = 1 << 20
+
+# longest time (s) a sample waits in memory before being written
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+
+class BinaryRecorder:
+    """
+    Records sample batches to fixed-width binary files from a background thread,
+    one file series per device.
+
+    submit() only hands the batch to the writer thread, so it is cheap enough to
+    call from the Qt timer callback. Files are rotated by size and/or time, and
+    after a reconnect (SampleBatch.gap): the new segment's header records the
+    outage as "gap_before" (s), and each file keeps increasing time stamps even
+    if the device counter restarted.
+
+    directory: where session files are created
+    rotate_bytes: start a new file once the current one reaches this size
+    rotate_seconds: start a new file once the current one is this old
+    codec: write chunked, compressed .imuz files ("zlib" or "lzma", see
+    recording.compressed) instead of fixed-width .imu records
+    quantization: {channel: step} the device profile allows compressed files
+    to store as int16 steps (DeviceProfile.quantization)
+    status: callable(text) told when a write fails and recording stops; called
+    from the writer thread (e.g. BLEImuManager.status.emit)
+
+    A failed write (disk full, permissions) ends the session: the exception is
+    kept in `error`, is_recording turns False and submit() stops queuing.
+    """
+
+    def __init__(
+        self,
+        directory="recordings",
+        rotate_bytes=None,
+        rotate_seconds=None,
+        flush_bytes=DEFAULT_FLUSH_BYTES,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        codec=None,
+        quantization=None,
+        chunk_samples=DEFAULT_CHUNK_SAMPLES,
+        status=None,
+    ):
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.codec = codec
+        self.quantization = quantization
+        self.chunk_samples = chunk_samples
+        self.status = status or (lambda _text: None)
+
+        self.is_recording = False
+        self.error = None
+        self.paths = []
+        self.samples_written = 0
+        self.bytes_written = 0
+
+        self._queue = None
+        self._thread = None
+        self._header_args = None
+        self._session_name = None
+
+        # writer thread state: device address (None when untagged) -> _DeviceStream
+        self._streams = {}
+
+        self._bytes_metric = METRICS.counter("imu_recorder_bytes_total", "Bytes written to recordings")
+        self._flush_metric = METRICS.histogram("imu_recorder_flush_seconds", "Time to write out pending samples")
+        self._error_metric = METRICS.counter("imu_recorder_errors_total", "Recordings stopped by a failed write")
+
+    # ------------------------------------------------------
+    # Control (any thread)
+    # ------------------------------------------------------
+    def start(self, device_profile="", units=None, session_name=None):
+        """
+        Begin a new session. Files are named <session_name>[_<device>]_<segment>.imu
+        (.imuz when compressed).
+        """
+        if self.is_recording:
+            self.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        start_time = time.time()
+        if session_name is None:
+            session_name = "session_" + time.strftime("%Y%m%d-%H%M%S", time.localtime(start_time))
+
+        self._header_args = {
+            "device_profile": device_profile,
+            "units": units,
+            "start_time": start_time,
+        }
+        self._session_name = session_name
+        self.paths = []
+        self.samples_written = 0
+        self.bytes_written = 0
+        self.error = None
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer_loop, name="imu-recorder", daemon=True)
+        self.is_recording = True
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        Queue a queue item (sample tuple, batch or SampleBatch) for writing. Never blocks.
+        Samples of each device go to their own files. Ignored when not recording,
+        including after a failed write.
+        """
+        if self.is_recording:
+            self._queue.put((item_device(item), as_batch(item), item_gap(item)))
+
+    def stop(self):
+        """
+        Flush everything submitted so far and close the current file.
+        """
+        if not self.is_recording:
+            if self._thread is not None:
+                # the writer thread ended on an error
+                self._thread.join()
+                self._thread = None
+            return
+
+        self.is_recording = False
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    # ------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------
+    def _writer_loop(self):
+        pending_bytes = 0
+        last_flush = time.monotonic()
+        done = False
+
+        try:
+            while not done:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = False
+
+                if item is None:
+                    done = True
+                elif item is not False:
+                    device, batch, gap = item
+                    if batch.dtype != SAMPLE_DTYPE:
+                        batch = batch.astype(SAMPLE_DTYPE)
+                    stream = self._streams.get(device)
+                    if stream is None:
+                        stream = self._streams[device] = _DeviceStream(device)
+                    if gap is not None:
+                        # what came before the outage goes to the current segment
+                        pending_bytes -= self._flush_stream(stream, time.monotonic())
+                        stream.gap = gap
+                    stream.pending.append(batch)
+                    pending_bytes += batch.nbytes
+
+                now = time.monotonic()
+                if not pending_bytes or (
+                    not done
+                    and pending_bytes < self.flush_bytes
+                    and now - last_flush < self.flush_interval
+                ):
+                    continue
+
+                for stream in self._streams.values():
+                    self._flush_stream(stream, now)
+                self._flush_metric.observe(time.monotonic() - now)
+                pending_bytes = 0
+                last_flush = now
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for stream in self._streams.values():
+                if stream.file:
+                    try:
+                        self._close_file(stream)
+                    except Exception as e:
+                        self._fail(e)
+            self._streams = {}
+
+    def _fail(self, error):
+        """
+        Stop recording after a failed write; what is still queued is discarded.
+        """
+        if self.error is not None:
+            return
+        self.error = error
+        self.is_recording = False
+        self._error_metric.inc()
+        self.status(f"Recording stopped: {error}")
+
+    def _flush_stream(self, stream, now):
+        """
+        Write a device's pending batches. Returns the number of bytes written.
+        """
+        if not stream.pending:
+            return 0
+        pending = stream.pending
+        stream.pending = []
+        data = np.concatenate(pending) if len(pending) > 1 else pending[0]
+        self._write(stream, data, now)
+        return data.nbytes
+
+    def _open_segment(self, stream):
+        name = self._session_name
+        if stream.device is not None:
+            name += "_" + "".join(c if c.isalnum() else "-" for c in str(stream.device))
+        extension = COMPRESSED_EXTENSION if self.codec else FILE_EXTENSION
+        path = os.path.join(self.directory, f"{name}_{stream.segment:03d}{extension}")
+
+        extra = {}
+        if stream.gap is not None:
+            extra["gap_before"] = stream.gap
+            stream.gap = None
+        header = make_header(
+            segment=stream.segment, device_address=stream.device, **extra, **self._header_args
+        )
+        if self.codec:
+            stream.file = CompressedWriter(
+                path, header, self.codec, chunk_samples=self.chunk_samples, quantization=self.quantization
+            )
+        else:
+            stream.file = open(path, "wb", buffering=0)
+            stream.file.write(encode_header(header))
+        stream.opened_at = time.monotonic()
+        stream.segment_bytes = 0
+        self.paths.append(path)
+
+    def _close_file(self, stream):
+        written = stream.file.close()
+        if written:
+            # the last chunk and index of a compressed file
+            stream.segment_bytes += written
+            self._count_bytes(written)
+        stream.file = None
+
+    def _count_bytes(self, count):
+        self.bytes_written += count
+        self._bytes_metric.inc(count)
+
+    def _rotate(self, stream):
+        self._close_file(stream)
+        stream.segment += 1
+        self._open_segment(stream)
+
+    def _write(self, stream, data, now):
+        """
+        Write records of one device, splitting them across segments at the rotation limits.
+        """
+        if stream.file is None:
+            self._open_segment(stream)
+        elif stream.gap is not None:
+            self._rotate(stream)
+        elif self.rotate_seconds and stream.segment_bytes and now - stream.opened_at >= self.rotate_seconds:
+            self._rotate(stream)
+
+        if self.codec:
+            self._write_compressed(stream, data)
+            return
+
+        record_size = SAMPLE_DTYPE.itemsize
+        while len(data):
+            count = len(data)
+            if self.rotate_bytes:
+                room = (self.rotate_bytes - stream.segment_bytes) // record_size
+                if room <= 0 and stream.segment_bytes:
+                    self._rotate(stream)
+                    continue
+                count = min(count, max(room, 1))
+
+            chunk = data[:count]
+            stream.file.write(chunk.tobytes())
+
+            stream.segment_bytes += chunk.nbytes
+            self._count_bytes(chunk.nbytes)
+            self.samples_written += count
+            data = data[count:]
+
+    def _write_compressed(self, stream, data):
+        """
+        Hand records to the compressed writer, a chunk's worth at a time. The
+        file only grows by whole chunks, so rotate_bytes is checked between them.
+        """
+        for start in range(0, len(data), self.chunk_samples):
+            if self.rotate_bytes and stream.segment_bytes >= self.rotate_bytes:
+                self._rotate(stream)
+            chunk = data[start:start + self.chunk_samples]
+            written = stream.file.write(chunk)
+            stream.segment_bytes += written
+            self._count_bytes(written)
+            self.samples_written += len(chunk)
+
+
+class _DeviceStream:
+    """
+    Writer-thread state of one device's files.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.file = None
+        self.opened_at = 0.0
+        self.segment = 0
+        self.segment_bytes = 0
+        self.pending = []
+        self.gap = None  # outage before the next segment
+
+
+async def record_from(channel, recorder):
+    """
+    Feed every item of a channel (normally a "block" SampleChannel)
+    to the recorder. Runs until cancelled.
+    """
+    await drain_into(channel, recorder.submit)